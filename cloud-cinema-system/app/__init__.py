@@ -1,34 +1,128 @@
-from flask import Flask
+from flask import Flask, g, has_app_context
+from werkzeug.middleware.proxy_fix import ProxyFix
 from .config import Config
+from .db import ConnectionPool
+from . import assets, instrumentation, passwords, posters, replicas, seat_events, waiting_room
+from .seat_index import SeatIndexRegistry
+from .seat_layout import SeatLayoutCache
+from .cache import LRUCache, SQLiteStore, TieredCache
+from .authz import AdminDirectory
 import pymysql
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
-    # Database connection helper
-    def get_db_connection():
+    # Behind the load balancer, take the client IP from X-Forwarded-For
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+
+    def connect(host=None, port=3306, **kwargs):
         return pymysql.connect(
-            host=app.config['DB_HOST'],
+            host=host or app.config['DB_HOST'],
+            port=port,
             user=app.config['DB_USER'],
             password=app.config['DB_PASSWORD'],
             database=app.config['DB_NAME'],
-            cursorclass=pymysql.cursors.DictCursor  # Returns results as dictionaries
+            cursorclass=pymysql.cursors.DictCursor,  # Returns results as dictionaries
+            **kwargs
         )
 
+    app.db_pool = ConnectionPool(
+        connect,
+        min_size=app.config['DB_POOL_MIN_SIZE'],
+        max_size=app.config['DB_POOL_MAX_SIZE'],
+        max_lifetime=app.config['DB_POOL_MAX_LIFETIME'],
+        timeout=app.config['DB_POOL_TIMEOUT'],
+        ping_interval=app.config['DB_POOL_PING_INTERVAL'],
+    )
+
+    # Database connection helper
+    # Inside a request every call returns the same pooled connection; it goes
+    # back to the pool when the app context is torn down.
+    def get_db_connection():
+        if not has_app_context():
+            return app.db_pool.acquire()
+        conn = g.get('_db_conn')
+        if conn is None:
+            conn = app.db_pool.acquire()
+            conn.request_scoped = True
+            g._db_conn = conn
+        return conn
+
+    @app.teardown_appcontext
+    def release_db_connection(exc):
+        conn = g.pop('_db_conn', None)
+        if conn is not None:
+            app.db_pool.release(conn)
+
     # Attach it to the app object for easy access in routes
     app.get_db_connection = get_db_connection
 
+    # Per-request query counts/timings and the slow-query log (off by default)
+    instrumentation.init_app(app)
+
+    # Read replicas: app.get_read_connection() for read-only paths
+    replicas.init_app(app, connect)
+
+    # Seat grid per screen, and per-showtime seat availability on top of it
+    app.seat_layouts = SeatLayoutCache()
+    app.seat_index = SeatIndexRegistry(app.seat_layouts, ttl=app.config['SEAT_INDEX_TTL'])
+
+    # Publishes seat held/booked/released events to the live seat map
+    seat_events.init_app(app)
+
+    # Password hashing pool and login throttling
+    passwords.init_app(app)
+
+    # Server-side list of admins (see authz.py)
+    app.admin_directory = AdminDirectory(ttl=app.config['ADMIN_CACHE_TTL'])
+
+    # Catalog (movies/showtimes) cache, invalidated by the admin routes
+    shared = None
+    if app.config['CATALOG_CACHE_PATH']:
+        shared = SQLiteStore(app.config['CATALOG_CACHE_PATH'])
+    app.catalog_cache = TieredCache(
+        LRUCache(max_entries=app.config['CATALOG_CACHE_SIZE'], ttl=app.config['CATALOG_CACHE_TTL']),
+        shared,
+        shared_ttl=app.config['CATALOG_CACHE_SHARED_TTL'],
+    )
+
+    # Poster variants storage, /media route and poster_url() for templates
+    posters.init_app(app)
+
+    # Hashed /assets/ copies of the static files and asset_url() for templates
+    assets.init_app(app)
+
+    # Admission control for the seat maps of busy showtimes
+    waiting_room.init_app(app)
+
+    # Schema migrations: flask --app app db upgrade
+    from .migrate import db_cli
+    app.cli.add_command(db_cli)
+
+    # Sales rollups backfill: flask --app app rollups rebuild
+    from .rollups import rollups_cli
+    app.cli.add_command(rollups_cli)
+
+    # Demoting admins: flask --app app admins demote EMAIL
+    from .authz import admins_cli
+    app.cli.add_command(admins_cli)
+
+    # Nightly archival of finished showtimes: flask --app app archive run
+    from .archive import archive_cli
+    app.cli.add_command(archive_cli)
+
     from .routes.main import main_bp
     app.register_blueprint(main_bp)
 
     from .routes.auth import auth_bp
     app.register_blueprint(auth_bp)
-    
+
     from .routes.booking import booking_bp
     app.register_blueprint(booking_bp)
-    
+
     from .routes.admin import admin_bp
     app.register_blueprint(admin_bp)
 
-    return app
\ No newline at end of file
+    return app
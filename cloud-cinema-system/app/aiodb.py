@@ -0,0 +1,147 @@
+"""Async database access for the ASGI deployment mode (see asgi.py).
+
+AsyncPool is the asyncio counterpart of db.ConnectionPool: a bounded set of
+aiomysql connections shared by every request on one event loop; there is
+one for the primary (app.aio_pool) and one per read replica. A request
+holds a connection only while its queries run:
+
+    async with aiodb.read_cursor() as cursor:
+        await cursor.execute(sql, params)
+        rows = await cursor.fetchall()
+
+read_cursor() picks a replica the same way get_read_connection() does for
+the sync routes (see replicas.py); cache fills use primary_cursor(). Do not
+open primary_cursor() while a read_cursor() is open: with no replica up both
+take a primary connection, and a full pool waits on itself. The async
+handlers only read, so connections run in autocommit mode: no transaction
+(or REPEATABLE READ snapshot) outlives a statement.
+"""
+import asyncio
+import contextlib
+
+from flask import current_app
+
+from . import replicas
+from .db import PoolTimeout
+
+
+class AsyncPool:
+    def __init__(self, connect_kwargs, min_size=1, max_size=20, max_lifetime=1800, timeout=5.0):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError('Invalid pool size settings.')
+        self.connect_kwargs = connect_kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self._pool = None
+        self._opening = None
+        self._stats = {'checkouts': 0, 'timeouts': 0, 'discarded': 0}
+
+    async def open(self):
+        """Create the connections; must run on the loop that will use them."""
+        if self._pool is not None:
+            return
+        if self._opening is None:
+            self._opening = asyncio.ensure_future(self._create())
+        try:
+            await asyncio.shield(self._opening)
+        except Exception:
+            self._opening = None
+            raise
+
+    async def _create(self):
+        import aiomysql
+        self._pool = await aiomysql.create_pool(
+            minsize=self.min_size,
+            maxsize=self.max_size,
+            pool_recycle=self.max_lifetime or -1,
+            autocommit=True,
+            cursorclass=aiomysql.DictCursor,
+            **self.connect_kwargs
+        )
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+            self._opening = None
+
+    async def acquire(self):
+        if self._pool is None:
+            await self.open()
+        try:
+            conn = await asyncio.wait_for(self._pool.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self._stats['timeouts'] += 1
+            raise PoolTimeout('Timed out waiting for a database connection.') from None
+        self._stats['checkouts'] += 1
+        return conn
+
+    @contextlib.asynccontextmanager
+    async def cursor(self, conn=None):
+        """A cursor on conn (already acquired from this pool) or a new connection."""
+        if conn is None:
+            conn = await self.acquire()
+        try:
+            async with conn.cursor() as cursor:
+                yield cursor
+        except BaseException:
+            # Cancelled or failed mid-query: the connection may still have a
+            # result in flight, so close it rather than hand it out again
+            conn.close()
+            self._stats['discarded'] += 1
+            raise
+        finally:
+            self._pool.release(conn)
+
+    def stats(self):
+        data = dict(self._stats)
+        pool = self._pool
+        data.update({
+            'size': pool.size if pool else 0,
+            'idle': pool.freesize if pool else 0,
+            'in_use': pool.size - pool.freesize if pool else 0,
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+        })
+        return data
+
+
+@contextlib.asynccontextmanager
+async def read_cursor():
+    """Cursor for a read: on a replica, unless the session is pinned to the
+    primary (see replicas.py) or no replica can be reached."""
+    app = current_app
+    pool, conn = app.aio_pool, None
+    if not replicas.pinned():
+        for replica in app.aio_replicas.candidates():
+            try:
+                conn = await replica.acquire()
+            except PoolTimeout:
+                continue
+            except Exception:
+                app.aio_replicas.mark_down(replica)
+                continue
+            pool = replica
+            break
+    async with pool.cursor(conn) as cursor:
+        yield cursor
+
+
+def primary_cursor():
+    """Cursor on the primary, for filling shared caches (see replicas.py)."""
+    return current_app.aio_pool.cursor()
+
+
+async def read_all(sql, params=(), primary=False):
+    async with (primary_cursor() if primary else read_cursor()) as cursor:
+        await cursor.execute(sql, params)
+        return await cursor.fetchall()
+
+
+async def read_one(sql, params=(), primary=False):
+    async with (primary_cursor() if primary else read_cursor()) as cursor:
+        await cursor.execute(sql, params)
+        return await cursor.fetchone()
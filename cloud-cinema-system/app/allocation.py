@@ -0,0 +1,172 @@
+"""Best-available seats: pick N good free seats for one showtime.
+
+Each row of the screen becomes an int bitset over its seat numbers (bit j
+is seat number first + j), built from the SeatIndex bitmap. "n free seats
+starting at j" is then a handful of shifts and ANDs per row, and the start
+closest to the middle of the row is found with two bit scans, so even a
+large auditorium is searched in microseconds.
+
+Blocks are scored by their distance from the best spot in the room:
+horizontally the middle of the row, vertically SWEET_SPOT of the way from
+the front row (rows are ordered front to back, as on the seat map). When no
+row has n seats together, the group is split into as few blocks as
+possible on consecutive rows, stacked around the middle; failing that, the
+n best free seats are used.
+"""
+import functools
+import heapq
+
+# Preferred depth, as a fraction of the way from the front row to the back
+SWEET_SPOT = 0.6
+
+
+class _Row:
+    __slots__ = ('index', 'first', 'valid', 'seat_ids', 'span', 'positions', 'centre', 'half_width')
+
+    def __init__(self, index, seats, positions):
+        numbers = [n for _, n in seats]
+        self.index = index
+        self.first = min(numbers)
+        self.valid = 0
+        self.seat_ids = {}
+        for seat_id, number in seats:
+            self.valid |= 1 << (number - self.first)
+            self.seat_ids[number - self.first] = seat_id
+        self.centre = (min(numbers) + max(numbers)) / 2 - self.first
+        self.half_width = max((max(numbers) - min(numbers)) / 2, 1)
+
+        # Seats are usually created row by row, so a row is often one
+        # ascending run of SeatIndex positions: then its occupancy is a
+        # single shift of the showtime bitmap
+        ordered = [positions[self.seat_ids[b]] for b in sorted(self.seat_ids)]
+        contiguous = len(ordered) == max(numbers) - min(numbers) + 1 and \
+            ordered == list(range(ordered[0], ordered[0] + len(ordered)))
+        self.span = (ordered[0], len(ordered)) if contiguous else None
+        self.positions = None if contiguous else tuple((positions[s], b) for b, s in self.seat_ids.items())
+
+    def free(self, occupied):
+        if self.span:
+            start, width = self.span
+            return ~(occupied >> start) & ((1 << width) - 1)
+        taken = 0
+        for pos, bit in self.positions:
+            if occupied >> pos & 1:
+                taken |= 1 << bit
+        return self.valid & ~taken
+
+
+@functools.lru_cache(maxsize=256)
+def _rows(layout):
+    # SeatLayout is immutable and cached per screen, so this is per screen too
+    positions = {sid: i for i, sid in enumerate(layout.seat_ids)}
+    return tuple(_Row(i, seats, positions) for i, (_, seats) in enumerate(layout.rows))
+
+
+def _runs(free, n):
+    """Bit j set iff bits j .. j+n-1 of free are all set."""
+    runs = free
+    shift = 1
+    # Doubling: after each step runs covers twice as many seats
+    while shift * 2 <= n:
+        runs &= runs >> shift
+        shift *= 2
+    if shift < n:
+        runs &= runs >> (n - shift)
+    return runs
+
+
+def _nearest(runs, target):
+    """Set bit of runs closest to target (>= 0), or None."""
+    if not runs:
+        return None
+    above = runs >> target
+    best = None
+    if above:
+        best = target + (above & -above).bit_length() - 1
+    below = runs & ((1 << target) - 1)
+    if below:
+        low = below.bit_length() - 1
+        if best is None or target - low <= best - target:
+            best = low
+    return best
+
+
+class _Search:
+    def __init__(self, layout, index):
+        self.rows = _rows(layout)
+        occupied = int.from_bytes(index.bits, 'little')
+        self.free = [row.free(occupied) for row in self.rows]
+        self.ideal_row = SWEET_SPOT * (len(self.rows) - 1)
+        self.depth = max(len(self.rows) - 1, 1)
+        # (row index, n) -> block(); split() asks for the same ones repeatedly
+        self._blocks = {}
+
+    def score(self, row, centre):
+        dx = (centre - row.centre) / row.half_width
+        dy = (row.index - self.ideal_row) / self.depth
+        return dx * dx + dy * dy
+
+    def block(self, row, n):
+        """(score, start bit) of the best n-seat block in row, or None."""
+        key = (row.index, n)
+        if key not in self._blocks:
+            start = _nearest(_runs(self.free[row.index], n), max(0, round(row.centre - (n - 1) / 2)))
+            self._blocks[key] = None if start is None else (self.score(row, start + (n - 1) / 2), start)
+        return self._blocks[key]
+
+    def seats(self, row, start, n):
+        return [row.seat_ids[b] for b in range(start, start + n)]
+
+    def together(self, n):
+        best = None
+        for row in self.rows:
+            found = self.block(row, n)
+            if found and (best is None or found[0] < best[0]):
+                best = (found[0], row, found[1])
+        return best and self.seats(best[1], best[2], n)
+
+    def split(self, n):
+        """n seats as k blocks on k consecutive rows, smallest k first."""
+        for k in range(2, min(n, len(self.rows)) + 1):
+            sizes = [n // k + (1 if i < n % k else 0) for i in range(k)]
+            best = None
+            for first in range(len(self.rows) - k + 1):
+                total, blocks = 0.0, []
+                for size, row in zip(sizes, self.rows[first:first + k]):
+                    found = self.block(row, size)
+                    if found is None:
+                        break
+                    total += found[0]
+                    blocks.append((row, found[1], size))
+                else:
+                    score = total / k
+                    if best is None or score < best[0]:
+                        best = (score, blocks)
+            if best:
+                return [sid for row, start, size in best[1] for sid in self.seats(row, start, size)]
+        return None
+
+    def scattered(self, n):
+        candidates = []
+        for row in self.rows:
+            free = self.free[row.index]
+            while free:
+                bit = (free & -free).bit_length() - 1
+                free &= free - 1
+                candidates.append((self.score(row, bit), row.seat_ids[bit]))
+        if len(candidates) < n:
+            return None
+        return [sid for _, sid in heapq.nsmallest(n, candidates)]
+
+
+def best_seats(layout, index, n):
+    """Pick n free seats of a showtime (index) on its screen (layout).
+
+    Returns (seat_ids, together) where together is False when the seats had
+    to be split, or (None, False) when fewer than n seats are free.
+    """
+    search = _Search(layout, index)
+    seats = search.together(n)
+    if seats:
+        return seats, True
+    return search.split(n) or search.scattered(n), False
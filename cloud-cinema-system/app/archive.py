@@ -0,0 +1,117 @@
+"""Hot/cold archival of finished showtimes.
+
+Showtimes dated more than ARCHIVE_AFTER_DAYS days ago are moved, with their
+bookings, booked seats and showtime_stats rows, into the *_history tables
+(migration 0008), ARCHIVE_CHUNK_SIZE showtimes per short transaction. The
+hot tables then only hold recent and upcoming shows, so they and their
+indexes stay small enough to live in the buffer pool. Run it nightly, e.g.
+from cron:
+
+    flask --app app archive run
+
+The profile's past bookings, the bookings export, the rollups and movie
+removal read or cover both sets of tables; movie_daily_stats is not moved,
+so the admin sales totals are unaffected. Rows keep their ids, which relies
+on MySQL 8.0+ persisting AUTO_INCREMENT counters across restarts (5.7 could
+hand an archived id out again).
+"""
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+# (hot table, history table, columns), copied in this order
+_COPIES = (
+    ('showtimes', 'showtimes_history', 'showtime_id, movie_id, screen_id, show_date, show_time, price'),
+    ('bookings', 'bookings_history', 'booking_id, user_id, showtime_id, booking_time, cancelled'),
+    ('showtime_stats', 'showtime_stats_history', 'showtime_id, seats_sold, bookings, cancellations, gross_revenue'),
+)
+
+
+def archive_chunk(db, after_days, size):
+    """Move up to size showtimes dated before CURDATE() - after_days, in one
+    transaction. Returns (showtimes, bookings) moved."""
+    try:
+        with db.cursor() as cursor:
+            # Oldest first, in idx_showtimes_date_time order; locked so an
+            # admin edit cannot slip in between the copy and the delete
+            cursor.execute("""
+                SELECT showtime_id FROM showtimes
+                WHERE show_date < CURDATE() - INTERVAL %s DAY
+                ORDER BY show_date, show_time, showtime_id
+                LIMIT %s FOR UPDATE
+            """, (after_days, size))
+            ids = [r['showtime_id'] for r in cursor.fetchall()]
+            if not ids:
+                db.rollback()
+                return 0, 0
+
+            placeholders = ','.join(['%s'] * len(ids))
+            for hot, history, columns in _COPIES:
+                cursor.execute(f"""
+                    INSERT INTO {history} ({columns})
+                    SELECT {columns} FROM {hot} WHERE showtime_id IN ({placeholders})
+                """, ids)
+            cursor.execute(f"""
+                INSERT INTO booking_seats_history (booking_seat_id, booking_id, seat_id)
+                SELECT bs.booking_seat_id, bs.booking_id, bs.seat_id
+                FROM booking_seats bs JOIN bookings b ON bs.booking_id = b.booking_id
+                WHERE b.showtime_id IN ({placeholders})
+            """, ids)
+
+            # Children first for the foreign keys; the sold-seat rows in
+            # seat_holds are only needed while the showtime can be booked
+            cursor.execute(f"DELETE FROM seat_holds WHERE showtime_id IN ({placeholders})", ids)
+            cursor.execute(f"""
+                DELETE bs FROM booking_seats bs JOIN bookings b ON bs.booking_id = b.booking_id
+                WHERE b.showtime_id IN ({placeholders})
+            """, ids)
+            bookings = cursor.execute(f"DELETE FROM bookings WHERE showtime_id IN ({placeholders})", ids)
+            cursor.execute(f"DELETE FROM showtime_stats WHERE showtime_id IN ({placeholders})", ids)
+            for table in ('waiting_rooms', 'waiting_room_admissions'):
+                cursor.execute(f"DELETE FROM {table} WHERE showtime_id IN ({placeholders})", ids)
+            cursor.execute(f"DELETE FROM showtimes WHERE showtime_id IN ({placeholders})", ids)
+        db.commit()
+        return len(ids), bookings
+    except Exception:
+        db.rollback()
+        raise
+
+
+def run(db, after_days, size, pause=0.0, max_chunks=None, echo=None):
+    """Archive chunk by chunk until nothing is left (or max_chunks ran).
+    Returns (showtimes, bookings) moved."""
+    # Scheduling checks yesterday's shows for overlaps, so they stay hot
+    after_days = max(after_days, 1)
+    showtimes = bookings = chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        moved, moved_bookings = archive_chunk(db, after_days, size)
+        if not moved:
+            break
+        showtimes += moved
+        bookings += moved_bookings
+        chunks += 1
+        if echo:
+            echo(f'{showtimes} showtime(s), {bookings} booking(s) archived ...')
+        # Room for replicas and booking transactions between chunks
+        time.sleep(pause)
+    return showtimes, bookings
+
+
+archive_cli = AppGroup('archive', help='Hot/cold archival of finished showtimes.')
+
+
+@archive_cli.command('run')
+@click.option('--max-chunks', type=int, default=None, help='Stop after this many chunks.')
+def run_command(max_chunks):
+    """Move finished showtimes and their bookings to the history tables."""
+    config = current_app.config
+    db = current_app.get_db_connection()
+    try:
+        showtimes, bookings = run(db, config['ARCHIVE_AFTER_DAYS'], config['ARCHIVE_CHUNK_SIZE'],
+                                  pause=config['ARCHIVE_CHUNK_PAUSE'], max_chunks=max_chunks,
+                                  echo=click.echo)
+    finally:
+        db.close()
+    click.echo(f'Archived {showtimes} showtime(s) and {bookings} booking(s).')
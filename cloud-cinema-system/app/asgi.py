@@ -0,0 +1,275 @@
+"""ASGI deployment mode: async handlers for the hot read routes.
+
+In the default (WSGI) mode every request holds a worker thread while it
+waits on MySQL. create_asgi_app() wraps the same Flask app in an ASGI
+application where the routes registered with @async_view (home page, movie
+details, seat map and profile) run as coroutines on the event loop and
+query through an async pool (aiodb.AsyncPool), so one process keeps many
+of them in flight at once. Every other request, and any method an async
+view does not cover, is passed to the regular Flask app on a thread pool,
+responses streamed as they are produced.
+
+Async views are plain Flask views as far as the rest of the app is
+concerned: they run inside a normal request context (session, flash,
+url_for, render_template, teardown hooks), are found through the app's
+own URL map and answer to the same endpoint names. Their environ first
+goes through the middleware wrapped around app.wsgi_app (e.g. ProxyFix),
+like a sync request's; a middleware that answers a request itself sends it
+down the sync path. Run with:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import copy
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.exceptions import HTTPException
+
+# endpoint -> coroutine function; GET requests to it skip the sync app
+ASYNC_VIEWS = {}
+
+
+def async_view(endpoint):
+    """Register an async handler for the GET requests of endpoint."""
+    def decorator(view):
+        ASYNC_VIEWS[endpoint] = view
+        return view
+    return decorator
+
+
+def _environ(scope, body=b''):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if key in environ:
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
+
+
+class _Captured(list):
+    """What the end of the middleware chain returns: the environ it got."""
+
+    def __init__(self, environ):
+        super().__init__()
+        self.environ = environ
+
+
+def _capture(environ, start_response):
+    return _Captured(environ)
+
+
+def _middleware_chain(flask_app):
+    """A copy of the middleware stacked on flask_app.wsgi_app, ending in
+    _capture instead of the Flask app."""
+    layers = []
+    layer = flask_app.wsgi_app
+    while getattr(layer, '__self__', None) is not flask_app:
+        if not hasattr(layer, 'app'):
+            raise RuntimeError(f'Cannot run middleware {layer!r} in front of the async views')
+        layers.append(layer)
+        layer = layer.app
+    chain = _capture
+    for layer in reversed(layers):
+        layer = copy.copy(layer)
+        layer.app = chain
+        chain = layer
+    return chain
+
+
+def _start(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers],
+    }
+
+
+class AsgiApp:
+    def __init__(self, flask_app, sync_threads=16):
+        self.flask = flask_app
+        self.middleware = _middleware_chain(flask_app)
+        self.executor = ThreadPoolExecutor(max_workers=sync_threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            view, kwargs = self._async_route(scope)
+            environ = self._through_middleware(_environ(scope)) if view is not None else None
+            if environ is not None:
+                await self._run_async(environ, send, view, kwargs)
+            else:
+                await self._run_sync(scope, receive, send)
+        # Other scopes (websocket) are not served
+
+    def _through_middleware(self, environ):
+        """environ as the Flask app would get it from its middleware, or None
+        if a middleware answered the request itself."""
+        result = self.middleware(environ, lambda status, headers, exc_info=None: None)
+        if isinstance(result, _Captured):
+            return result.environ
+        if hasattr(result, 'close'):
+            result.close()
+        return None
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.flask.aio_pool.open()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Replica pools open on first use
+                for pool in [self.flask.aio_pool] + self.flask.aio_replicas.pools:
+                    await pool.close()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _async_route(self, scope):
+        if scope['method'] != 'GET':
+            return None, None
+        adapter = self.flask.url_map.bind(
+            self.flask.config['SERVER_NAME'] or 'localhost',
+            script_name=scope.get('root_path') or None,
+        )
+        try:
+            endpoint, kwargs = adapter.match(scope['path'], 'GET')
+        except HTTPException:
+            # 404s, redirects (e.g. a missing trailing slash): the sync app answers
+            return None, None
+        return ASYNC_VIEWS.get(endpoint), kwargs
+
+    async def _run_async(self, environ, send, view, kwargs):
+        # Same steps as Flask.wsgi_app / full_dispatch_request, with the view awaited
+        app = self.flask
+        ctx = app.request_context(environ)
+        error = None
+        try:
+            try:
+                ctx.push()
+                try:
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        rv = await view(**kwargs)
+                except Exception as e:
+                    rv = app.handle_user_exception(e)
+                response = app.finalize_request(rv)
+            except Exception as e:
+                error = e
+                response = app.handle_exception(e)
+            body = response.get_data()
+        finally:
+            ctx.pop(error)
+
+        await send(_start(response.status_code, response.headers.items()))
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _run_sync(self, scope, receive, send):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        environ = _environ(scope, b''.join(chunks))
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._wsgi, environ, send, loop)
+
+    def _wsgi(self, environ, send, loop):
+        # Runs on a pool thread; every message is handed to the loop and
+        # waited for, so a slow client slows the producer (e.g. an export)
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        status = {}
+
+        def start_response(status_line, headers, exc_info=None):
+            status['code'] = int(status_line.split(' ', 1)[0])
+            status['headers'] = headers
+
+        result = self.flask(environ, start_response)
+        started = False
+        try:
+            for chunk in result:
+                if not chunk:
+                    continue
+                if not started:
+                    emit(_start(status['code'], status['headers']))
+                    started = True
+                emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not started:
+                emit(_start(status['code'], status['headers']))
+            emit({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+
+def create_asgi_app():
+    """The Flask app from create_app(), served as an ASGI application."""
+    from . import create_app, replicas
+    from .aiodb import AsyncPool
+
+    app = create_app()
+
+    def pool(host, port=3306, **kwargs):
+        return AsyncPool(
+            {
+                'host': host,
+                'port': port,
+                'user': app.config['DB_USER'],
+                'password': app.config['DB_PASSWORD'],
+                'db': app.config['DB_NAME'],
+                **kwargs
+            },
+            min_size=app.config['ASYNC_DB_POOL_MIN_SIZE'],
+            max_size=app.config['ASYNC_DB_POOL_MAX_SIZE'],
+            max_lifetime=app.config['DB_POOL_MAX_LIFETIME'],
+            timeout=app.config['DB_POOL_TIMEOUT'],
+        )
+
+    app.aio_pool = pool(app.config['DB_HOST'])
+    app.aio_replicas = replicas.ReplicaSet(
+        # Read only, like the sync replica pools (see replicas.init_app)
+        [pool(host, port, connect_timeout=app.config['DB_REPLICA_CONNECT_TIMEOUT'],
+              init_command='SET SESSION TRANSACTION READ ONLY')
+         for host, port in replicas.parse_hosts(app.config['DB_REPLICA_HOSTS'])],
+        retry_after=app.config['DB_REPLICA_RETRY'],
+    )
+    return AsgiApp(app, sync_threads=app.config['ASGI_SYNC_THREADS'])
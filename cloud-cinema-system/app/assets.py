@@ -0,0 +1,134 @@
+"""Fingerprinted, precompressed static files.
+
+build() copies every file under app/static into ASSETS_DIR under a name
+that contains a hash of its content (css/style.3f2a9c1e0b7d.css), writes
+.gz, and .br when the brotli module is installed, next to compressible
+files, and records the mapping in manifest.json. asset_url('css/style.css')
+returns the /assets/... URL of the current version. /assets serves it with
+year-long immutable caching, picking the precompressed file that matches
+the client's Accept-Encoding.
+
+The app runs build() at startup (it only writes files that are missing,
+so it is cheap once built); deployments can also build ahead of time:
+
+    flask --app app assets build
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+import click
+from flask import abort, current_app, request, send_file, url_for
+from flask.cli import AppGroup
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.map', '.ico'}
+# Smaller files gain nothing from compression
+MIN_COMPRESS_SIZE = 512
+
+
+def _fingerprinted(rel_path, digest):
+    base, ext = os.path.splitext(rel_path)
+    return f'{base}.{digest[:12]}{ext}'
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build(static_dir, out_dir):
+    """Fingerprint and compress every file in static_dir. Returns the
+    manifest {original path: fingerprinted path}."""
+    manifest = {}
+    for dirpath, _, filenames in os.walk(static_dir):
+        for filename in filenames:
+            src = os.path.join(dirpath, filename)
+            rel_path = os.path.relpath(src, static_dir).replace(os.sep, '/')
+            with open(src, 'rb') as f:
+                data = f.read()
+            name = _fingerprinted(rel_path, hashlib.sha256(data).hexdigest())
+            manifest[rel_path] = name
+
+            dest = os.path.join(out_dir, name)
+            if os.path.exists(dest):
+                continue
+            if os.path.splitext(filename)[1].lower() in COMPRESSIBLE and len(data) >= MIN_COMPRESS_SIZE:
+                # mtime=0 keeps the .gz byte-identical across builds and hosts
+                _write(dest + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    _write(dest + '.br', brotli.compress(data))
+            # Written last: its presence marks the set as complete
+            _write(dest, data)
+
+    _write(os.path.join(out_dir, 'manifest.json'), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def asset_url(path):
+    name = current_app.asset_manifest.get(path)
+    if name is None:
+        return url_for('static', filename=path)
+    return url_for('assets', filename=name)
+
+
+def serve_asset(filename):
+    root = current_app.config['ASSETS_DIR']
+    path = safe_join(root, filename)
+    if path is None or filename == 'manifest.json' or not os.path.isfile(path):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for enc, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[enc] and os.path.isfile(path + suffix):
+            encoding, path = enc, path + suffix
+            break
+
+    resp = send_file(path, mimetype=mimetype, max_age=31536000, conditional=True)
+    if encoding:
+        resp.headers['Content-Encoding'] = encoding
+    resp.headers['Cache-Control'] = CACHE_CONTROL
+    resp.vary.add('Accept-Encoding')
+    return resp
+
+
+def init_app(app):
+    if not app.config['ASSETS_DIR']:
+        app.config['ASSETS_DIR'] = os.path.join(app.instance_path, 'assets')
+    app.asset_manifest = {}
+    if app.config['ASSETS_BUILD_ON_STARTUP']:
+        app.asset_manifest = build(app.static_folder, app.config['ASSETS_DIR'])
+    else:
+        try:
+            with open(os.path.join(app.config['ASSETS_DIR'], 'manifest.json')) as f:
+                app.asset_manifest = json.load(f)
+        except FileNotFoundError:
+            # Not built yet: asset_url() falls back to /static
+            pass
+
+    app.add_url_rule('/assets/<path:filename>', 'assets', serve_asset)
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.cli.add_command(assets_cli)
+
+
+assets_cli = AppGroup('assets', help='Fingerprinted static files.')
+
+
+@assets_cli.command('build')
+def build_command():
+    """Fingerprint and precompress app/static into ASSETS_DIR."""
+    manifest = build(current_app.static_folder, current_app.config['ASSETS_DIR'])
+    click.echo(f"{len(manifest)} file(s) in {current_app.config['ASSETS_DIR']}"
+               + ('' if brotli else ' (install brotli for .br files)'))
@@ -0,0 +1,129 @@
+"""Admin authorization without a role query on every request.
+
+auth.login stores the user's role and role_version in the session. Admin
+pages trust the session role as long as the user's role_version still
+matches the server-side list of admins, which is loaded with one query and
+refreshed every ttl seconds. Admin writes (any non-GET request) re-check
+the role against the primary, so they stop the moment an admin is demoted.
+Demote with:
+
+    flask --app app admins demote someone@example.com
+
+It bumps role_version, which ends the user's admin sessions: other workers
+stop showing admin pages within ttl seconds, the worker that ran
+AdminDirectory.demote() immediately.
+"""
+import threading
+import time
+from functools import wraps
+
+import click
+from flask import current_app, flash, redirect, request, session, url_for
+from flask.cli import AppGroup
+
+
+class AdminDirectory:
+    def __init__(self, ttl=5):
+        self.ttl = ttl
+        self._admins = {}          # user_id -> role_version
+        self._revoked = {}         # user_id -> role_version demoted here
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl
+
+    def refresh(self):
+        db = current_app.get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                cursor.execute("SELECT user_id, role_version FROM users WHERE role = 'admin'")
+                admins = {r['user_id']: r['role_version'] for r in cursor.fetchall()}
+        finally:
+            db.close()
+        with self._lock:
+            # _revoked is kept: a refresh that read the list just before a
+            # demotion committed must not let the old version back in
+            self._admins = admins
+            self._loaded_at = time.monotonic()
+
+    def is_admin(self, user_id, role_version):
+        if self._stale():
+            self.refresh()
+        with self._lock:
+            if self._revoked.get(user_id) == role_version:
+                return False
+            return self._admins.get(user_id) == role_version
+
+    def is_admin_now(self, user_id, role_version):
+        """Check against the primary, bypassing the cached list."""
+        db = current_app.get_db_connection()
+        with db.cursor() as cursor:
+            cursor.execute("SELECT role, role_version FROM users WHERE user_id = %s", (user_id,))
+            user = cursor.fetchone()
+        return user is not None and user['role'] == 'admin' and user['role_version'] == role_version
+
+    def revoke(self, user_id):
+        with self._lock:
+            version = self._admins.pop(user_id, None)
+            if version is not None:
+                self._revoked[user_id] = version
+
+    def demote(self, user_id):
+        """Make an admin a customer; returns False if they were not an admin."""
+        db = current_app.get_db_connection()
+        try:
+            with db.cursor() as cursor:
+                demoted = cursor.execute(
+                    "UPDATE users SET role = 'customer', role_version = role_version + 1 "
+                    "WHERE user_id = %s AND role = 'admin'",
+                    (user_id,)
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        self.revoke(user_id)
+        return bool(demoted)
+
+
+def admin_required(view):
+    """Only let logged-in admins through; everyone else is redirected."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if 'user_id' not in session:
+            return redirect(url_for('auth.login'))
+
+        directory = current_app.admin_directory
+        user_id, role_version = session['user_id'], session.get('role_version', 0)
+        allowed = session.get('role') == 'admin' and directory.is_admin(user_id, role_version)
+        # Changes are rare enough to afford the primary lookup
+        if allowed and request.method != 'GET':
+            allowed = directory.is_admin_now(user_id, role_version)
+        if not allowed:
+            flash('Admin access required.', 'danger')
+            return redirect(url_for('main.index'))
+
+        return view(*args, **kwargs)
+    return wrapped
+
+
+admins_cli = AppGroup('admins', help='Admin accounts.')
+
+
+@admins_cli.command('demote')
+@click.argument('email')
+def demote_command(email):
+    """Take admin rights away from the user with this email."""
+    db = current_app.get_db_connection()
+    try:
+        with db.cursor() as cursor:
+            cursor.execute("SELECT user_id FROM users WHERE email = %s", (email,))
+            user = cursor.fetchone()
+        if user is None:
+            raise click.ClickException(f'No user with email {email}.')
+        if not current_app.admin_directory.demote(user['user_id']):
+            raise click.ClickException(f'{email} is not an admin.')
+    finally:
+        db.close()
+    click.echo(f'{email} is no longer an admin; their admin sessions have ended.')
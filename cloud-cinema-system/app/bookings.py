@@ -0,0 +1,45 @@
+"""Booking writes shared by every path that creates a booking."""
+
+
+def seat_label(row):
+    return f"{row['seat_row']}{row['seat_number']}"
+
+
+def create_booking(cursor, user_id, showtime_id, seat_ids):
+    """Insert a booking and all of its seats in a fixed number of statements.
+
+    Runs inside the caller's transaction (the caller commits). Returns a dict
+    with booking_id, showtime_id, seat_ids and the seat labels ('A1', ...),
+    so the confirmation page needs no further queries.
+    """
+    seat_ids = sorted(set(seat_ids))
+    if not seat_ids:
+        raise ValueError('A booking needs at least one seat.')
+
+    cursor.execute(
+        'INSERT INTO bookings (user_id, showtime_id) VALUES (%s, %s)',
+        (user_id, showtime_id)
+    )
+    booking_id = cursor.lastrowid
+
+    # One multi-row INSERT for all seats instead of one round trip per seat
+    rows = ','.join(['(%s, %s)'] * len(seat_ids))
+    params = []
+    for sid in seat_ids:
+        params.extend((booking_id, sid))
+    cursor.execute(f'INSERT INTO booking_seats (booking_id, seat_id) VALUES {rows}', params)
+
+    placeholders = ','.join(['%s'] * len(seat_ids))
+    cursor.execute(
+        f'SELECT seat_id, seat_row, seat_number FROM seats WHERE seat_id IN ({placeholders}) ORDER BY seat_row, seat_number',
+        tuple(seat_ids)
+    )
+    seats = [seat_label(r) for r in cursor.fetchall()]
+
+    return {
+        'booking_id': booking_id,
+        'user_id': user_id,
+        'showtime_id': showtime_id,
+        'seat_ids': seat_ids,
+        'seats': seats,
+    }
@@ -0,0 +1,283 @@
+import asyncio
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires = item
+                if expires is None or expires > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class SQLiteStore:
+    """Small key/value store in a local SQLite file, shared by all workers
+    on the same host. Values are pickled; expired rows are ignored on read.
+
+    Every delete bumps the key's generation, so a writer that read the
+    generation before a slow load can refuse to store a value that was
+    invalidated while it was loading.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS generations (key TEXT PRIMARY KEY, generation INTEGER NOT NULL)')
+
+    def _conn(self):
+        # sqlite3 connections are not shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get_entry(self, key):
+        """Return (value, expires) with expires as a time.time() timestamp
+        or None, or None if the key is missing or expired."""
+        row = self._conn().execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return pickle.loads(row[0]), row[1]
+
+    def get(self, key, default=None):
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def generation(self, key):
+        row = self._conn().execute('SELECT generation FROM generations WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else 0
+
+    def set(self, key, value, ttl=None, generation=None):
+        """Store a value. With a generation, the row is only written if no
+        delete happened since that generation was read; returns whether it
+        was written."""
+        expires = time.time() + ttl if ttl else None
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        conn = self._conn()
+        if generation is None:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                (key, blob, expires)
+            )
+            return True
+        # Check and write in one statement so a delete cannot slip between them
+        cur = conn.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) SELECT ?, ?, ? '
+            'WHERE COALESCE((SELECT generation FROM generations WHERE key = ?), 0) = ?',
+            (key, blob, expires, key, generation)
+        )
+        return cur.rowcount > 0
+
+    def delete(self, key):
+        conn = self._conn()
+        # Bump first: a load that started before this can no longer store
+        conn.execute(
+            'INSERT INTO generations (key, generation) VALUES (?, 1) '
+            'ON CONFLICT(key) DO UPDATE SET generation = generation + 1',
+            (key,)
+        )
+        conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute('UPDATE generations SET generation = generation + 1')
+        conn.execute('DELETE FROM cache')
+
+
+class TieredCache:
+    """In-process LRU in front of an optional shared store.
+
+    A delete removes the key from this process and from the shared store;
+    other processes drop their copy when its LRU TTL runs out, so that TTL
+    bounds how stale another worker can be after an invalidation. A copy
+    taken from the shared store keeps the shared row's expiry rather than
+    starting a fresh LRU TTL, so it cannot outlive that bound.
+
+    Loads are tagged with the key's generation (local and shared) when they
+    start; if the key is deleted while the loader runs, its result is
+    returned to the caller but not cached, so a load that read the database
+    before an invalidation cannot put the old value back.
+    """
+
+    def __init__(self, local, shared=None, shared_ttl=None):
+        self.local = local
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        self.shared_hits = 0
+        self.shared_errors = 0
+        self._generations = {}
+        self._cleared = 0
+        self._lock = threading.Lock()
+
+    def _shared_get(self, key):
+        try:
+            entry = self.shared.get_entry(key)
+        except sqlite3.Error:
+            self.shared_errors += 1
+            return _MISSING
+        if entry is None:
+            return _MISSING
+        value, expires = entry
+        self.shared_hits += 1
+        ttl = self.local.ttl
+        if expires is not None:
+            remaining = expires - time.time()
+            if remaining <= 0:
+                return value
+            ttl = min(ttl, remaining) if ttl else remaining
+        self.local.set(key, value, ttl)
+        return value
+
+    def _generation(self, key):
+        """Generations of the key before a load: (local, shared). shared is
+        None when there is no shared store or it could not be read, in which
+        case the result is not written to it."""
+        with self._lock:
+            local = self._local_generation(key)
+        shared = None
+        if self.shared is not None:
+            try:
+                shared = self.shared.generation(key)
+            except sqlite3.Error:
+                self.shared_errors += 1
+        return local, shared
+
+    def _local_generation(self, key):
+        return self._cleared, self._generations.get(key, 0)
+
+    def _fill_local(self, key, value, generation):
+        with self._lock:
+            if self._local_generation(key) == generation[0]:
+                self.local.set(key, value)
+
+    def _fill_shared(self, key, value, generation):
+        with self._lock:
+            if generation[1] is None or self._local_generation(key) != generation[0]:
+                return
+        try:
+            self.shared.set(key, value, self.shared_ttl, generation=generation[1])
+        except sqlite3.Error:
+            self.shared_errors += 1
+
+    def get_or_load(self, key, loader):
+        value = self.local.get(key, _MISSING)
+        if value is _MISSING and self.shared is not None:
+            value = self._shared_get(key)
+        if value is _MISSING:
+            generation = self._generation(key)
+            value = loader()
+            self._fill_local(key, value, generation)
+            self._fill_shared(key, value, generation)
+        return value
+
+    async def get_or_load_async(self, key, loader):
+        """get_or_load() with a coroutine function as the loader. The shared
+        store is a blocking SQLite file, so it is used from a worker thread."""
+        value = self.local.get(key, _MISSING)
+        if value is _MISSING and self.shared is not None:
+            value = await asyncio.to_thread(self._shared_get, key)
+        if value is _MISSING:
+            if self.shared is not None:
+                generation = await asyncio.to_thread(self._generation, key)
+            else:
+                generation = self._generation(key)
+            value = await loader()
+            self._fill_local(key, value, generation)
+            if self.shared is not None:
+                await asyncio.to_thread(self._fill_shared, key, value, generation)
+        return value
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, self.shared_ttl)
+            except sqlite3.Error:
+                self.shared_errors += 1
+
+    def delete(self, *keys):
+        for key in keys:
+            with self._lock:
+                self._generations[key] = self._generations.get(key, 0) + 1
+                self.local.delete(key)
+            if self.shared is not None:
+                try:
+                    self.shared.delete(key)
+                except sqlite3.Error:
+                    self.shared_errors += 1
+
+    def clear(self):
+        with self._lock:
+            self._cleared += 1
+            self._generations.clear()
+            self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self):
+        data = self.local.stats()
+        data['shared_hits'] = self.shared_hits
+        data['shared_errors'] = self.shared_errors
+        # A local miss that the shared store answered is still a hit overall
+        data['misses'] -= self.shared_hits
+        return data
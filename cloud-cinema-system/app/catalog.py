@@ -0,0 +1,96 @@
+"""Cached catalog reads (movies and their upcoming showtimes).
+
+The catalog only changes through the admin routes, which call the
+invalidate_* helpers below right after they commit. Misses are loaded from
+the primary, not a replica, so a lagging replica cannot put the old rows
+back into the cache (and its shared tier) after an invalidation. The
+*_async variants serve the async handlers (asgi.py) from the same cache
+entries.
+"""
+from datetime import date
+
+from flask import current_app
+
+from . import aiodb, replicas
+
+
+def _movies_key():
+    return 'movies'
+
+
+def _movie_key(movie_id):
+    return f'movie:{movie_id}'
+
+
+def _showtimes_key(movie_id):
+    # Includes the date because the query filters on show_date >= CURDATE()
+    return f'showtimes:{movie_id}:{date.today().isoformat()}'
+
+
+def _query(sql, params=(), one=False):
+    with replicas.primary_cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone() if one else cursor.fetchall()
+
+
+# Movies and showtimes with removing set are being deleted (see removal.py)
+_MOVIES = "SELECT * FROM movies WHERE removing = 0"
+_MOVIE = "SELECT * FROM movies WHERE movie_id = %s AND removing = 0"
+_UPCOMING_SHOWTIMES = """
+    SELECT s.*, sc.screen_name
+    FROM showtimes s
+    JOIN screens sc ON s.screen_id = sc.screen_id
+    WHERE s.movie_id = %s AND s.show_date >= CURDATE() AND s.removing = 0
+    ORDER BY s.show_date, s.show_time
+"""
+
+
+def get_movies():
+    return current_app.catalog_cache.get_or_load(
+        _movies_key(),
+        lambda: list(_query(_MOVIES))
+    )
+
+
+def get_movie(movie_id):
+    return current_app.catalog_cache.get_or_load(
+        _movie_key(movie_id),
+        lambda: _query(_MOVIE, (movie_id,), one=True)
+    )
+
+
+def get_upcoming_showtimes(movie_id):
+    return current_app.catalog_cache.get_or_load(
+        _showtimes_key(movie_id),
+        lambda: list(_query(_UPCOMING_SHOWTIMES, (movie_id,)))
+    )
+
+
+async def get_movies_async():
+    async def load():
+        return list(await aiodb.read_all(_MOVIES, primary=True))
+    return await current_app.catalog_cache.get_or_load_async(_movies_key(), load)
+
+
+async def get_movie_async(movie_id):
+    async def load():
+        return await aiodb.read_one(_MOVIE, (movie_id,), primary=True)
+    return await current_app.catalog_cache.get_or_load_async(_movie_key(movie_id), load)
+
+
+async def get_upcoming_showtimes_async(movie_id):
+    async def load():
+        return list(await aiodb.read_all(_UPCOMING_SHOWTIMES, (movie_id,), primary=True))
+    return await current_app.catalog_cache.get_or_load_async(_showtimes_key(movie_id), load)
+
+
+def invalidate_movie(movie_id=None):
+    """Drop the movie list and, if given, that movie's detail entry."""
+    keys = [_movies_key()]
+    if movie_id is not None:
+        keys.append(_movie_key(movie_id))
+    current_app.catalog_cache.delete(*keys)
+
+
+def invalidate_showtimes(*movie_ids):
+    current_app.catalog_cache.delete(*[_showtimes_key(m) for m in movie_ids if m is not None])
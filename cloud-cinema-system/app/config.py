@@ -9,4 +9,125 @@ class Config:
     DB_HOST = os.environ.get('DB_HOST')
     DB_USER = os.environ.get('DB_USER')
     DB_PASSWORD = os.environ.get('DB_PASSWORD')
-    DB_NAME = os.environ.get('DB_NAME')
\ No newline at end of file
+    DB_NAME = os.environ.get('DB_NAME')
+
+    # Connection pool settings
+    DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', 1))
+    DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 10))
+    DB_POOL_MAX_LIFETIME = int(os.environ.get('DB_POOL_MAX_LIFETIME', 1800))   # seconds before a connection is recycled
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))             # seconds to wait for a free connection
+    DB_POOL_PING_INTERVAL = int(os.environ.get('DB_POOL_PING_INTERVAL', 30))  # ping idle connections older than this
+
+    # Read replicas of DB_HOST ("host[:port],..."; empty = everything on the
+    # primary). A session reads from the primary for READ_YOUR_WRITES_SECONDS
+    # after it writes; an unreachable replica is skipped for DB_REPLICA_RETRY seconds
+    DB_REPLICA_HOSTS = os.environ.get('DB_REPLICA_HOSTS', '')
+    DB_REPLICA_CONNECT_TIMEOUT = int(os.environ.get('DB_REPLICA_CONNECT_TIMEOUT', 2))
+    DB_REPLICA_RETRY = int(os.environ.get('DB_REPLICA_RETRY', 30))
+    READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 10))
+
+    # Seconds before a cached seat map is reloaded (picks up other workers' bookings)
+    SEAT_INDEX_TTL = float(os.environ.get('SEAT_INDEX_TTL', 5))
+
+    # Seconds a user may hold selected seats before confirming the booking
+    SEAT_HOLD_TTL = int(os.environ.get('SEAT_HOLD_TTL', 300))
+
+    # Largest group the "best available" picker on the seat map will seat
+    BEST_SEATS_MAX = int(os.environ.get('BEST_SEATS_MAX', 10))
+
+    # Waiting room in front of the seat maps (see waiting_room.py): users
+    # picking seats at once per showtime (0 = no waiting room) and across all
+    # showtimes (0 = no limit), seconds an admission lasts, queue length
+    # beyond which new arrivals get a 503, and how often each process
+    # refreshes a room / the waiting page polls
+    WAITING_ROOM_BUDGET = int(os.environ.get('WAITING_ROOM_BUDGET', 0))
+    WAITING_ROOM_GLOBAL_BUDGET = int(os.environ.get('WAITING_ROOM_GLOBAL_BUDGET', 0))
+    WAITING_ROOM_ADMIT_TTL = int(os.environ.get('WAITING_ROOM_ADMIT_TTL', 900))
+    WAITING_ROOM_MAX_QUEUE = int(os.environ.get('WAITING_ROOM_MAX_QUEUE', 20000))
+    WAITING_ROOM_REFRESH = float(os.environ.get('WAITING_ROOM_REFRESH', 1))
+    WAITING_ROOM_POLL = int(os.environ.get('WAITING_ROOM_POLL', 5))
+
+    # Bookings per page on the profile page (upcoming and past are paged separately)
+    PROFILE_PAGE_SIZE = int(os.environ.get('PROFILE_PAGE_SIZE', 10))
+
+    # Catalog cache: in-process LRU, optionally backed by a SQLite file shared
+    # by all workers on the host (leave CATALOG_CACHE_PATH empty to disable)
+    CATALOG_CACHE_SIZE = int(os.environ.get('CATALOG_CACHE_SIZE', 1024))
+    CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', 60))
+    CATALOG_CACHE_PATH = os.environ.get('CATALOG_CACHE_PATH', '')
+    CATALOG_CACHE_SHARED_TTL = int(os.environ.get('CATALOG_CACHE_SHARED_TTL', 600))
+
+    # Seconds before the cached admin list is reloaded (bounds how long a demoted admin
+    # can still view admin pages on other workers; admin writes check the primary)
+    ADMIN_CACHE_TTL = int(os.environ.get('ADMIN_CACHE_TTL', 5))
+
+    # Deletes touching more bookings than this run as a chunked background job
+    ADMIN_DELETE_SYNC_LIMIT = int(os.environ.get('ADMIN_DELETE_SYNC_LIMIT', 1000))
+    ADMIN_DELETE_CHUNK_SIZE = int(os.environ.get('ADMIN_DELETE_CHUNK_SIZE', 500))
+    # A background job with no progress for this long is taken as dead and restarted
+    ADMIN_JOB_STALE_SECONDS = int(os.environ.get('ADMIN_JOB_STALE_SECONDS', 600))
+
+    # SQL instrumentation for /admin/metrics and the slow-query log
+    DB_INSTRUMENTATION = os.environ.get('DB_INSTRUMENTATION', '0').lower() in ('1', 'true', 'yes')
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+
+    # Live seat map: workers publish seat events over UDP to the SSE stream
+    # (python -m app.event_stream) on every host listed here; the browser
+    # connects to SEAT_EVENTS_URL/<showtime_id> (leave empty to only poll)
+    SEAT_EVENTS_PUBLISH_ADDRS = os.environ.get('SEAT_EVENTS_PUBLISH_ADDRS', '127.0.0.1:5052')
+    SEAT_EVENTS_LISTEN_ADDR = os.environ.get('SEAT_EVENTS_LISTEN_ADDR', '127.0.0.1:5052')
+    SEAT_EVENTS_HTTP_ADDR = os.environ.get('SEAT_EVENTS_HTTP_ADDR', '0.0.0.0:5051')
+    SEAT_EVENTS_URL = os.environ.get('SEAT_EVENTS_URL', '')
+    SEAT_EVENTS_SECRET = os.environ.get('SEAT_EVENTS_SECRET', '')             # defaults to SECRET_KEY
+    SEAT_EVENTS_MAX_CLIENTS = int(os.environ.get('SEAT_EVENTS_MAX_CLIENTS', 10000))
+    SEAT_EVENTS_QUEUE_SIZE = int(os.environ.get('SEAT_EVENTS_QUEUE_SIZE', 32))  # per client, before a resync
+
+    # Showtime scheduling: minutes a screen stays blocked after a movie ends,
+    # and the size limits of one bulk scheduling submission
+    SHOWTIME_TURNOVER_MINUTES = int(os.environ.get('SHOWTIME_TURNOVER_MINUTES', 15))
+    SCHEDULE_MAX_SLOTS = int(os.environ.get('SCHEDULE_MAX_SLOTS', 5000))
+    SCHEDULE_BATCH_SIZE = int(os.environ.get('SCHEDULE_BATCH_SIZE', 500))  # rows per INSERT
+
+    # Password hashing runs in a process pool (0 workers = on the request
+    # thread); at most MAX_PENDING calls queue, each waiting up to WAIT seconds
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))
+    PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', 2))
+
+    # Number of proxies (e.g. the ALB) whose X-Forwarded-For is trusted for the client IP
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+
+    # Login attempts per client IP, and failed logins per account, per minute
+    # (0 = no limit). Without PROXY_FIX_X_FOR every client behind the load
+    # balancer shares its IP, so the per-IP limit is then off by default
+    LOGIN_ATTEMPTS_PER_IP = int(os.environ.get('LOGIN_ATTEMPTS_PER_IP', 30 if PROXY_FIX_X_FOR else 0))
+    LOGIN_FAILURES_PER_ACCOUNT = int(os.environ.get('LOGIN_FAILURES_PER_ACCOUNT', 10))
+
+    # Poster variants: 'local' (files under POSTER_LOCAL_DIR, default
+    # instance/media, served at /media/) or 's3'; POSTER_BASE_URL may point
+    # at a CDN in front of either
+    POSTER_STORAGE = os.environ.get('POSTER_STORAGE', 'local')
+    POSTER_LOCAL_DIR = os.environ.get('POSTER_LOCAL_DIR', '')
+    POSTER_S3_BUCKET = os.environ.get('POSTER_S3_BUCKET', '')
+    POSTER_S3_PREFIX = os.environ.get('POSTER_S3_PREFIX', '')
+    POSTER_BASE_URL = os.environ.get('POSTER_BASE_URL', '')
+
+    # Fingerprinted, precompressed copies of app/static served at /assets/
+    # (default dir instance/assets); built at startup unless disabled, e.g.
+    # when the image ships with the output of `flask --app app assets build`
+    ASSETS_DIR = os.environ.get('ASSETS_DIR', '')
+    ASSETS_BUILD_ON_STARTUP = os.environ.get('ASSETS_BUILD_ON_STARTUP', '1').lower() in ('1', 'true', 'yes')
+
+    # ASGI mode (asgi.py): async connection pool of the async handlers, and
+    # threads that run every other (sync) route
+    ASYNC_DB_POOL_MIN_SIZE = int(os.environ.get('ASYNC_DB_POOL_MIN_SIZE', 1))
+    ASYNC_DB_POOL_MAX_SIZE = int(os.environ.get('ASYNC_DB_POOL_MAX_SIZE', 20))
+    ASGI_SYNC_THREADS = int(os.environ.get('ASGI_SYNC_THREADS', 16))
+
+    # Archival (flask --app app archive run, nightly): showtimes dated more
+    # than ARCHIVE_AFTER_DAYS days ago (at least 1) move to the history
+    # tables, ARCHIVE_CHUNK_SIZE showtimes per transaction
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 1))
+    ARCHIVE_CHUNK_SIZE = int(os.environ.get('ARCHIVE_CHUNK_SIZE', 20))
+    ARCHIVE_CHUNK_PAUSE = float(os.environ.get('ARCHIVE_CHUNK_PAUSE', 0.1))  # seconds between chunks
@@ -1,5 +1,7 @@
 -- USE THE EXISTING DATABASE
 -- Use the database created in RDS (matches DB_NAME in .env)
+-- This is the baseline schema. After loading it, apply the numbered files in
+-- app/migrations with:  flask --app app db upgrade
 USE moviedb;
 
 -- =========================
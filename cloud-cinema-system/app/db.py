@@ -0,0 +1,214 @@
+import threading
+import time
+
+from pymysql.constants import SERVER_STATUS
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out in time."""
+
+
+class PooledConnection:
+    """Wraps a pymysql connection so close() hands it back to the pool."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        # Set while the connection is bound to a Flask app context
+        self.request_scoped = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._raw.cursor(*args, **kwargs)
+        wrapper = self._pool.cursor_wrapper
+        return wrapper(cursor) if wrapper else cursor
+
+    def commit(self, notify=True):
+        self._raw.commit()
+        # notify=False: bookkeeping the user does not read back (no pinning)
+        if notify and self._pool.after_commit:
+            self._pool.after_commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def close(self):
+        # Routes still call db.close(); inside a request the connection is
+        # kept until teardown so later calls in the same request reuse it.
+        if self.request_scoped:
+            return
+        self._pool.release(self)
+
+    def in_transaction(self):
+        return bool(self._raw.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS)
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of pymysql connections."""
+
+    def __init__(self, connect, min_size=1, max_size=10, max_lifetime=1800,
+                 timeout=5.0, ping_interval=30, name='primary'):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError('Invalid pool size settings.')
+        self._connect = connect
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        # Optional callable applied to every cursor (see instrumentation.py)
+        self.cursor_wrapper = None
+        # Optional callable run after every commit (see replicas.py)
+        self.after_commit = None
+
+        self._idle = []
+        self._size = 0
+        self._warmed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'timeouts': 0,
+            'wait_time': 0.0,
+        }
+
+    def _open(self):
+        conn = PooledConnection(self, self._connect())
+        with self._cond:
+            self._stats['created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn._raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats['discarded'] += 1
+            self._cond.notify()
+
+    def _expired(self, conn, now):
+        return self.max_lifetime and now - conn.created_at > self.max_lifetime
+
+    def _healthy(self, conn, now):
+        if now - conn.last_used < self.ping_interval:
+            return True
+        try:
+            conn._raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _warm(self):
+        # Open min_size connections the first time the pool is used
+        with self._cond:
+            if self._warmed:
+                return
+            self._warmed = True
+            missing = max(0, self.min_size - self._size)
+            self._size += missing
+        opened = []
+        try:
+            for _ in range(missing):
+                opened.append(self._open())
+        finally:
+            with self._cond:
+                self._size -= missing - len(opened)
+                self._idle.extend(opened)
+                self._cond.notify_all()
+
+    def acquire(self, timeout=None):
+        if not self._warmed:
+            self._warm()
+
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        while True:
+            conn = None
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout('Timed out waiting for a database connection.')
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    conn = self._idle.pop()
+                else:
+                    # Reserve a slot before connecting outside the lock
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                now = time.monotonic()
+                if self._expired(conn, now) or not self._healthy(conn, now):
+                    self._discard(conn)
+                    continue
+
+            with self._cond:
+                self._stats['checkouts'] += 1
+                self._stats['wait_time'] += time.monotonic() - start
+            conn.request_scoped = False
+            return conn
+
+    def release(self, conn):
+        conn.request_scoped = False
+        try:
+            # Never hand out a connection with an open transaction (or a
+            # stale REPEATABLE READ snapshot from a previous request)
+            if conn.in_transaction():
+                conn._raw.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+
+        now = time.monotonic()
+        if self._expired(conn, now):
+            self._discard(conn)
+            return
+
+        conn.last_used = now
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def discard(self, conn):
+        """Close a checked-out connection instead of returning it, e.g. one
+        left in the middle of an unbuffered result."""
+        conn.request_scoped = False
+        self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            data = dict(self._stats)
+            data.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            })
+        return data
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
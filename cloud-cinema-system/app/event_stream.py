@@ -0,0 +1,190 @@
+"""Asyncio Server-Sent Events stream of seat changes.
+
+Runs next to the WSGI workers as its own process, so an open browser
+connection costs a few KB in this event loop rather than a blocked worker:
+
+    python -m app.event_stream
+
+It receives the signed datagrams sent by seat_events.publish() and fans
+them out to every browser subscribed to that showtime:
+
+    GET /events/<showtime_id>   ->   text/event-stream
+
+Memory stays bounded: at most SEAT_EVENTS_MAX_CLIENTS connections, and each
+has a queue of SEAT_EVENTS_QUEUE_SIZE events. A client whose queue fills up
+(it is not reading fast enough) gets its backlog replaced by one 'resync'
+event, telling the page to reload availability from the JSON endpoint.
+"""
+import asyncio
+import json
+import logging
+import re
+
+from .config import Config
+from .seat_events import decode, parse_addrs, secret_for
+
+log = logging.getLogger('cloud_cinema.event_stream')
+
+_PATH = re.compile(r'^/events/(\d+)$')
+_HEARTBEAT = 15         # seconds; keeps load balancer idle timeouts at bay
+_WRITE_TIMEOUT = 10     # seconds a client may take to accept a write
+_RESYNC = ('resync', '{}')
+
+
+class Subscriber:
+    __slots__ = ('queue',)
+
+    def __init__(self, queue_size):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def offer(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Too far behind: drop the backlog and let the page reload
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_RESYNC)
+
+
+class Hub:
+    """showtime_id -> subscribers, plus the global client budget."""
+
+    def __init__(self, max_clients, queue_size):
+        self.max_clients = max_clients
+        self.queue_size = queue_size
+        self.clients = 0
+        self._topics = {}
+
+    def subscribe(self, showtime_id):
+        if self.clients >= self.max_clients:
+            return None
+        sub = Subscriber(self.queue_size)
+        self._topics.setdefault(showtime_id, set()).add(sub)
+        self.clients += 1
+        return sub
+
+    def unsubscribe(self, showtime_id, sub):
+        subs = self._topics.get(showtime_id)
+        if subs and sub in subs:
+            subs.discard(sub)
+            self.clients -= 1
+            if not subs:
+                del self._topics[showtime_id]
+
+    def publish(self, event):
+        subs = self._topics.get(event['showtime_id'])
+        if not subs:
+            return
+        item = (event['kind'], json.dumps({'seats': event['seats']}))
+        for sub in subs:
+            sub.offer(item)
+
+
+class _EventReceiver(asyncio.DatagramProtocol):
+    def __init__(self, hub, secret):
+        self.hub = hub
+        self.secret = secret
+
+    def datagram_received(self, data, addr):
+        event = decode(self.secret, data)
+        if event is None:
+            log.warning('rejected seat event from %s', addr[0])
+            return
+        self.hub.publish(event)
+
+
+async def _respond(writer, status, body=b''):
+    writer.write(
+        f'HTTP/1.1 {status}\r\nContent-Type: text/plain\r\n'
+        f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body
+    )
+    await writer.drain()
+
+
+async def _read_request(reader):
+    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout=_WRITE_TIMEOUT)
+    lines = head.decode('latin-1').split('\r\n')
+    method, path, _ = lines[0].split(' ', 2)
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return method, path.split('?', 1)[0], headers
+
+
+async def _stream(writer, sub, resume):
+    writer.write(
+        b'HTTP/1.1 200 OK\r\n'
+        b'Content-Type: text/event-stream\r\n'
+        b'Cache-Control: no-cache\r\n'
+        b'X-Accel-Buffering: no\r\n'
+        b'Connection: keep-alive\r\n\r\n'
+        b'retry: 3000\n\n'
+    )
+    if resume:
+        # Reconnected: events may have been missed in between
+        sub.offer(_RESYNC)
+    seq = 0
+    while True:
+        try:
+            kind, data = await asyncio.wait_for(sub.queue.get(), timeout=_HEARTBEAT)
+            seq += 1
+            writer.write(f'id: {seq}\nevent: {kind}\ndata: {data}\n\n'.encode())
+        except asyncio.TimeoutError:
+            writer.write(b': ping\n\n')
+        await asyncio.wait_for(writer.drain(), timeout=_WRITE_TIMEOUT)
+
+
+def _handler(hub):
+    async def handle(reader, writer):
+        sub = showtime_id = None
+        try:
+            try:
+                method, path, headers = await _read_request(reader)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                    asyncio.TimeoutError, ValueError):
+                return
+            m = _PATH.match(path)
+            if method != 'GET' or not m:
+                await _respond(writer, '404 Not Found', b'Not found.')
+                return
+            showtime_id = int(m.group(1))
+            sub = hub.subscribe(showtime_id)
+            if sub is None:
+                # The page keeps polling instead
+                await _respond(writer, '503 Service Unavailable', b'Too many listeners.')
+                return
+            await _stream(writer, sub, 'last-event-id' in headers)
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            if sub is not None:
+                hub.unsubscribe(showtime_id, sub)
+            writer.close()
+    return handle
+
+
+async def serve(config=Config):
+    hub = Hub(config.SEAT_EVENTS_MAX_CLIENTS, config.SEAT_EVENTS_QUEUE_SIZE)
+    loop = asyncio.get_running_loop()
+
+    secret = secret_for(config.SEAT_EVENTS_SECRET, config.SECRET_KEY)
+    host, port = parse_addrs(config.SEAT_EVENTS_LISTEN_ADDR)[0]
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _EventReceiver(hub, secret), local_addr=(host, port))
+
+    http_host, http_port = parse_addrs(config.SEAT_EVENTS_HTTP_ADDR)[0]
+    server = await asyncio.start_server(_handler(hub), http_host, http_port, limit=8192)
+    log.info('seat events on udp %s:%s, SSE on http %s:%s', host, port, http_host, http_port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        transport.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve())
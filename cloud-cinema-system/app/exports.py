@@ -0,0 +1,175 @@
+"""Streaming bookings export (CSV or JSON Lines).
+
+The query runs on a connection of its own with an unbuffered server-side
+cursor (SSDictCursor), and rows are turned into output lines as they
+arrive, so memory use does not depend on how many bookings are exported.
+Rows come ordered by booking_id, one per booked seat, and are folded into
+one record per booking on the fly (no GROUP_CONCAT / temporary table).
+Archived bookings (see archive.py) are exported first, by a query of their
+own on the history tables, then the current ones.
+"""
+import csv
+import io
+import json
+
+import pymysql
+
+COLUMNS = (
+    'booking_id', 'booking_time', 'cancelled', 'user_id', 'user_name', 'user_email',
+    'showtime_id', 'movie_id', 'title', 'screen_id', 'screen_name', 'show_date', 'show_time',
+    'price', 'seat_count', 'seats', 'amount',
+)
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+_STATUS = {
+    'all': '',
+    'active': ' AND b.cancelled = 0',
+    'cancelled': ' AND b.cancelled = 1',
+}
+_FETCH = 1000
+# (bookings, booking_seats, showtimes), in export order
+_TABLES = (
+    ('bookings_history', 'booking_seats_history', 'showtimes_history'),
+    ('bookings', 'booking_seats', 'showtimes'),
+)
+
+
+def build_query(date_from=None, date_to=None, movie_id=None, screen_id=None, status='all'):
+    """[(sql, params)], one query per set of tables in _TABLES."""
+    where, params = ['1 = 1'], []
+    if date_from:
+        where.append('s.show_date >= %s')
+        params.append(date_from)
+    if date_to:
+        where.append('s.show_date <= %s')
+        params.append(date_to)
+    if movie_id:
+        where.append('s.movie_id = %s')
+        params.append(movie_id)
+    if screen_id:
+        where.append('s.screen_id = %s')
+        params.append(screen_id)
+    sql = """
+        SELECT b.booking_id, b.booking_time, b.cancelled,
+               u.user_id, u.name AS user_name, u.email AS user_email,
+               s.showtime_id, s.movie_id, m.title, s.screen_id, sc.screen_name,
+               s.show_date, s.show_time, s.price,
+               se.seat_row, se.seat_number
+        FROM {bookings} b
+        JOIN users u ON b.user_id = u.user_id
+        JOIN {showtimes} s ON b.showtime_id = s.showtime_id
+        JOIN movies m ON s.movie_id = m.movie_id
+        JOIN screens sc ON s.screen_id = sc.screen_id
+        LEFT JOIN {booking_seats} bs ON bs.booking_id = b.booking_id
+        LEFT JOIN seats se ON bs.seat_id = se.seat_id
+        WHERE {where}
+        ORDER BY b.booking_id
+    """
+    where = ' AND '.join(where) + _STATUS[status]
+    return [(sql.format(bookings=bookings, booking_seats=booking_seats, showtimes=showtimes, where=where), params)
+            for bookings, booking_seats, showtimes in _TABLES]
+
+
+def _records(cursor):
+    """Fold the per-seat rows into one dict per booking."""
+    current, seats = None, []
+    while True:
+        rows = cursor.fetchmany(_FETCH)
+        if not rows:
+            break
+        for row in rows:
+            if current is None or row['booking_id'] != current['booking_id']:
+                if current is not None:
+                    yield _finish(current, seats)
+                current, seats = row, []
+            if row['seat_row'] is not None:
+                seats.append((row['seat_row'], row['seat_number']))
+    if current is not None:
+        yield _finish(current, seats)
+
+
+def _finish(row, seats):
+    record = {c: row.get(c) for c in COLUMNS}
+    seats.sort()
+    record['seat_count'] = len(seats)
+    record['seats'] = ' '.join(f'{r}{n}' for r, n in seats)
+    record['amount'] = row['price'] * len(seats)
+    return record
+
+
+def _csv_lines(records):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    for i, record in enumerate(records, 1):
+        writer.writerow([record[c] for c in COLUMNS])
+        # Hand out output in blocks rather than one tiny chunk per row
+        if i % 100 == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def _jsonl_lines(records):
+    for record in records:
+        yield json.dumps(record, default=str) + '\n'
+
+
+def stream_bookings(pool, fmt, **filters):
+    """Start the export and return a generator of output chunks.
+
+    The connection is taken and the query sent before this returns, so
+    connection and SQL errors surface before the response starts. From
+    then on the connection belongs to the started generator: it goes back
+    to the pool, with its session settings restored, when the generator is
+    exhausted, and is dropped when the generator is closed early (or
+    garbage collected).
+    """
+    queries = build_query(**filters)
+    lines = _csv_lines if fmt == 'csv' else _jsonl_lines
+
+    def generate():
+        conn = pool.acquire()
+        try:
+            with conn.cursor(pymysql.cursors.Cursor) as setup:
+                setup.execute("SELECT @@SESSION.net_write_timeout")
+                net_write_timeout = setup.fetchone()[0]
+                # A slow client must not make the server abort the result set
+                setup.execute("SET SESSION net_write_timeout = 600")
+            cursor = conn.cursor(pymysql.cursors.SSDictCursor)
+            cursor.execute(*queries[0])
+        except Exception:
+            pool.discard(conn)
+            raise
+
+        def records():
+            yield from _records(cursor)
+            # An unbuffered result must be read to the end before the next query
+            for sql, params in queries[1:]:
+                cursor.execute(sql, params)
+                yield from _records(cursor)
+
+        finished = False
+        try:
+            # Query sent; stream_bookings() returns here
+            yield ''
+            yield from lines(records())
+            cursor.close()
+            with conn.cursor() as setup:
+                setup.execute("SET SESSION net_write_timeout = %s", (net_write_timeout,))
+            finished = True
+        finally:
+            if finished:
+                pool.release(conn)
+            else:
+                # Client went away mid-export (or the restore failed):
+                # closing the cursor would read the rest of the result, so
+                # drop the connection instead
+                pool.discard(conn)
+
+    chunks = generate()
+    next(chunks)
+    return chunks
@@ -0,0 +1,153 @@
+"""Seat holds: short-lived seat locks that are turned into bookings.
+
+Every taken seat of a showtime has exactly one row in seat_holds, keyed by
+(showtime_id, seat_id). A row with booking_id NULL is a temporary hold that
+stops counting once expires_at has passed; a row with booking_id set is a
+sold seat. Because the primary key covers both cases, MySQL itself rejects a
+second hold or sale of the same seat, whichever worker it comes from.
+"""
+import secrets
+
+import pymysql
+
+from . import rollups
+from .bookings import create_booking
+
+# MySQL error codes
+ER_DUP_ENTRY = 1062
+ER_LOCK_DEADLOCK = 1213
+
+
+class SeatUnavailable(Exception):
+    """One or more seats are already held or sold."""
+
+
+class HoldExpired(Exception):
+    """The hold no longer exists (expired, released or reclaimed)."""
+
+
+def _placeholders(values):
+    return ','.join(['%s'] * len(values))
+
+
+def _bookable(cursor, showtime_id):
+    # Shared lock: waits for a removal that is closing the showtime, and
+    # keeps it from closing until this transaction commits
+    cursor.execute('SELECT removing FROM showtimes WHERE showtime_id = %s LOCK IN SHARE MODE', (showtime_id,))
+    row = cursor.fetchone()
+    return row is not None and not row['removing']
+
+
+def hold_seats(db, showtime_id, user_id, seat_ids, ttl):
+    """Hold seat_ids for user_id for ttl seconds and return the hold token.
+
+    Any earlier unconfirmed hold of the same user on this showtime is
+    released first. Raises SeatUnavailable if any seat is taken, or the
+    showtime is being removed.
+    """
+    # Insert in a fixed order so overlapping holds cannot deadlock each other
+    seat_ids = sorted(set(seat_ids))
+    token = secrets.token_hex(16)
+
+    for attempt in range(2):
+        try:
+            with db.cursor() as cursor:
+                if not _bookable(cursor, showtime_id):
+                    db.rollback()
+                    raise SeatUnavailable()
+                cursor.execute(
+                    'DELETE FROM seat_holds WHERE showtime_id = %s AND user_id = %s AND booking_id IS NULL',
+                    (showtime_id, user_id)
+                )
+                # Reclaim expired holds on the requested seats
+                cursor.execute(
+                    f"""DELETE FROM seat_holds
+                        WHERE showtime_id = %s AND seat_id IN ({_placeholders(seat_ids)})
+                          AND booking_id IS NULL AND expires_at < NOW()""",
+                    (showtime_id, *seat_ids)
+                )
+                rows = ','.join(['(%s, %s, %s, %s, NOW() + INTERVAL %s SECOND)'] * len(seat_ids))
+                params = []
+                for sid in seat_ids:
+                    params.extend((showtime_id, sid, user_id, token, int(ttl)))
+                cursor.execute(
+                    f'INSERT INTO seat_holds (showtime_id, seat_id, user_id, hold_token, expires_at) VALUES {rows}',
+                    params
+                )
+            db.commit()
+            return token
+        except pymysql.err.IntegrityError as e:
+            db.rollback()
+            if e.args and e.args[0] == ER_DUP_ENTRY:
+                raise SeatUnavailable()
+            raise
+        except pymysql.err.OperationalError as e:
+            db.rollback()
+            if e.args and e.args[0] == ER_LOCK_DEADLOCK and attempt == 0:
+                continue
+            raise
+    raise SeatUnavailable()
+
+
+def confirm_hold(db, showtime_id, user_id, token, seat_ids):
+    """Turn a live hold into a booking in one short transaction.
+
+    Returns the booking dict from create_booking. Raises HoldExpired if the
+    hold no longer covers exactly seat_ids, or the showtime is being removed.
+    """
+    seat_ids = sorted(set(seat_ids))
+    try:
+        with db.cursor() as cursor:
+            # Lock the hold rows so they cannot be reclaimed while we confirm
+            cursor.execute(
+                """SELECT seat_id FROM seat_holds
+                   WHERE hold_token = %s AND showtime_id = %s AND user_id = %s
+                     AND booking_id IS NULL AND expires_at >= NOW()
+                   FOR UPDATE""",
+                (token, showtime_id, user_id)
+            )
+            held = sorted(r['seat_id'] for r in cursor.fetchall())
+            if not held or held != seat_ids or not _bookable(cursor, showtime_id):
+                db.rollback()
+                raise HoldExpired()
+
+            booking = create_booking(cursor, user_id, showtime_id, seat_ids)
+
+            cursor.execute(
+                'UPDATE seat_holds SET booking_id = %s, expires_at = NULL WHERE hold_token = %s',
+                (booking['booking_id'], token)
+            )
+            rollups.record_sale(cursor, showtime_id, len(seat_ids))
+        db.commit()
+        return booking
+    except HoldExpired:
+        raise
+    except Exception:
+        db.rollback()
+        raise
+
+
+def release_hold(db, token):
+    """Drop an unconfirmed hold. Returns the seat ids that were freed."""
+    with db.cursor() as cursor:
+        cursor.execute(
+            'SELECT seat_id FROM seat_holds WHERE hold_token = %s AND booking_id IS NULL',
+            (token,)
+        )
+        freed = [r['seat_id'] for r in cursor.fetchall()]
+        cursor.execute('DELETE FROM seat_holds WHERE hold_token = %s AND booking_id IS NULL', (token,))
+    db.commit()
+    return freed
+
+
+def release_booking(cursor, booking_id):
+    """Free the seats of a booking. Runs inside the caller's transaction."""
+    cursor.execute('DELETE FROM seat_holds WHERE booking_id = %s', (booking_id,))
+
+
+def purge_expired(db):
+    """Delete all expired holds. Returns the number of rows removed."""
+    with db.cursor() as cursor:
+        removed = cursor.execute('DELETE FROM seat_holds WHERE booking_id IS NULL AND expires_at < NOW()')
+    db.commit()
+    return removed
@@ -0,0 +1,223 @@
+"""Per-request SQL instrumentation and the slow-query log.
+
+When DB_INSTRUMENTATION is on, every cursor handed out by the pool is
+wrapped in an InstrumentedCursor that times execute() calls and counts
+fetched rows into the current request's RequestStats (kept on flask.g). At
+the end of the request the totals are folded into per-endpoint histograms
+in QueryMetrics, which /admin/metrics returns. Statements slower than
+SLOW_QUERY_MS are written to the 'cloud_cinema.slow_query' logger.
+
+When it is off the pool returns plain cursors, so there is no overhead.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+
+from flask import g, has_app_context, has_request_context, request
+
+slow_log = logging.getLogger('cloud_cinema.slow_query')
+
+# Histogram bucket upper bounds
+TIME_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+def _statement_text(query):
+    text = ' '.join(str(query).split())
+    return text if len(text) <= 300 else text[:297] + '...'
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'total', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # last bucket is "+Inf"
+        self.total = 0
+        self.sum = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    def as_dict(self):
+        labels = [f'<={b}' for b in self.bounds] + ['+Inf']
+        return {
+            'count': self.total,
+            'sum': round(self.sum, 3),
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time', 'rows', 'slowest')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.slowest = []       # [(ms, statement)], longest first
+
+    def add_query(self, elapsed, query, keep):
+        self.queries += 1
+        self.db_time += elapsed
+        if keep:
+            ms = elapsed * 1000
+            if len(self.slowest) < keep or ms > self.slowest[-1][0]:
+                self.slowest.append((round(ms, 3), _statement_text(query)))
+                self.slowest.sort(key=lambda s: -s[0])
+                del self.slowest[keep:]
+
+
+def current_stats():
+    if not has_app_context():
+        return None
+    stats = g.get('_query_stats')
+    if stats is None:
+        stats = g._query_stats = RequestStats()
+    return stats
+
+
+class InstrumentedCursor:
+    """Wraps a pymysql cursor; everything not overridden is delegated."""
+
+    def __init__(self, cursor, metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return self._cursor.__exit__(*exc)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _timed(self, method, query, args):
+        start = time.perf_counter()
+        try:
+            return method(query, args)
+        finally:
+            self._metrics.record_query(time.perf_counter() - start, query)
+
+    def execute(self, query, args=None):
+        return self._timed(self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        return self._timed(self._cursor.executemany, query, args)
+
+    def _count(self, rows):
+        stats = current_stats()
+        if stats is not None and rows:
+            stats.rows += len(rows)
+        return rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._count([row])
+        return row
+
+    def fetchmany(self, size=None):
+        return self._count(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        return self._count(self._cursor.fetchall())
+
+
+class EndpointMetrics:
+    __slots__ = ('requests', 'queries', 'db_time_ms', 'rows', 'slowest')
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = Histogram(COUNT_BUCKETS)
+        self.db_time_ms = Histogram(TIME_BUCKETS_MS)
+        self.rows = 0
+        self.slowest = []
+
+
+class QueryMetrics:
+    """Process-wide aggregation of the per-request stats."""
+
+    def __init__(self, slow_query_ms=200, keep_slowest=5, slow_log_size=100):
+        self.slow_query_ms = slow_query_ms
+        self.keep_slowest = keep_slowest
+        self.statement_time_ms = Histogram(TIME_BUCKETS_MS)
+        self.endpoints = {}
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+
+    def wrap_cursor(self, cursor):
+        return InstrumentedCursor(cursor, self)
+
+    def record_query(self, elapsed, query):
+        ms = elapsed * 1000
+        stats = current_stats()
+        if stats is not None:
+            stats.add_query(elapsed, query, self.keep_slowest)
+        with self._lock:
+            self.statement_time_ms.add(ms)
+        if ms >= self.slow_query_ms:
+            endpoint = request.endpoint if has_request_context() else None
+            text = _statement_text(query)
+            slow_log.warning('slow query (%.1f ms) in %s: %s', ms, endpoint, text)
+            with self._lock:
+                self.slow_queries.append({
+                    'at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'ms': round(ms, 3),
+                    'endpoint': endpoint,
+                    'statement': text,
+                })
+
+    def record_request(self, endpoint, stats):
+        with self._lock:
+            m = self.endpoints.get(endpoint)
+            if m is None:
+                m = self.endpoints[endpoint] = EndpointMetrics()
+            m.requests += 1
+            m.queries.add(stats.queries)
+            m.db_time_ms.add(stats.db_time * 1000)
+            m.rows += stats.rows
+            if stats.slowest:
+                m.slowest = sorted(m.slowest + stats.slowest, key=lambda s: -s[0])[:self.keep_slowest]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'statement_time_ms': self.statement_time_ms.as_dict(),
+                'endpoints': {
+                    name: {
+                        'requests': m.requests,
+                        'queries_per_request': m.queries.as_dict(),
+                        'db_time_ms_per_request': m.db_time_ms.as_dict(),
+                        'rows_fetched': m.rows,
+                        'slowest': [{'ms': ms, 'statement': text} for ms, text in m.slowest],
+                    }
+                    for name, m in sorted(self.endpoints.items())
+                },
+                'slow_queries': list(self.slow_queries),
+            }
+
+
+def init_app(app):
+    """Turn on instrumentation for app if DB_INSTRUMENTATION is set."""
+    if not app.config['DB_INSTRUMENTATION']:
+        app.query_metrics = None
+        return
+
+    metrics = QueryMetrics(slow_query_ms=app.config['SLOW_QUERY_MS'])
+    app.query_metrics = metrics
+    app.db_pool.cursor_wrapper = metrics.wrap_cursor
+
+    @app.teardown_request
+    def record_request_stats(exc):
+        # Requests that ran no queries (e.g. cache hits) are counted too
+        stats = g.pop('_query_stats', None) or RequestStats()
+        metrics.record_request(request.endpoint or 'unknown', stats)
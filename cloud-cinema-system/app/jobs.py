@@ -0,0 +1,82 @@
+"""Background admin jobs with progress stored in the admin_jobs table.
+
+The job runs in a daemon thread of the worker that started it. Progress is
+kept in the database, so any worker can report it. A job whose row has not
+been touched for ADMIN_JOB_STALE_SECONDS (its worker died or was restarted)
+is picked up again by claim_stale(); job work must therefore be safe to run
+again from the start.
+"""
+import threading
+import traceback
+
+
+def create_job(db, kind, target_id, total):
+    with db.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO admin_jobs (kind, target_id, total) VALUES (%s, %s, %s)",
+            (kind, target_id, total)
+        )
+        job_id = cursor.lastrowid
+    db.commit()
+    return job_id
+
+
+def _set_status(app, job_id, status, error=None):
+    db = app.get_db_connection()
+    try:
+        with db.cursor() as cursor:
+            cursor.execute("UPDATE admin_jobs SET status = %s, error = %s WHERE job_id = %s",
+                           (status, error, job_id))
+        db.commit()
+    finally:
+        db.close()
+
+
+def add_progress(cursor, job_id, count):
+    """Record progress inside the caller's transaction, so it commits with the work."""
+    cursor.execute("UPDATE admin_jobs SET done = done + %s WHERE job_id = %s", (count, job_id))
+
+
+def start_job(app, job_id, work):
+    """Run work(job_id) in a background thread inside an app context."""
+    def run():
+        with app.app_context():
+            try:
+                _set_status(app, job_id, 'running')
+                work(job_id)
+                _set_status(app, job_id, 'done')
+            except Exception as e:
+                traceback.print_exc()
+                _set_status(app, job_id, 'failed', str(e)[:500])
+
+    thread = threading.Thread(target=run, name=f'admin-job-{job_id}', daemon=True)
+    thread.start()
+    return thread
+
+
+def claim_stale(db, stale_after):
+    """Take over queued/running jobs nobody has updated for stale_after
+    seconds. Returns the claimed job rows; the caller restarts them."""
+    with db.cursor() as cursor:
+        cursor.execute("""
+            SELECT * FROM admin_jobs
+            WHERE status IN ('queued', 'running') AND updated_at < NOW() - INTERVAL %s SECOND
+        """, (stale_after,))
+        stale = cursor.fetchall()
+        claimed = []
+        for job in stale:
+            # Only one worker wins each job: the update matches only while
+            # updated_at is still the stale value it read
+            if cursor.execute(
+                "UPDATE admin_jobs SET status = 'queued', updated_at = NOW() WHERE job_id = %s AND updated_at = %s",
+                (job['job_id'], job['updated_at'])
+            ):
+                claimed.append(job)
+    db.commit()
+    return claimed
+
+
+def recent_jobs(db, limit=20):
+    with db.cursor() as cursor:
+        cursor.execute("SELECT * FROM admin_jobs ORDER BY job_id DESC LIMIT %s", (limit,))
+        return cursor.fetchall()
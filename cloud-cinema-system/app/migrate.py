@@ -0,0 +1,220 @@
+"""Versioned schema migrations.
+
+Migrations are the numbered files in app/migrations (NNNN_name.sql), applied
+in order and recorded in the schema_migrations table. Run them with:
+
+    flask --app app db upgrade         # apply everything pending
+    flask --app app db status          # list applied / pending migrations
+    flask --app app db check-indexes   # EXPLAIN the hot queries, flag full scans
+"""
+import os
+import re
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+_FILENAME = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+# Held while migrating so two instances starting together do not race
+_LOCK_NAME = 'cloud_cinema_schema_migrations'
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """Return [(version, name, path)] sorted by version."""
+    found = []
+    for filename in os.listdir(directory):
+        m = _FILENAME.match(filename)
+        if m:
+            found.append((int(m.group(1)), m.group(2), os.path.join(directory, filename)))
+    found.sort()
+    versions = [v for v, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError('Duplicate migration version numbers in ' + directory)
+    return found
+
+
+def split_statements(sql):
+    """Split a migration file into statements on ';'. Full-line '--'
+    comments are dropped; string literals must not contain ';'."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    statements = []
+    for chunk in '\n'.join(lines).split(';'):
+        chunk = chunk.strip()
+        if chunk:
+            statements.append(chunk)
+    return statements
+
+
+def _ensure_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(db):
+    with db.cursor() as cursor:
+        _ensure_table(cursor)
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {r['version'] for r in cursor.fetchall()}
+
+
+def upgrade(db, target=None, echo=print):
+    """Apply pending migrations up to target (default: all). Returns the
+    list of versions applied."""
+    done = []
+    with db.cursor() as cursor:
+        cursor.execute("SELECT GET_LOCK(%s, 60) AS got", (_LOCK_NAME,))
+        if not cursor.fetchone()['got']:
+            raise RuntimeError('Another process is running migrations.')
+    try:
+        applied = applied_versions(db)
+        for version, name, path in discover():
+            if version in applied or (target is not None and version > target):
+                continue
+            echo(f'Applying {version:04d}_{name} ...')
+            with open(path) as f:
+                statements = split_statements(f.read())
+            # MySQL commits DDL implicitly, so a failing migration can be
+            # left half applied; it is only recorded once every statement ran.
+            with db.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            db.commit()
+            done.append(version)
+    finally:
+        with db.cursor() as cursor:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (_LOCK_NAME,))
+    return done
+
+
+# Representative route queries for check-indexes, with sample parameters.
+# Keep this in step with routes/*.py when a hot query changes.
+HOT_QUERIES = [
+    ('main.movie_details showtimes',
+     "SELECT s.*, sc.screen_name FROM showtimes s JOIN screens sc ON s.screen_id = sc.screen_id "
+     "WHERE s.movie_id = %s AND s.show_date >= CURDATE() AND s.removing = 0 ORDER BY s.show_date, s.show_time", (1,)),
+    ('seat layout seats',
+     "SELECT seat_id, seat_row, seat_number FROM seats WHERE screen_id = %s", (1,)),
+    ('seat index booked seats',
+     "SELECT bs.seat_id FROM booking_seats bs JOIN bookings b ON bs.booking_id = b.booking_id "
+     "WHERE b.showtime_id = %s AND b.cancelled = 0 "
+     "UNION SELECT seat_id FROM seat_holds WHERE showtime_id = %s AND booking_id IS NULL AND expires_at >= NOW()", (1, 1)),
+    ('holds.confirm_hold',
+     "SELECT seat_id FROM seat_holds WHERE hold_token = %s AND showtime_id = %s AND user_id = %s "
+     "AND booking_id IS NULL AND expires_at >= NOW()", ('0' * 32, 1, 1)),
+    ('auth.profile upcoming',
+     "SELECT b.booking_id FROM bookings b JOIN showtimes s ON b.showtime_id = s.showtime_id "
+     "WHERE b.user_id = %s AND b.cancelled = 0 AND s.show_date >= CURDATE() "
+     "ORDER BY s.show_date, s.show_time, b.booking_id LIMIT 11", (1,)),
+    ('auth.profile past',
+     "(SELECT b.booking_id FROM bookings b JOIN showtimes s ON b.showtime_id = s.showtime_id "
+     "WHERE b.user_id = %s AND (s.show_date < CURDATE() OR b.cancelled = 1) ORDER BY b.booking_id DESC LIMIT 11) "
+     "UNION ALL (SELECT b.booking_id FROM bookings_history b JOIN showtimes_history s ON b.showtime_id = s.showtime_id "
+     "WHERE b.user_id = %s ORDER BY b.booking_id DESC LIMIT 11) ORDER BY booking_id DESC LIMIT 11", (1, 1)),
+    ('auth.profile seats',
+     "SELECT bs.booking_id, se.seat_row, se.seat_number FROM booking_seats bs JOIN seats se ON bs.seat_id = se.seat_id "
+     "WHERE bs.booking_id IN (%s, %s) UNION ALL SELECT bs.booking_id, se.seat_row, se.seat_number "
+     "FROM booking_seats_history bs JOIN seats se ON bs.seat_id = se.seat_id WHERE bs.booking_id IN (%s, %s)", (1, 2, 1, 2)),
+    ('admin.admin_index showtimes',
+     "SELECT s.*, m.title, sc.screen_name, st.seats_sold FROM showtimes s JOIN movies m ON s.movie_id = m.movie_id "
+     "JOIN screens sc ON s.screen_id = sc.screen_id LEFT JOIN showtime_stats st ON st.showtime_id = s.showtime_id "
+     "WHERE s.show_date >= CURDATE() ORDER BY s.show_date, s.show_time", ()),
+    ('scheduling.load_timelines',
+     "SELECT s.showtime_id, s.screen_id, s.show_date, s.show_time, m.duration, m.title "
+     "FROM showtimes s JOIN movies m ON s.movie_id = m.movie_id "
+     "WHERE s.screen_id IN (%s) AND s.show_date BETWEEN CURDATE() - INTERVAL 1 DAY AND CURDATE() + INTERVAL 8 DAY", (1,)),
+    ('admin.admin_index movie sales',
+     "SELECT movie_id, SUM(seats_sold) AS seats_sold, SUM(gross_revenue) AS gross_revenue FROM movie_daily_stats GROUP BY movie_id", ()),
+    ('archive.archive_chunk showtimes',
+     "SELECT showtime_id FROM showtimes WHERE show_date < CURDATE() - INTERVAL %s DAY "
+     "ORDER BY show_date, show_time, showtime_id LIMIT 20", (1,)),
+    ('authz admin list',
+     "SELECT user_id, role_version FROM users WHERE role = 'admin'", ()),
+]
+
+# Small lookup tables where a full scan is expected and harmless
+SMALL_TABLES = {'movies', 'screens', 'schema_migrations'}
+
+_TABLE_REF = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+# Words that can follow a table name in the hot queries without being an alias
+_NOT_ALIASES = {'where', 'join', 'left', 'right', 'inner', 'cross', 'on', 'using',
+                'order', 'group', 'having', 'limit', 'union', 'for', 'lock'}
+
+
+def table_aliases(sql):
+    """Map each name EXPLAIN may show for a table in sql (the alias, or the
+    table name itself) to the set of tables it stands for. An alias reused
+    across UNION branches stands for several tables."""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        aliases.setdefault(table, set()).add(table)
+        if alias and alias.lower() not in _NOT_ALIASES:
+            aliases.setdefault(alias, set()).add(table)
+    return aliases
+
+
+def check_indexes(db, queries=None):
+    """EXPLAIN each query and return [(name, table, rows)] for full scans."""
+    problems = []
+    with db.cursor() as cursor:
+        for name, sql, params in queries or HOT_QUERIES:
+            aliases = table_aliases(sql)
+            cursor.execute('EXPLAIN ' + sql, params)
+            for row in cursor.fetchall():
+                table = (row.get('table') or '').split(' ')[0]
+                # <union1,2>, <derivedN>: temporary results, not stored tables
+                if row.get('type') != 'ALL' or table.startswith('<'):
+                    continue
+                tables = aliases.get(table, {table})
+                if not tables <= SMALL_TABLES:
+                    problems.append((name, '/'.join(sorted(tables)), row.get('rows')))
+    return problems
+
+
+db_cli = AppGroup('db', help='Database schema migrations.')
+
+
+@db_cli.command('upgrade')
+@click.option('--target', type=int, default=None, help='Stop after this version.')
+def upgrade_command(target):
+    """Apply pending migrations."""
+    db = current_app.get_db_connection()
+    try:
+        done = upgrade(db, target, echo=click.echo)
+    finally:
+        db.close()
+    click.echo(f'{len(done)} migration(s) applied.' if done else 'Database is up to date.')
+
+
+@db_cli.command('status')
+def status_command():
+    """Show applied and pending migrations."""
+    db = current_app.get_db_connection()
+    try:
+        applied = applied_versions(db)
+    finally:
+        db.close()
+    for version, name, _ in discover():
+        click.echo(f"{'applied' if version in applied else 'pending'}  {version:04d}_{name}")
+
+
+@db_cli.command('check-indexes')
+def check_indexes_command():
+    """Flag hot route queries that do a full table scan."""
+    db = current_app.get_db_connection()
+    try:
+        problems = check_indexes(db)
+    finally:
+        db.close()
+    for name, table, rows in problems:
+        click.echo(f'FULL SCAN  {name}: table {table} (~{rows} rows)')
+    if problems:
+        raise SystemExit(1)
+    click.echo(f'All {len(HOT_QUERIES)} hot queries use an index.')
@@ -0,0 +1,26 @@
+-- Seat holds (see app/holds.py).
+-- One row per taken seat of a showtime. booking_id NULL = temporary hold that
+-- lapses at expires_at; booking_id set = sold seat. The primary key is what
+-- prevents the same seat being held or sold twice.
+CREATE TABLE seat_holds (
+    showtime_id INT NOT NULL,
+    seat_id INT NOT NULL,
+    user_id INT NOT NULL,
+    hold_token CHAR(32) NOT NULL,
+    expires_at DATETIME NULL,
+    booking_id INT NULL,
+
+    PRIMARY KEY (showtime_id, seat_id),
+    KEY idx_seat_holds_token (hold_token),
+    KEY idx_seat_holds_booking (booking_id),
+    FOREIGN KEY (showtime_id) REFERENCES showtimes(showtime_id),
+    FOREIGN KEY (seat_id) REFERENCES seats(seat_id),
+    FOREIGN KEY (user_id) REFERENCES users(user_id),
+    FOREIGN KEY (booking_id) REFERENCES bookings(booking_id)
+);
+
+-- Backfill the seats that are already sold
+INSERT IGNORE INTO seat_holds (showtime_id, seat_id, user_id, hold_token, booking_id)
+SELECT b.showtime_id, bs.seat_id, b.user_id, LPAD(b.booking_id, 32, '0'), b.booking_id
+FROM booking_seats bs JOIN bookings b ON bs.booking_id = b.booking_id
+WHERE b.cancelled = 0;
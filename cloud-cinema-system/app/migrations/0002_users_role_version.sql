@@ -0,0 +1,2 @@
+-- Bumped on every role change to revoke cached admin sessions (see app/authz.py)
+ALTER TABLE users ADD COLUMN role_version INT NOT NULL DEFAULT 0 AFTER role;
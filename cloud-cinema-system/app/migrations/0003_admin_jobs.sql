@@ -0,0 +1,12 @@
+-- Background admin work (e.g. large deletes) and its progress (see app/jobs.py)
+CREATE TABLE admin_jobs (
+    job_id INT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    target_id INT,
+    status ENUM('queued', 'running', 'done', 'failed') DEFAULT 'queued',
+    total INT NOT NULL DEFAULT 0,
+    done INT NOT NULL DEFAULT 0,
+    error VARCHAR(500),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
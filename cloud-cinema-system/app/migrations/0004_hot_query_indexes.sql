@@ -0,0 +1,30 @@
+-- Indexes for the queries in app/routes/*.py and the modules they call.
+-- The foreign keys only give single-column indexes; these match the
+-- filter + sort of each hot query so MySQL can range-scan instead of
+-- sorting or scanning.
+
+-- main.movie_details / catalog.get_upcoming_showtimes:
+--   WHERE movie_id = ? AND show_date >= CURDATE() ORDER BY show_date, show_time
+CREATE INDEX idx_showtimes_movie_date ON showtimes (movie_id, show_date, show_time);
+
+-- admin_index, admin_bookings:
+--   WHERE show_date >= CURDATE() ORDER BY show_date, show_time
+CREATE INDEX idx_showtimes_date_time ON showtimes (show_date, show_time);
+
+-- Seat index load, removal counts/deletes:
+--   WHERE showtime_id = ? AND cancelled = 0
+-- (booking_id is the primary key, so the index covers the seat index join)
+CREATE INDEX idx_bookings_showtime_cancelled ON bookings (showtime_id, cancelled);
+
+-- auth.profile: WHERE user_id = ? AND cancelled ... ORDER BY booking_id DESC,
+-- and the legacy booking_time ordering
+CREATE INDEX idx_bookings_user_cancelled ON bookings (user_id, cancelled);
+CREATE INDEX idx_bookings_user_time ON bookings (user_id, booking_time);
+
+-- booking_seats by booking (profile seat lists, cancel, admin_bookings join).
+-- The existing UNIQUE (seat_id, booking_id) leads with seat_id, so it cannot
+-- serve booking_id lookups; this one covers them.
+CREATE INDEX idx_booking_seats_booking_seat ON booking_seats (booking_id, seat_id);
+
+-- AdminDirectory.refresh: WHERE role = 'admin'
+CREATE INDEX idx_users_role ON users (role, user_id, role_version);
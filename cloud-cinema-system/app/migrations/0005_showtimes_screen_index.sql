@@ -0,0 +1,3 @@
+-- Screen-overlap checks (scheduling.load_timelines):
+--   WHERE screen_id IN (...) AND show_date BETWEEN ? AND ?
+CREATE INDEX idx_showtimes_screen_date ON showtimes (screen_id, show_date, show_time);
@@ -0,0 +1,42 @@
+-- Occupancy and sales rollups (see app/rollups.py), kept up to date by the
+-- booking and cancellation transactions. seats_sold / bookings count active
+-- bookings; gross_revenue is seats_sold * the showtime's price.
+CREATE TABLE showtime_stats (
+    showtime_id INT PRIMARY KEY,
+    seats_sold INT NOT NULL DEFAULT 0,
+    bookings INT NOT NULL DEFAULT 0,
+    cancellations INT NOT NULL DEFAULT 0,
+    gross_revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+CREATE TABLE movie_daily_stats (
+    movie_id INT NOT NULL,
+    show_date DATE NOT NULL,
+    seats_sold INT NOT NULL DEFAULT 0,
+    bookings INT NOT NULL DEFAULT 0,
+    cancellations INT NOT NULL DEFAULT 0,
+    gross_revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (movie_id, show_date)
+);
+
+-- Backfill from the existing bookings (same as `flask --app app rollups rebuild`)
+INSERT INTO showtime_stats (showtime_id, seats_sold, bookings, cancellations, gross_revenue)
+SELECT s.showtime_id,
+       COALESCE(SUM(bk.seats), 0),
+       COALESCE(SUM(bk.cancelled = 0), 0),
+       COALESCE(SUM(bk.cancelled = 1), 0),
+       COALESCE(SUM(bk.seats), 0) * s.price
+FROM showtimes s
+JOIN (
+    SELECT b.booking_id, b.showtime_id, b.cancelled, COUNT(bs.seat_id) AS seats
+    FROM bookings b LEFT JOIN booking_seats bs ON bs.booking_id = b.booking_id AND b.cancelled = 0
+    GROUP BY b.booking_id
+) bk ON bk.showtime_id = s.showtime_id
+GROUP BY s.showtime_id;
+
+INSERT INTO movie_daily_stats (movie_id, show_date, seats_sold, bookings, cancellations, gross_revenue)
+SELECT s.movie_id, s.show_date, SUM(st.seats_sold), SUM(st.bookings), SUM(st.cancellations), SUM(st.gross_revenue)
+FROM showtime_stats st JOIN showtimes s ON st.showtime_id = s.showtime_id
+GROUP BY s.movie_id, s.show_date;
@@ -0,0 +1,3 @@
+-- Processed poster variants (see app/posters.py); NULL means only the
+-- legacy image_url is available
+ALTER TABLE movies ADD COLUMN poster_key VARCHAR(64) NULL;
@@ -0,0 +1,49 @@
+-- Cold storage for finished showtimes and their bookings (see app/archive.py).
+-- Same columns and ids as the hot tables, plus archived_at. Rows are only
+-- copied here after they satisfied the hot tables' constraints, so there are
+-- no foreign keys: archiving and movie removal stay plain chunked deletes.
+CREATE TABLE showtimes_history (
+    showtime_id INT PRIMARY KEY,
+    movie_id INT NOT NULL,
+    screen_id INT NOT NULL,
+    show_date DATE NOT NULL,
+    show_time TIME NOT NULL,
+    price DECIMAL(6,2) NOT NULL,
+    archived_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+
+    KEY idx_showtimes_history_movie_date (movie_id, show_date, show_time),
+    KEY idx_showtimes_history_date (show_date, show_time)
+);
+
+-- Profile past list (WHERE user_id = ? ORDER BY booking_id DESC) and the
+-- per-showtime rollup / removal lookups
+CREATE TABLE bookings_history (
+    booking_id INT PRIMARY KEY,
+    user_id INT NOT NULL,
+    showtime_id INT NOT NULL,
+    booking_time DATETIME,
+    cancelled TINYINT(1) DEFAULT 0,
+    archived_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+
+    KEY idx_bookings_history_user (user_id, booking_id),
+    KEY idx_bookings_history_showtime (showtime_id, cancelled)
+);
+
+CREATE TABLE booking_seats_history (
+    booking_seat_id INT PRIMARY KEY,
+    booking_id INT NOT NULL,
+    seat_id INT NOT NULL,
+
+    KEY idx_booking_seats_history_booking (booking_id, seat_id)
+);
+
+-- showtime_stats rows of the archived showtimes; movie_daily_stats keeps
+-- covering every day, hot or archived
+CREATE TABLE showtime_stats_history (
+    showtime_id INT PRIMARY KEY,
+    seats_sold INT NOT NULL DEFAULT 0,
+    bookings INT NOT NULL DEFAULT 0,
+    cancellations INT NOT NULL DEFAULT 0,
+    gross_revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
@@ -0,0 +1,21 @@
+-- Virtual waiting room (see app/waiting_room.py). One row per showtime that
+-- has had visitors: tickets handed out, tickets let in so far, how many of
+-- those have entered, and the smoothed admission rate behind the ETAs.
+CREATE TABLE waiting_rooms (
+    showtime_id INT PRIMARY KEY,
+    issued BIGINT NOT NULL DEFAULT 0,
+    admitted BIGINT NOT NULL DEFAULT 0,
+    claimed BIGINT NOT NULL DEFAULT 0,
+    rate DOUBLE NOT NULL DEFAULT 0,
+    admitted_at DATETIME(3) NULL
+);
+
+-- Users allowed to pick seats for a showtime, until they book or expires_at
+CREATE TABLE waiting_room_admissions (
+    showtime_id INT NOT NULL,
+    user_id INT NOT NULL,
+    expires_at DATETIME NOT NULL,
+
+    PRIMARY KEY (showtime_id, user_id),
+    KEY idx_waiting_room_admissions_expiry (expires_at)
+);
@@ -0,0 +1,5 @@
+-- Movies and showtimes a background removal job is deleting (see
+-- app/removal.py): hidden from the catalog and closed for booking as soon as
+-- the job is created, until the job has deleted the rows
+ALTER TABLE movies ADD COLUMN removing TINYINT(1) NOT NULL DEFAULT 0;
+ALTER TABLE showtimes ADD COLUMN removing TINYINT(1) NOT NULL DEFAULT 0;
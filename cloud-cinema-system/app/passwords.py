@@ -0,0 +1,173 @@
+"""Password hashing off the request threads.
+
+scrypt is deliberately CPU-heavy, so hashing and verification run in a
+small process pool (PasswordHasher). At most PASSWORD_HASH_MAX_PENDING calls
+may be queued or running; a request that cannot get a slot within
+PASSWORD_HASH_WAIT seconds gets HasherBusy instead of piling up behind a
+login burst. LoginThrottle caps attempts per client IP (only meaningful
+behind a trusted proxy, see PROXY_FIX_X_FOR) and failed attempts per account
+before any hashing is done.
+
+Rows whose hash is plaintext or uses older parameters than
+PASSWORD_HASH_METHOD are rehashed after a successful login, in the
+background, so the login response does not wait for it.
+"""
+import atexit
+import hmac
+import logging
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+log = logging.getLogger(__name__)
+
+
+class HasherBusy(Exception):
+    """Too many hashing calls are already queued."""
+
+
+# Werkzeug hashes look like 'scrypt:32768:8:1$salt$hash'
+_HASH_METHODS = ('scrypt', 'pbkdf2')
+
+
+def _is_hash(stored):
+    return stored.count('$') >= 2 and stored.split(':', 1)[0] in _HASH_METHODS
+
+
+def _verify(stored, password, method):
+    # Runs in a worker process. Returns (matches, needs_rehash)
+    if not _is_hash(stored):
+        # Legacy plaintext row (check_password_hash would just say False)
+        return hmac.compare_digest(stored.encode(), password.encode()), True
+    try:
+        ok = check_password_hash(stored, password)
+    except ValueError:
+        # Known method with parameters this Werkzeug cannot read
+        return False, False
+    return ok, ok and stored.split('$', 1)[0] != method
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+class PasswordHasher:
+    def __init__(self, method='scrypt:32768:8:1', workers=2, max_pending=32, wait=2.0):
+        self.method = method
+        self.workers = workers
+        self.wait = wait
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._lock = threading.Lock()
+        # Background rehashes: one at a time, and never more than a few queued
+        self._rehashes = ThreadPoolExecutor(max_workers=1)
+        self._rehash_slots = threading.BoundedSemaphore(max(1, max_pending // 4))
+
+    def _executor(self):
+        # Created on first use, i.e. after the server has forked its workers
+        with self._lock:
+            if self._pool is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=context)
+                atexit.register(self._pool.shutdown, wait=False)
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.wait):
+            raise HasherBusy()
+        try:
+            return self._executor().submit(fn, *args).result(timeout=self.wait + 30)
+        except FutureTimeout:
+            raise HasherBusy()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, stored, password):
+        """Return (matches, needs_rehash)."""
+        if not stored or password is None:
+            return False, False
+        return self._run(_verify, stored, password, self.method)
+
+    def rehash_later(self, pool, user_id, stored, password):
+        """Replace user_id's hash with a current one in the background. The
+        row is only updated if it still holds `stored`."""
+        if not self._rehash_slots.acquire(blocking=False):
+            return      # Busy; the next login tries again
+
+        def work():
+            try:
+                new_hash = self.hash(password)
+                db = pool.acquire()
+                try:
+                    with db.cursor() as cursor:
+                        cursor.execute("UPDATE users SET pass = %s WHERE user_id = %s AND pass = %s",
+                                       (new_hash, user_id, stored))
+                    db.commit()
+                finally:
+                    db.close()
+            except Exception:
+                log.exception('rehash of user %s failed', user_id)
+            finally:
+                self._rehash_slots.release()
+
+        self._rehashes.submit(work)
+
+
+class LoginThrottle:
+    """Fixed-window attempt counters per key ('ip:1.2.3.4', 'acct:a@b.c'),
+    kept for at most max_keys keys. A limit of 0 turns it off."""
+
+    def __init__(self, limit, window=60, max_keys=100000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._counts = OrderedDict()     # key -> [window_start, count]
+        self._lock = threading.Lock()
+
+    def _entry(self, key, now):
+        entry = self._counts.get(key)
+        if entry is None or now - entry[0] >= self.window:
+            entry = [now, 0]
+            self._counts[key] = entry
+            while len(self._counts) > self.max_keys:
+                self._counts.popitem(last=False)
+        self._counts.move_to_end(key)
+        return entry
+
+    def blocked(self, key):
+        if not self.limit:
+            return False
+        with self._lock:
+            return self._entry(key, time.monotonic())[1] >= self.limit
+
+    def hit(self, key):
+        if not self.limit:
+            return
+        with self._lock:
+            self._entry(key, time.monotonic())[1] += 1
+
+    def reset(self, key):
+        with self._lock:
+            self._counts.pop(key, None)
+
+
+def init_app(app):
+    app.password_hasher = PasswordHasher(
+        method=app.config['PASSWORD_HASH_METHOD'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+        wait=app.config['PASSWORD_HASH_WAIT'],
+    )
+    app.login_ip_throttle = LoginThrottle(app.config['LOGIN_ATTEMPTS_PER_IP'])
+    app.login_account_throttle = LoginThrottle(app.config['LOGIN_FAILURES_PER_ACCOUNT'])
@@ -0,0 +1,213 @@
+"""Poster images: resized variants behind a pluggable storage backend.
+
+When an admin uploads a poster, process_poster() decodes it once and
+writes one recompressed JPEG per entry in VARIANTS. The files are named
+after a hash of the source image and the variant settings, so a name
+never changes content; they are stored with year-long immutable caching
+and movies.poster_key records the hash. Templates call
+poster_url(movie, 'card') and fall back to the legacy image_url for movies
+that have no processed poster yet.
+
+Storage is the local filesystem (served by /media/...) or S3, chosen with
+POSTER_STORAGE. Existing image_url posters can be converted with:
+
+    flask --app app posters backfill
+"""
+import hashlib
+import io
+import os
+import urllib.request
+
+import click
+from flask import current_app, send_from_directory
+from flask.cli import AppGroup
+from PIL import Image, ImageOps
+
+from .assets import asset_url
+
+# name -> (max width, max height, JPEG quality)
+VARIANTS = {
+    'thumb': (220, 330, 80),     # profile booking list
+    'card': (440, 660, 82),      # home page grid (2x for high-DPI screens)
+    'full': (900, 1350, 85),     # movie details
+}
+# Bump when the encoding changes so new files get new names
+PIPELINE_VERSION = '1'
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MAX_SOURCE_BYTES = 20 * 1024 * 1024
+
+
+class PosterError(Exception):
+    """The upload is not a usable image."""
+
+
+def poster_key(source):
+    h = hashlib.sha256(source)
+    h.update(repr((PIPELINE_VERSION, sorted(VARIANTS.items()))).encode())
+    return h.hexdigest()[:20]
+
+
+def variant_name(key, variant):
+    return f'posters/{key}/{variant}.jpg'
+
+
+def render_variants(source):
+    """Decode source once and return {variant: jpeg bytes}."""
+    try:
+        image = Image.open(io.BytesIO(source))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGB')
+    except Exception as e:
+        raise PosterError('Unsupported or corrupt image.') from e
+
+    out = {}
+    for variant, (width, height, quality) in VARIANTS.items():
+        resized = image.copy()
+        # Never upscale; thumbnail() keeps the aspect ratio
+        resized.thumbnail((width, height), Image.LANCZOS)
+        buf = io.BytesIO()
+        resized.save(buf, 'JPEG', quality=quality, optimize=True, progressive=True)
+        out[variant] = buf.getvalue()
+    return out
+
+
+class LocalStorage:
+    """Files under root, served by the /media/<path> route."""
+
+    def __init__(self, root, base_url='/media/'):
+        self.root = root
+        self.base_url = base_url
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.root, name))
+
+    def save(self, name, data, content_type):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def url(self, name):
+        return self.base_url + name
+
+
+class S3Storage:
+    """Objects in an S3 bucket, served by S3 or a CDN in front of it."""
+
+    def __init__(self, bucket, prefix='', base_url=None):
+        import boto3
+        self._s3 = boto3.client('s3')
+        self.bucket = bucket
+        self.prefix = prefix
+        self.base_url = base_url or f'https://{bucket}.s3.amazonaws.com/'
+
+    def exists(self, name):
+        try:
+            self._s3.head_object(Bucket=self.bucket, Key=self.prefix + name)
+            return True
+        except Exception:
+            return False
+
+    def save(self, name, data, content_type):
+        self._s3.put_object(Bucket=self.bucket, Key=self.prefix + name, Body=data,
+                            ContentType=content_type, CacheControl=CACHE_CONTROL)
+
+    def url(self, name):
+        return self.base_url + self.prefix + name
+
+
+def process_poster(storage, source):
+    """Store all variants of source and return its poster key."""
+    if not source:
+        raise PosterError('Empty upload.')
+    if len(source) > MAX_SOURCE_BYTES:
+        raise PosterError('Poster images must be under 20 MB.')
+    key = poster_key(source)
+    # Same key means same files; skip the work on re-upload
+    if storage.exists(variant_name(key, 'full')):
+        return key
+    variants = render_variants(source)
+    # 'full' last, since its presence marks the set as complete
+    for variant in sorted(variants, key=lambda v: v == 'full'):
+        storage.save(variant_name(key, variant), variants[variant], 'image/jpeg')
+    return key
+
+
+def poster_from_upload(file_storage):
+    """Poster key for an uploaded form file, or None if no file was sent."""
+    if not file_storage or not file_storage.filename:
+        return None
+    return process_poster(current_app.poster_storage, file_storage.read(MAX_SOURCE_BYTES + 1))
+
+
+def poster_url(movie, variant='card'):
+    if not movie:
+        return None
+    key = movie.get('poster_key')
+    if key:
+        return current_app.poster_storage.url(variant_name(key, variant))
+    image_url = movie.get('image_url')
+    # Legacy posters shipped in app/static get their fingerprinted URL
+    if image_url and image_url.startswith('/static/'):
+        return asset_url(image_url[len('/static/'):])
+    return image_url
+
+
+def init_app(app):
+    if app.config['POSTER_STORAGE'] == 's3':
+        app.poster_storage = S3Storage(
+            app.config['POSTER_S3_BUCKET'],
+            prefix=app.config['POSTER_S3_PREFIX'],
+            base_url=app.config['POSTER_BASE_URL'] or None,
+        )
+    else:
+        root = app.config['POSTER_LOCAL_DIR'] or os.path.join(app.instance_path, 'media')
+        app.poster_storage = LocalStorage(root, base_url=app.config['POSTER_BASE_URL'] or '/media/')
+
+        @app.route('/media/<path:name>')
+        def media(name):
+            resp = send_from_directory(root, name, max_age=31536000)
+            resp.headers['Cache-Control'] = CACHE_CONTROL
+            return resp
+
+    app.jinja_env.globals['poster_url'] = poster_url
+    app.cli.add_command(posters_cli)
+
+
+def _read_source(image_url):
+    # Posters shipped in app/static are read from disk
+    if image_url.startswith('/static/'):
+        path = os.path.join(current_app.static_folder, image_url[len('/static/'):])
+        with open(path, 'rb') as f:
+            return f.read()
+    with urllib.request.urlopen(image_url, timeout=30) as resp:
+        return resp.read(MAX_SOURCE_BYTES + 1)
+
+
+posters_cli = AppGroup('posters', help='Poster image variants.')
+
+
+@posters_cli.command('backfill')
+def backfill_command():
+    """Generate variants for movies that only have an image_url."""
+    from . import catalog
+    db = current_app.get_db_connection()
+    try:
+        with db.cursor() as cursor:
+            cursor.execute("SELECT movie_id, image_url FROM movies WHERE poster_key IS NULL AND image_url <> ''")
+            movies = cursor.fetchall()
+        for movie in movies:
+            try:
+                key = process_poster(current_app.poster_storage, _read_source(movie['image_url']))
+            except Exception as e:
+                click.echo(f"movie {movie['movie_id']}: skipped ({e})")
+                continue
+            with db.cursor() as cursor:
+                cursor.execute("UPDATE movies SET poster_key = %s WHERE movie_id = %s", (key, movie['movie_id']))
+            db.commit()
+            click.echo(f"movie {movie['movie_id']}: {key}")
+    finally:
+        db.close()
+    catalog.invalidate_movie()
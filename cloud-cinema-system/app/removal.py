@@ -0,0 +1,121 @@
+"""Cascade deletion of movies and showtimes.
+
+Small removals run in a fixed number of set-based statements inside the
+admin request. Large ones delete bookings in short chunked transactions from
+a background job (see jobs.py), so the booking tables are never locked for
+long; mark_removing() closes the showtimes for booking first, so nothing
+booked while the job runs is lost with them. Archived showtimes and
+bookings (see archive.py) are removed with the movie too.
+"""
+from . import jobs, rollups
+
+# Which showtimes a removal covers, as a filter on showtimes s
+_SCOPES = {
+    'movie': 's.movie_id = %s',
+    'showtime': 's.showtime_id = %s',
+}
+
+# (showtimes, bookings, booking_seats, showtime_stats): current, then archived
+_TABLES = (
+    ('showtimes', 'bookings', 'booking_seats', 'showtime_stats'),
+    ('showtimes_history', 'bookings_history', 'booking_seats_history', 'showtime_stats_history'),
+)
+
+
+def showtime_ids(cursor, kind, target_id):
+    cursor.execute(f"SELECT s.showtime_id FROM showtimes s WHERE {_SCOPES[kind]}", (target_id,))
+    return [r['showtime_id'] for r in cursor.fetchall()]
+
+
+def mark_removing(cursor, kind, target_id):
+    """Close the showtimes for booking and hide them (and the movie) from the
+    catalog while a background job deletes them. Runs inside the caller's
+    transaction."""
+    cursor.execute(f"UPDATE showtimes s SET s.removing = 1 WHERE {_SCOPES[kind]}", (target_id,))
+    if kind == 'movie':
+        cursor.execute("UPDATE movies SET removing = 1 WHERE movie_id = %s", (target_id,))
+
+
+def count_bookings(cursor, kind, target_id):
+    total = 0
+    for showtimes, bookings, _, _ in _TABLES:
+        cursor.execute(f"""
+            SELECT COUNT(*) AS n FROM {bookings} b
+            JOIN {showtimes} s ON b.showtime_id = s.showtime_id
+            WHERE {_SCOPES[kind]}
+        """, (target_id,))
+        total += cursor.fetchone()['n']
+    return total
+
+
+def delete_cascade(cursor, kind, target_id):
+    """Delete the movie/showtime and everything under it in constant statements.
+
+    Runs inside the caller's transaction.
+    """
+    where = _SCOPES[kind]
+    days = rollups.showtime_days(cursor, where, (target_id,))
+    cursor.execute(f"""
+        DELETE h FROM seat_holds h
+        JOIN showtimes s ON h.showtime_id = s.showtime_id
+        WHERE {where}
+    """, (target_id,))
+    for showtimes, bookings, booking_seats, stats in _TABLES:
+        cursor.execute(f"""
+            DELETE bs FROM {booking_seats} bs
+            JOIN {bookings} b ON bs.booking_id = b.booking_id
+            JOIN {showtimes} s ON b.showtime_id = s.showtime_id
+            WHERE {where}
+        """, (target_id,))
+        cursor.execute(f"""
+            DELETE b FROM {bookings} b
+            JOIN {showtimes} s ON b.showtime_id = s.showtime_id
+            WHERE {where}
+        """, (target_id,))
+        cursor.execute(f"""
+            DELETE st FROM {stats} st
+            JOIN {showtimes} s ON st.showtime_id = s.showtime_id
+            WHERE {where}
+        """, (target_id,))
+        cursor.execute(f"DELETE s FROM {showtimes} s WHERE {where}", (target_id,))
+    if kind == 'movie':
+        cursor.execute("DELETE FROM movie_daily_stats WHERE movie_id = %s", (target_id,))
+        cursor.execute("DELETE FROM movies WHERE movie_id = %s", (target_id,))
+    else:
+        for movie_id, show_date in days:
+            rollups.refresh_movie_day(cursor, movie_id, show_date)
+
+
+def delete_in_chunks(db, kind, target_id, chunk_size, job_id=None):
+    """Delete bookings chunk by chunk (one short transaction each), then the
+    remaining rows with delete_cascade."""
+    where = _SCOPES[kind]
+    try:
+        for showtimes, bookings, booking_seats, _ in _TABLES:
+            while True:
+                with db.cursor() as cursor:
+                    cursor.execute(f"""
+                        SELECT b.booking_id FROM {bookings} b
+                        JOIN {showtimes} s ON b.showtime_id = s.showtime_id
+                        WHERE {where}
+                        LIMIT %s
+                    """, (target_id, chunk_size))
+                    ids = [r['booking_id'] for r in cursor.fetchall()]
+                    if not ids:
+                        break
+
+                    placeholders = ','.join(['%s'] * len(ids))
+                    cursor.execute(f"DELETE FROM seat_holds WHERE booking_id IN ({placeholders})", ids)
+                    cursor.execute(f"DELETE FROM {booking_seats} WHERE booking_id IN ({placeholders})", ids)
+                    cursor.execute(f"DELETE FROM {bookings} WHERE booking_id IN ({placeholders})", ids)
+                    if job_id is not None:
+                        jobs.add_progress(cursor, job_id, len(ids))
+                db.commit()
+
+        # Anything booked meanwhile is removed together with the showtimes
+        with db.cursor() as cursor:
+            delete_cascade(cursor, kind, target_id)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
@@ -0,0 +1,201 @@
+"""Read replicas, with read-your-writes for the session that wrote.
+
+DB_REPLICA_HOSTS lists read replicas of DB_HOST. Read-only paths (catalog,
+seat maps, profile, admin booking list and export) take their connection
+from get_read_connection(), which picks a replica round-robin; writes and
+booking transactions keep using get_db_connection() and the primary. A
+replica that cannot be reached is skipped for DB_REPLICA_RETRY seconds and
+the read falls back to the primary.
+
+Replication is asynchronous, so a user who just booked could load the
+profile from a replica that has not applied the booking yet. Every commit
+on the primary during a request therefore pins the session to the primary
+for READ_YOUR_WRITES_SECONDS. The deadline lives in the session cookie, so
+the pin holds on every worker and instance. Shared caches (the catalog, the
+seat index) are filled through primary_cursor() instead: a fill from a
+lagging replica right after an invalidation would serve the old rows to
+everyone until the entry expires. `flask --app app replicas
+status` shows whether each replica is reachable and how far behind it is.
+"""
+import contextlib
+import itertools
+import threading
+import time
+
+import click
+from flask import current_app, g, has_app_context, has_request_context, session
+from flask.cli import AppGroup
+
+from .db import ConnectionPool, PoolTimeout
+
+PIN_KEY = 'db_primary_until'
+
+
+def parse_hosts(value):
+    """'db-r1,db-r2:3307' -> [('db-r1', 3306), ('db-r2', 3307)]"""
+    hosts = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.partition(':')
+        hosts.append((host, int(port) if port else 3306))
+    return hosts
+
+
+def pin_session():
+    """Send this session's reads to the primary for a while (after a write)."""
+    if has_request_context():
+        session[PIN_KEY] = int(time.time()) + current_app.config['READ_YOUR_WRITES_SECONDS']
+
+
+def pinned():
+    return has_request_context() and session.get(PIN_KEY, 0) > time.time()
+
+
+@contextlib.contextmanager
+def primary_cursor():
+    """Cursor on the primary for a cache fill. Uses the request's primary
+    connection if it has one; otherwise the connection goes straight back to
+    the pool, so the rest of the request can still read from a replica."""
+    conn = g.get('_db_conn') if has_app_context() else None
+    if conn is not None:
+        with conn.cursor() as cursor:
+            yield cursor
+        return
+    conn = current_app.db_pool.acquire()
+    try:
+        with conn.cursor() as cursor:
+            yield cursor
+    finally:
+        current_app.db_pool.release(conn)
+
+
+class ReplicaSet:
+    """Round-robin over replica pools, skipping ones that recently failed."""
+
+    def __init__(self, pools, retry_after=30):
+        self.pools = pools
+        self.retry_after = retry_after
+        self._down = {}
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def candidates(self):
+        if not self.pools:
+            return []
+        start = next(self._next) % len(self.pools)
+        now = time.monotonic()
+        with self._lock:
+            return [p for p in self.pools[start:] + self.pools[:start] if self._down.get(id(p), 0) <= now]
+
+    def mark_down(self, pool):
+        with self._lock:
+            self._down[id(pool)] = time.monotonic() + self.retry_after
+
+    def acquire(self):
+        """A connection to a live replica, or None if there is none."""
+        for pool in self.candidates():
+            try:
+                return pool.acquire()
+            except PoolTimeout:
+                # Busy rather than broken: try the next one
+                continue
+            except Exception:
+                self.mark_down(pool)
+        return None
+
+    def pool(self):
+        """The pool to use for a long read of its own (e.g. an export)."""
+        candidates = self.candidates()
+        return candidates[0] if candidates else None
+
+
+def init_app(app, connect):
+    """connect(host, port, **kwargs) opens a pymysql connection."""
+    app.db_pool.after_commit = pin_session
+
+    pools = []
+    for host, port in parse_hosts(app.config['DB_REPLICA_HOSTS']):
+        pool = ConnectionPool(
+            lambda host=host, port=port: connect(
+                host, port,
+                connect_timeout=app.config['DB_REPLICA_CONNECT_TIMEOUT'],
+                # A write sent here by mistake fails instead of diverging
+                init_command='SET SESSION TRANSACTION READ ONLY',
+            ),
+            min_size=0,
+            max_size=app.config['DB_POOL_MAX_SIZE'],
+            max_lifetime=app.config['DB_POOL_MAX_LIFETIME'],
+            timeout=app.config['DB_POOL_TIMEOUT'],
+            ping_interval=app.config['DB_POOL_PING_INTERVAL'],
+            name=f'{host}:{port}',
+        )
+        pool.cursor_wrapper = app.db_pool.cursor_wrapper
+        pools.append(pool)
+    app.replicas = ReplicaSet(pools, retry_after=app.config['DB_REPLICA_RETRY'])
+
+    # Like get_db_connection(), but for reads that may be served by a replica
+    def get_read_connection():
+        if not has_app_context():
+            return app.get_db_connection()
+        # Already on the primary in this request (e.g. after a write): stay there
+        if g.get('_db_conn') is not None or pinned():
+            return app.get_db_connection()
+        conn = g.get('_db_read_conn')
+        if conn is None:
+            conn = app.replicas.acquire()
+            if conn is None:
+                return app.get_db_connection()
+            conn.request_scoped = True
+            g._db_read_conn = conn
+        return conn
+
+    def read_pool():
+        if pinned():
+            return app.db_pool
+        return app.replicas.pool() or app.db_pool
+
+    app.get_read_connection = get_read_connection
+    app.read_pool = read_pool
+
+    @app.teardown_appcontext
+    def release_read_connection(exc):
+        conn = g.pop('_db_read_conn', None)
+        if conn is not None:
+            conn._pool.release(conn)
+
+    app.cli.add_command(replicas_cli)
+
+
+replicas_cli = AppGroup('replicas', help='Read replicas.')
+
+
+@replicas_cli.command('status')
+def status_command():
+    """Reachability and replication lag of every DB_REPLICA_HOSTS entry."""
+    pools = current_app.replicas.pools
+    if not pools:
+        click.echo('No replicas configured (DB_REPLICA_HOSTS is empty).')
+        return
+    for pool in pools:
+        try:
+            conn = pool.acquire()
+        except Exception as e:
+            click.echo(f'{pool.name}: unreachable ({e})')
+            continue
+        try:
+            with conn.cursor() as cursor:
+                try:
+                    cursor.execute('SHOW REPLICA STATUS')
+                except Exception:
+                    # MySQL < 8.0.22 / MariaDB < 10.5.1
+                    cursor.execute('SHOW SLAVE STATUS')
+                row = cursor.fetchone()
+        finally:
+            pool.release(conn)
+        if not row:
+            click.echo(f'{pool.name}: reachable, not replicating')
+            continue
+        lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+        click.echo(f"{pool.name}: {'stopped' if lag is None else f'{lag}s behind'}")
@@ -0,0 +1,153 @@
+"""Occupancy and sales rollups for the admin dashboard.
+
+showtime_stats has one row per showtime and movie_daily_stats one per
+(movie_id, show_date): seats sold, active bookings, cancellations and gross
+revenue (seats sold at the showtime's price). The booking and cancellation
+transactions adjust both with record_sale() / record_cancellation(), as
+their last statements so the rollup rows stay locked as briefly as
+possible. Admin changes that move or reprice a showtime recompute the
+affected rows, and a full rebuild is available for backfills:
+
+    flask --app app rollups rebuild
+
+Archived showtimes (see archive.py) keep their row in
+showtime_stats_history; movie_daily_stats covers both.
+"""
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+# Per-showtime totals computed from the bookings; {where} filters showtimes s.
+# Formatted with the table names of _HOT or _HISTORY.
+_SHOWTIME_TOTALS = """
+    SELECT s.showtime_id,
+           COALESCE(SUM(bk.seats), 0) AS seats_sold,
+           COALESCE(SUM(bk.cancelled = 0), 0) AS bookings,
+           COALESCE(SUM(bk.cancelled = 1), 0) AS cancellations,
+           COALESCE(SUM(bk.seats), 0) * s.price AS gross_revenue
+    FROM {showtimes} s
+    JOIN (
+        SELECT b.booking_id, b.showtime_id, b.cancelled, COUNT(bs.seat_id) AS seats
+        FROM {bookings} b LEFT JOIN {booking_seats} bs ON bs.booking_id = b.booking_id AND b.cancelled = 0
+        GROUP BY b.booking_id
+    ) bk ON bk.showtime_id = s.showtime_id
+    WHERE {where}
+    GROUP BY s.showtime_id
+"""
+_HOT = {'showtimes': 'showtimes', 'bookings': 'bookings', 'booking_seats': 'booking_seats', 'stats': 'showtime_stats'}
+# Archived showtimes (see archive.py)
+_HISTORY = {name: f'{table}_history' for name, table in _HOT.items()}
+
+# movie_daily_stats rows from the showtime_stats of current and archived
+# showtimes; {where} filters showtimes s and its params are passed twice
+_DAY_TOTALS = """
+    INSERT INTO movie_daily_stats (movie_id, show_date, seats_sold, bookings, cancellations, gross_revenue)
+    SELECT movie_id, show_date, SUM(seats_sold), SUM(bookings), SUM(cancellations), SUM(gross_revenue)
+    FROM (
+        SELECT s.movie_id, s.show_date, st.seats_sold, st.bookings, st.cancellations, st.gross_revenue
+        FROM showtime_stats st JOIN showtimes s ON st.showtime_id = s.showtime_id
+        WHERE {where}
+        UNION ALL
+        SELECT s.movie_id, s.show_date, st.seats_sold, st.bookings, st.cancellations, st.gross_revenue
+        FROM showtime_stats_history st JOIN showtimes_history s ON st.showtime_id = s.showtime_id
+        WHERE {where}
+    ) days
+    GROUP BY movie_id, show_date
+"""
+
+_UPSERT = """
+    ON DUPLICATE KEY UPDATE
+        seats_sold = seats_sold + VALUES(seats_sold),
+        bookings = bookings + VALUES(bookings),
+        cancellations = cancellations + VALUES(cancellations),
+        gross_revenue = gross_revenue + VALUES(gross_revenue)
+"""
+
+
+def _adjust(cursor, showtime_id, seats, bookings, cancellations):
+    params = (seats, bookings, cancellations, seats, showtime_id)
+    cursor.execute(f"""
+        INSERT INTO showtime_stats (showtime_id, seats_sold, bookings, cancellations, gross_revenue)
+        SELECT s.showtime_id, %s, %s, %s, s.price * %s FROM showtimes s WHERE s.showtime_id = %s
+        {_UPSERT}
+    """, params)
+    cursor.execute(f"""
+        INSERT INTO movie_daily_stats (movie_id, show_date, seats_sold, bookings, cancellations, gross_revenue)
+        SELECT s.movie_id, s.show_date, %s, %s, %s, s.price * %s FROM showtimes s WHERE s.showtime_id = %s
+        {_UPSERT}
+    """, params)
+
+
+def record_sale(cursor, showtime_id, seat_count):
+    """A booking of seat_count seats. Runs inside the booking transaction."""
+    _adjust(cursor, showtime_id, seat_count, 1, 0)
+
+
+def record_cancellation(cursor, showtime_id, seat_count):
+    """An active booking of seat_count seats was cancelled."""
+    _adjust(cursor, showtime_id, -seat_count, -1, 1)
+
+
+def refresh_movie_day(cursor, movie_id, show_date):
+    """Recompute one movie_daily_stats row from showtime_stats (current and archived)."""
+    cursor.execute("DELETE FROM movie_daily_stats WHERE movie_id = %s AND show_date = %s", (movie_id, show_date))
+    cursor.execute(_DAY_TOTALS.format(where='s.movie_id = %s AND s.show_date = %s'),
+                   (movie_id, show_date) * 2)
+
+
+def refresh_showtime(cursor, showtime_id, previous=None):
+    """Recompute a showtime's row after it was edited (moved, repriced).
+    previous is its (movie_id, show_date) before the edit."""
+    cursor.execute("DELETE FROM showtime_stats WHERE showtime_id = %s", (showtime_id,))
+    cursor.execute(
+        "INSERT INTO showtime_stats (showtime_id, seats_sold, bookings, cancellations, gross_revenue) "
+        + _SHOWTIME_TOTALS.format(where='s.showtime_id = %s', **_HOT),
+        (showtime_id,)
+    )
+    cursor.execute("SELECT movie_id, show_date FROM showtimes WHERE showtime_id = %s", (showtime_id,))
+    current = cursor.fetchone()
+    days = {(current['movie_id'], current['show_date'])} if current else set()
+    if previous:
+        days.add(tuple(previous))
+    for movie_id, show_date in days:
+        refresh_movie_day(cursor, movie_id, show_date)
+
+
+def showtime_days(cursor, where, params):
+    """(movie_id, show_date) pairs of the showtimes matching where (on s)."""
+    cursor.execute(f"SELECT DISTINCT s.movie_id, s.show_date FROM showtimes s WHERE {where}", params)
+    return [(r['movie_id'], r['show_date']) for r in cursor.fetchall()]
+
+
+def rebuild(db):
+    """Recompute the tables from the bookings (current and archived) in one transaction."""
+    try:
+        with db.cursor() as cursor:
+            count = 0
+            for tables in (_HOT, _HISTORY):
+                cursor.execute(f"DELETE FROM {tables['stats']}")
+                count += cursor.execute(
+                    f"INSERT INTO {tables['stats']} (showtime_id, seats_sold, bookings, cancellations, gross_revenue) "
+                    + _SHOWTIME_TOTALS.format(where='1 = 1', **tables)
+                )
+            cursor.execute("DELETE FROM movie_daily_stats")
+            cursor.execute(_DAY_TOTALS.format(where='1 = 1'))
+        db.commit()
+        return count
+    except Exception:
+        db.rollback()
+        raise
+
+
+rollups_cli = AppGroup('rollups', help='Occupancy and sales rollups.')
+
+
+@rollups_cli.command('rebuild')
+def rebuild_command():
+    """Recompute the rollup tables from the bookings."""
+    db = current_app.get_db_connection()
+    try:
+        count = rebuild(db)
+    finally:
+        db.close()
+    click.echo(f'Rebuilt rollups for {count} showtime(s).')
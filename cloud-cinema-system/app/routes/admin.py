@@ -1,53 +1,59 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, Response
+from datetime import date
 
-admin_bp = Blueprint('admin', __name__)
-
-def _require_admin():
-    # Simple guard: ensure logged in and role is 'admin'
-    if 'user_id' not in session:
-        return False, redirect(url_for('auth.login'))
-
-    db = current_app.get_db_connection()
-    try:
-        with db.cursor() as cursor:
-            cursor.execute("SELECT role FROM users WHERE user_id = %s", (session['user_id'],))
-            user = cursor.fetchone()
-            if not user or user.get('role') != 'admin':
-                flash('Admin access required.', 'danger')
-                return False, redirect(url_for('main.index'))
-    finally:
-        db.close()
-    return True, None
+from .. import catalog, exports, holds, jobs, posters, removal, rollups, scheduling, seat_events
+from ..authz import admin_required
 
+admin_bp = Blueprint('admin', __name__)
 
 @admin_bp.route('/admin')
+@admin_required
 def admin_index():
-    ok, resp = _require_admin()
-    if not ok:
-        return resp
-
-    db = current_app.get_db_connection()
+    db = current_app.get_read_connection()
     try:
         with db.cursor() as cursor:
             cursor.execute("SELECT * FROM movies ORDER BY movie_id DESC")
             movies = cursor.fetchall()
 
-            # only non-expired showtimes
-            cursor.execute("SELECT s.*, m.title, sc.screen_name FROM showtimes s JOIN movies m ON s.movie_id = m.movie_id JOIN screens sc ON s.screen_id = sc.screen_id WHERE s.show_date >= CURDATE() ORDER BY s.show_date, s.show_time")
+            # Sales per movie, summed over its daily rollups
+            cursor.execute("SELECT movie_id, SUM(seats_sold) AS seats_sold, SUM(gross_revenue) AS gross_revenue FROM movie_daily_stats GROUP BY movie_id")
+            movie_sales = {r['movie_id']: r for r in cursor.fetchall()}
+
+            # only non-expired showtimes, with their occupancy rollup
+            cursor.execute("""
+                SELECT s.*, m.title, sc.screen_name, sc.total_seats,
+                       COALESCE(st.seats_sold, 0) AS seats_sold,
+                       COALESCE(st.cancellations, 0) AS cancellations,
+                       COALESCE(st.gross_revenue, 0) AS gross_revenue
+                FROM showtimes s
+                JOIN movies m ON s.movie_id = m.movie_id
+                JOIN screens sc ON s.screen_id = sc.screen_id
+                LEFT JOIN showtime_stats st ON st.showtime_id = s.showtime_id
+                WHERE s.show_date >= CURDATE() ORDER BY s.show_date, s.show_time
+            """)
             showtimes = cursor.fetchall()
     finally:
         db.close()
 
     # FIX: Pointing to 'admin_index.html' directly
-    return render_template('admin_index.html', movies=movies, showtimes=showtimes)
+    return render_template('admin_index.html', movies=movies, showtimes=showtimes, movie_sales=movie_sales)
+
+
+@admin_bp.route('/admin/metrics')
+@admin_required
+def admin_metrics():
+    metrics = current_app.query_metrics
+    return jsonify({
+        'instrumentation': metrics is not None,
+        'queries': metrics.snapshot() if metrics else None,
+        'db_pool': current_app.db_pool.stats(),
+        'catalog_cache': current_app.catalog_cache.stats(),
+    })
 
 
 @admin_bp.route('/admin/screens/add', methods=['GET', 'POST'])
+@admin_required
 def admin_add_screen():
-    ok, resp = _require_admin()
-    if not ok:
-        return resp
-
     if request.method == 'POST':
         screen_name = request.form.get('screen_name')
         total_seats = request.form.get('total_seats')
@@ -92,6 +98,7 @@ def admin_add_screen():
                     cursor.executemany('INSERT INTO seats (screen_id, seat_row, seat_number) VALUES (%s, %s, %s)', seats_to_insert)
 
                 db.commit()
+            current_app.seat_layouts.invalidate(screen_id)
 
             flash('Screen (hall) added and seats initialized.', 'success')
             return redirect(url_for('admin.admin_index'))
@@ -103,11 +110,8 @@ def admin_add_screen():
 
 
 @admin_bp.route('/admin/movies/<int:movie_id>/edit', methods=['GET', 'POST'])
+@admin_required
 def admin_edit_movie(movie_id):
-    ok, resp = _require_admin()
-    if not ok:
-        return resp
-
     db = current_app.get_db_connection()
     try:
         with db.cursor() as cursor:
@@ -117,9 +121,21 @@ def admin_edit_movie(movie_id):
                 rating = request.form.get('rating')
                 description = request.form.get('description')
                 image_url = request.form.get('image_url')
+                try:
+                    key = posters.poster_from_upload(request.files.get('poster'))
+                except posters.PosterError as e:
+                    flash(str(e), 'warning')
+                    return redirect(url_for('admin.admin_edit_movie', movie_id=movie_id))
+                if key:
+                    cursor.execute("UPDATE movies SET poster_key=%s WHERE movie_id=%s", (key, movie_id))
+                else:
+                    # A changed image_url replaces the processed poster
+                    cursor.execute("UPDATE movies SET poster_key = IF(image_url <=> %s, poster_key, NULL) WHERE movie_id=%s",
+                                   (image_url, movie_id))
                 cursor.execute("UPDATE movies SET title=%s, duration=%s, rating=%s, description=%s, image_url=%s WHERE movie_id=%s",
                                (title, duration, rating, description, image_url, movie_id))
                 db.commit()
+                catalog.invalidate_movie(movie_id)
                 flash('Movie updated.', 'success')
                 return redirect(url_for('admin.admin_index'))
 
@@ -132,54 +148,96 @@ def admin_edit_movie(movie_id):
     return render_template('admin_edit_movie.html', movie=movie)
 
 
-@admin_bp.route('/admin/movies/<int:movie_id>/delete', methods=['POST'])
-def admin_delete_movie(movie_id):
-    ok, resp = _require_admin()
-    if not ok:
-        return resp
+def _invalidate_removed(kind, target_id, showtime_ids, movie_ids):
+    for sid in showtime_ids:
+        current_app.seat_index.invalidate(sid)
+    catalog.invalidate_showtimes(*movie_ids)
+    if kind == 'movie':
+        catalog.invalidate_movie(target_id)
+
+
+def _removal_scope(cursor, kind, target_id):
+    """The showtime ids and movie ids whose cache entries a removal touches."""
+    showtime_ids = removal.showtime_ids(cursor, kind, target_id)
+    if kind == 'movie':
+        return showtime_ids, [target_id]
+    cursor.execute('SELECT movie_id FROM showtimes WHERE showtime_id = %s', (target_id,))
+    return showtime_ids, [r['movie_id'] for r in cursor.fetchall()]
+
+
+def _remove(kind, target_id):
+    """Delete a movie or showtime with all of its bookings.
+
+    Returns the job id when the removal was handed to a background job, or
+    None when it already finished inside this request.
+    """
+    app = current_app._get_current_object()
     db = current_app.get_db_connection()
     try:
         with db.cursor() as cursor:
-            # 1. CASCADE DELETE: Find all showtimes for this movie
-            cursor.execute('SELECT showtime_id FROM showtimes WHERE movie_id = %s', (movie_id,))
-            showtimes = cursor.fetchall()
-            
-            for show in showtimes:
-                sid = show['showtime_id']
-                # 2. Find bookings for each showtime
-                cursor.execute('SELECT booking_id FROM bookings WHERE showtime_id = %s', (sid,))
-                bookings = cursor.fetchall()
-                
-                for booking in bookings:
-                    bid = booking['booking_id']
-                    # 3. Delete linked Booking Seats
-                    cursor.execute('DELETE FROM booking_seats WHERE booking_id = %s', (bid,))
-                    # 4. Delete Bookings
-                    cursor.execute('DELETE FROM bookings WHERE booking_id = %s', (bid,))
-                
-                # 5. Delete Showtimes
-                cursor.execute('DELETE FROM showtimes WHERE showtime_id = %s', (sid,))
-            
-            # 6. Finally, Delete the Movie
-            cursor.execute('DELETE FROM movies WHERE movie_id = %s', (movie_id,))
-            db.commit()
+            showtime_ids, movie_ids = _removal_scope(cursor, kind, target_id)
+            total = removal.count_bookings(cursor, kind, target_id)
+
+            if total <= app.config['ADMIN_DELETE_SYNC_LIMIT']:
+                removal.delete_cascade(cursor, kind, target_id)
+                db.commit()
+                _invalidate_removed(kind, target_id, showtime_ids, movie_ids)
+                return None
+
+            # Closed for booking and hidden from the catalog from the same
+            # commit that creates the job; the rows go in the background
+            removal.mark_removing(cursor, kind, target_id)
+        job_id = jobs.create_job(db, f'delete_{kind}', target_id, total)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    _invalidate_removed(kind, target_id, showtime_ids, movie_ids)
+    _start_removal(app, job_id, kind, target_id, showtime_ids, movie_ids)
+    return job_id
+
+
+def _start_removal(app, job_id, kind, target_id, showtime_ids, movie_ids):
+    def work(job_id):
+        removal.delete_in_chunks(app.get_db_connection(), kind, target_id,
+                                 app.config['ADMIN_DELETE_CHUNK_SIZE'], job_id)
+        _invalidate_removed(kind, target_id, showtime_ids, movie_ids)
+
+    jobs.start_job(app, job_id, work)
+
+
+def _resume_stale_jobs(db):
+    """Restart removal jobs whose worker died (see jobs.claim_stale)."""
+    app = current_app._get_current_object()
+    for job in jobs.claim_stale(db, app.config['ADMIN_JOB_STALE_SECONDS']):
+        kind = job['kind'].replace('delete_', '', 1)
+        with db.cursor() as cursor:
+            showtime_ids, movie_ids = _removal_scope(cursor, kind, job['target_id'])
+        _start_removal(app, job['job_id'], kind, job['target_id'], showtime_ids, movie_ids)
+
+
+@admin_bp.route('/admin/movies/<int:movie_id>/delete', methods=['POST'])
+@admin_required
+def admin_delete_movie(movie_id):
+    try:
+        job_id = _remove('movie', movie_id)
+        if job_id is None:
             flash('Movie and all associated data (showtimes, bookings) deleted.', 'success')
+        else:
+            flash(f'Movie has many bookings; deletion continues in the background (job #{job_id}).', 'info')
+            return redirect(url_for('admin.admin_jobs'))
     except Exception as e:
-        db.rollback()
         # Log the error for debugging
         print(f"Error deleting movie: {e}")
         flash('Cannot delete movie. Ensure all bookings are cleared first.', 'danger')
-    finally:
-        db.close()
     return redirect(url_for('admin.admin_index'))
 
 
 @admin_bp.route('/admin/showtimes/<int:showtime_id>/edit', methods=['GET', 'POST'])
+@admin_required
 def admin_edit_showtime(showtime_id):
-    ok, resp = _require_admin()
-    if not ok:
-        return resp
-
     db = current_app.get_db_connection()
     try:
         with db.cursor() as cursor:
@@ -189,9 +247,28 @@ def admin_edit_showtime(showtime_id):
                 show_date = request.form.get('show_date')
                 show_time = request.form.get('show_time')
                 price = request.form.get('price')
+                try:
+                    screen_id, movie_id = int(screen_id), int(movie_id)
+                    start = scheduling.show_start(scheduling.parse_date(show_date), scheduling.parse_time(show_time))
+                except (TypeError, ValueError):
+                    flash('Invalid date or time.', 'warning')
+                    return redirect(url_for('admin.admin_edit_showtime', showtime_id=showtime_id))
+                turnover = current_app.config['SHOWTIME_TURNOVER_MINUTES']
+                clash = scheduling.find_clash(cursor, screen_id, movie_id, start, turnover, showtime_id)
+                if clash:
+                    db.rollback()
+                    flash(f'The screen is already in use: {clash}.', 'warning')
+                    return redirect(url_for('admin.admin_edit_showtime', showtime_id=showtime_id))
+                cursor.execute('SELECT movie_id, show_date FROM showtimes WHERE showtime_id = %s', (showtime_id,))
+                before = cursor.fetchone()
                 cursor.execute('UPDATE showtimes SET movie_id=%s, screen_id=%s, show_date=%s, show_time=%s, price=%s WHERE showtime_id=%s',
                                (movie_id, screen_id, show_date, show_time, price, showtime_id))
+                # Moving or repricing the showtime changes its rollups
+                rollups.refresh_showtime(cursor, showtime_id,
+                                         (before['movie_id'], before['show_date']) if before else None)
                 db.commit()
+                current_app.seat_index.invalidate(showtime_id)
+                catalog.invalidate_showtimes(movie_id, before['movie_id'] if before else None)
                 flash('Showtime updated.', 'success')
                 return redirect(url_for('admin.admin_index'))
 
@@ -209,34 +286,38 @@ def admin_edit_showtime(showtime_id):
 
 
 @admin_bp.route('/admin/showtimes/<int:showtime_id>/delete', methods=['POST'])
+@admin_required
 def admin_delete_showtime(showtime_id):
-    ok, resp = _require_admin()
-    if not ok:
-        return resp
+    job_id = _remove('showtime', showtime_id)
+    if job_id is not None:
+        flash(f'Showtime has many bookings; deletion continues in the background (job #{job_id}).', 'info')
+        return redirect(url_for('admin.admin_jobs'))
+    flash('Showtime and its bookings deleted.', 'success')
+    return redirect(url_for('admin.admin_index'))
+
+
+@admin_bp.route('/admin/jobs')
+@admin_required
+def admin_jobs():
     db = current_app.get_db_connection()
     try:
-        with db.cursor() as cursor:
-            cursor.execute('SELECT booking_id FROM bookings WHERE showtime_id = %s', (showtime_id,))
-            bks = cursor.fetchall()
-            for bk in bks:
-                cursor.execute('DELETE FROM booking_seats WHERE booking_id = %s', (bk['booking_id'],))
-            cursor.execute('DELETE FROM bookings WHERE showtime_id = %s', (showtime_id,))
-            cursor.execute('DELETE FROM showtimes WHERE showtime_id = %s', (showtime_id,))
-            db.commit()
-            flash('Showtime and its bookings deleted.', 'success')
+        _resume_stale_jobs(db)
+        job_list = jobs.recent_jobs(db)
     finally:
         db.close()
-    return redirect(url_for('admin.admin_index'))
+    return render_template('admin_jobs.html', jobs=job_list)
 
 
 @admin_bp.route('/admin/bookings')
+@admin_required
 def admin_bookings():
-    ok, resp = _require_admin()
-    if not ok:
-        return resp
-    db = current_app.get_db_connection()
+    db = current_app.get_read_connection()
     try:
         with db.cursor() as cursor:
+            cursor.execute("SELECT movie_id, title FROM movies ORDER BY title")
+            movies = cursor.fetchall()
+            cursor.execute("SELECT screen_id, screen_name FROM screens ORDER BY screen_name")
+            screens = cursor.fetchall()
             cursor.execute("""
                 SELECT b.booking_id, b.booking_time, u.name AS user_name,
                        s.show_date, s.show_time, m.title,
@@ -256,14 +337,41 @@ def admin_bookings():
         db.close()
     
     # FIX: Pointing to 'admin_bookings.html' directly
-    return render_template('admin_bookings.html', bookings=bookings)
+    return render_template('admin_bookings.html', bookings=bookings, movies=movies, screens=screens)
+
+
+@admin_bp.route('/admin/bookings/export')
+@admin_required
+def admin_export_bookings():
+    fmt = request.args.get('format', 'csv')
+    status = request.args.get('status', 'all')
+    if fmt not in exports.FORMATS or status not in ('all', 'active', 'cancelled'):
+        flash('Invalid export options.', 'warning')
+        return redirect(url_for('admin.admin_bookings'))
+    try:
+        filters = {
+            'date_from': scheduling.parse_date(request.args['from']) if request.args.get('from') else None,
+            'date_to': scheduling.parse_date(request.args['to']) if request.args.get('to') else None,
+            'movie_id': int(request.args['movie_id']) if request.args.get('movie_id') else None,
+            'screen_id': int(request.args['screen_id']) if request.args.get('screen_id') else None,
+            'status': status,
+        }
+    except ValueError:
+        flash('Invalid export filters.', 'warning')
+        return redirect(url_for('admin.admin_bookings'))
+
+    chunks = exports.stream_bookings(current_app.read_pool(), fmt, **filters)
+    filename = f'bookings-{date.today():%Y%m%d}.{fmt}'
+    return Response(chunks, mimetype=exports.FORMATS[fmt], headers={
+        'Content-Disposition': f'attachment; filename={filename}',
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no',
+    })
 
 
 @admin_bp.route('/admin/bookings/cancel', methods=['POST'])
+@admin_required
 def admin_cancel_booking():
-    ok, resp = _require_admin()
-    if not ok:
-        return resp
     booking_id = request.form.get('booking_id')
     if not booking_id:
         flash('Invalid booking id.', 'warning')
@@ -277,12 +385,23 @@ def admin_cancel_booking():
     db = current_app.get_db_connection()
     try:
         with db.cursor() as cursor:
+            cursor.execute('SELECT showtime_id, cancelled FROM bookings WHERE booking_id = %s', (bid,))
+            row = cursor.fetchone()
+            cursor.execute('SELECT seat_id FROM booking_seats WHERE booking_id = %s', (bid,))
+            freed = [r['seat_id'] for r in cursor.fetchall()]
+
+            holds.release_booking(cursor, bid)
             cursor.execute('DELETE FROM booking_seats WHERE booking_id = %s', (bid,))
             try:
                 cursor.execute('UPDATE bookings SET cancelled = 1 WHERE booking_id = %s', (bid,))
             except Exception:
                 cursor.execute('DELETE FROM bookings WHERE booking_id = %s', (bid,))
+            if row and not row['cancelled']:
+                rollups.record_cancellation(cursor, row['showtime_id'], len(freed))
             db.commit()
+            if row:
+                current_app.seat_index.mark_free(row['showtime_id'], freed)
+                seat_events.publish(row['showtime_id'], seat_events.RELEASED, freed)
             flash('Booking cancelled.', 'success')
     finally:
         db.close()
@@ -290,24 +409,28 @@ def admin_cancel_booking():
 
 
 @admin_bp.route('/admin/movies/add', methods=['GET', 'POST'])
+@admin_required
 def admin_add_movie():
-    ok, resp = _require_admin()
-    if not ok:
-        return resp
-
     if request.method == 'POST':
         title = request.form.get('title')
         duration = request.form.get('duration')
         rating = request.form.get('rating')
         description = request.form.get('description')
         image_url = request.form.get('image_url')
+        try:
+            key = posters.poster_from_upload(request.files.get('poster'))
+        except posters.PosterError as e:
+            flash(str(e), 'warning')
+            return render_template('admin_add_movie.html')
 
         db = current_app.get_db_connection()
         try:
             with db.cursor() as cursor:
-                cursor.execute("INSERT INTO movies (title, duration, rating, description, image_url) VALUES (%s, %s, %s, %s, %s)",
-                               (title, duration, rating, description, image_url))
+                cursor.execute("INSERT INTO movies (title, duration, rating, description, image_url, poster_key) VALUES (%s, %s, %s, %s, %s, %s)",
+                               (title, duration, rating, description, image_url, key))
+                movie_id = cursor.lastrowid
                 db.commit()
+            catalog.invalidate_movie(movie_id)
             flash('Movie added.', 'success')
             return redirect(url_for('admin.admin_index'))
         finally:
@@ -317,11 +440,8 @@ def admin_add_movie():
 
 
 @admin_bp.route('/admin/showtimes/add', methods=['GET', 'POST'])
+@admin_required
 def admin_add_showtime():
-    ok, resp = _require_admin()
-    if not ok:
-        return resp
-
     db = current_app.get_db_connection()
     try:
         with db.cursor() as cursor:
@@ -339,15 +459,119 @@ def admin_add_showtime():
         show_time = request.form.get('show_time')
         price = request.form.get('price')
 
+        try:
+            screen_id, movie_id = int(screen_id), int(movie_id)
+            start = scheduling.show_start(scheduling.parse_date(show_date), scheduling.parse_time(show_time))
+        except (TypeError, ValueError):
+            flash('Invalid date or time.', 'warning')
+            return render_template('admin_add_showtime.html', movies=movies, screens=screens)
+
         db = current_app.get_db_connection()
         try:
             with db.cursor() as cursor:
+                turnover = current_app.config['SHOWTIME_TURNOVER_MINUTES']
+                clash = scheduling.find_clash(cursor, screen_id, movie_id, start, turnover)
+                if clash:
+                    db.rollback()
+                    flash(f'The screen is already in use: {clash}.', 'warning')
+                    return render_template('admin_add_showtime.html', movies=movies, screens=screens)
                 cursor.execute("INSERT INTO showtimes (movie_id, screen_id, show_date, show_time, price) VALUES (%s, %s, %s, %s, %s)",
                                (movie_id, screen_id, show_date, show_time, price))
                 db.commit()
+            catalog.invalidate_showtimes(movie_id)
             flash('Showtime added.', 'success')
             return redirect(url_for('admin.admin_index'))
         finally:
             db.close()
 
-    return render_template('admin_add_showtime.html', movies=movies, screens=screens)
\ No newline at end of file
+    return render_template('admin_add_showtime.html', movies=movies, screens=screens)
+
+
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+@admin_bp.route('/admin/showtimes/schedule', methods=['GET', 'POST'])
+@admin_required
+def admin_schedule_showtimes():
+    db = current_app.get_db_connection()
+    try:
+        with db.cursor() as cursor:
+            cursor.execute("SELECT movie_id, title, duration FROM movies ORDER BY title")
+            movies = cursor.fetchall()
+            cursor.execute("SELECT screen_id, screen_name FROM screens ORDER BY screen_name")
+            screens = cursor.fetchall()
+    finally:
+        db.close()
+
+    def form_page(conflicts=None):
+        return render_template('admin_schedule_showtimes.html', movies=movies, screens=screens,
+                               weekdays=WEEKDAYS, form=request.form, conflicts=conflicts or [])
+
+    if request.method == 'GET':
+        return form_page()
+
+    try:
+        movie_id = int(request.form.get('movie_id'))
+        screen_ids = sorted({int(s) for s in request.form.getlist('screen_id')})
+        first_date = scheduling.parse_date(request.form.get('start_date'))
+        last_date = scheduling.parse_date(request.form.get('end_date'))
+        weekdays = {int(d) for d in request.form.getlist('weekday')}
+        times = scheduling.parse_times(request.form.get('times'))
+        price = float(request.form.get('price'))
+    except (TypeError, ValueError):
+        flash('Please check the dates, times and price.', 'warning')
+        return form_page()
+
+    if not screen_ids or not weekdays or not times or last_date < first_date:
+        flash('Choose at least one screen, day and time, and an end date after the start date.', 'warning')
+        return form_page()
+
+    starts = [(sid, start) for start in scheduling.expand(first_date, last_date, weekdays, times)
+              for sid in screen_ids]
+    limit = current_app.config['SCHEDULE_MAX_SLOTS']
+    if len(starts) > limit:
+        flash(f'That schedule has {len(starts)} showtimes; the limit is {limit} per submission.', 'warning')
+        return form_page()
+    if not starts:
+        flash('No dates in that range fall on the chosen days.', 'warning')
+        return form_page()
+
+    skip_conflicts = request.form.get('skip_conflicts') == '1'
+    turnover = current_app.config['SHOWTIME_TURNOVER_MINUTES']
+    db = current_app.get_db_connection()
+    try:
+        with db.cursor() as cursor:
+            # Serialises scheduling on these screens until commit
+            if scheduling.lock_screens(cursor, screen_ids) != screen_ids:
+                db.rollback()
+                flash('Screen not found.', 'warning')
+                return form_page()
+            duration = scheduling.movie_duration(cursor, movie_id)
+            if duration is None:
+                db.rollback()
+                flash('Movie not found.', 'warning')
+                return form_page()
+
+            timelines = scheduling.load_timelines(cursor, screen_ids, first_date, last_date, turnover)
+            accepted, conflicts = scheduling.plan(timelines, starts, duration, turnover)
+            if conflicts and not skip_conflicts:
+                db.rollback()
+                names = {sc['screen_id']: sc['screen_name'] for sc in screens}
+                flash(f'{len(conflicts)} of {len(starts)} showtimes overlap existing ones; nothing was added.', 'warning')
+                return form_page([(names.get(sid), start, clash) for sid, start, clash in conflicts[:50]])
+
+            scheduling.insert_showtimes(cursor, movie_id, price, accepted,
+                                        current_app.config['SCHEDULE_BATCH_SIZE'])
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    catalog.invalidate_showtimes(movie_id)
+    message = f'{len(accepted)} showtimes added.'
+    if conflicts:
+        message += f' {len(conflicts)} overlapping slots were skipped.'
+    flash(message, 'success')
+    return redirect(url_for('admin.admin_index'))
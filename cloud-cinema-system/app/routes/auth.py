@@ -1,6 +1,9 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+
+from .. import aiodb
+from ..asgi import async_view
+from ..passwords import HasherBusy
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -11,7 +14,11 @@ def register():
         email = request.form.get('email')
         password = request.form.get('password')
         
-        hashed_pw = generate_password_hash(password)
+        try:
+            hashed_pw = current_app.password_hasher.hash(password)
+        except HasherBusy:
+            flash("The server is busy. Please try again in a moment.", "warning")
+            return render_template('register.html'), 503
         
         db = current_app.get_db_connection()
         try:
@@ -35,6 +42,14 @@ def login():
     if request.method == 'POST':
         email = request.form.get('email')
         password = request.form.get('password')
+
+        # Throttle before doing any hashing work
+        ip_key = f'ip:{request.remote_addr}'
+        account_key = f"acct:{(email or '').strip().lower()}"
+        if current_app.login_ip_throttle.blocked(ip_key) or current_app.login_account_throttle.blocked(account_key):
+            flash("Too many login attempts. Please wait a minute and try again.", "danger")
+            return render_template('login.html'), 429
+        current_app.login_ip_throttle.hit(ip_key)
         
         db = current_app.get_db_connection()
         try:
@@ -43,21 +58,25 @@ def login():
                 user = cursor.fetchone()
                 
                 # Check if user exists
-                password_match = False
+                password_match = needs_rehash = False
                 if user:
                     try:
-                        if check_password_hash(user['pass'], password):
-                            password_match = True
-                    except ValueError:
-                        # Fallback for plain text passwords (if any exist)
-                        if user['pass'] == password:
-                            password_match = True
+                        password_match, needs_rehash = current_app.password_hasher.verify(user['pass'], password)
+                    except HasherBusy:
+                        flash("The server is busy. Please try again in a moment.", "warning")
+                        return render_template('login.html'), 503
 
                 if password_match:
+                    current_app.login_account_throttle.reset(account_key)
+                    # Plaintext or outdated hash: upgrade it in the background
+                    if needs_rehash:
+                        current_app.password_hasher.rehash_later(current_app.db_pool, user['user_id'], user['pass'], password)
+
                     session['user_id'] = user['user_id']
                     session['name'] = user['name']
                     role = user.get('role', 'customer')
                     session['role'] = role
+                    session['role_version'] = user.get('role_version', 0)
                     
                     flash(f"Welcome back, {user['name']}!", "success")
                     
@@ -67,6 +86,7 @@ def login():
                     else:
                         return redirect(url_for('main.index'))
                 else:
+                    current_app.login_account_throttle.hit(account_key)
                     flash("Invalid credentials!", "danger")
         finally:
             db.close()
@@ -106,19 +126,18 @@ def edit_profile():
                     cursor.execute('SELECT pass FROM users WHERE user_id = %s', (user_id,))
                     rowp = cursor.fetchone()
                     
-                    curr_match = False
                     try:
-                        if check_password_hash(rowp.get('pass', ''), current_password):
-                            curr_match = True
-                    except:
-                        if rowp.get('pass') == current_password:
-                            curr_match = True
+                        curr_match, _ = current_app.password_hasher.verify(rowp.get('pass', ''), current_password)
+                        if curr_match:
+                            hashed = current_app.password_hasher.hash(password)
+                    except HasherBusy:
+                        flash('The server is busy. Please try again in a moment.', 'warning')
+                        return redirect(url_for('auth.edit_profile'))
                             
                     if not curr_match:
                         flash('Current password is incorrect.', 'danger')
                         return redirect(url_for('auth.edit_profile'))
 
-                    hashed = generate_password_hash(password)
                     cursor.execute('UPDATE users SET name=%s, email=%s, pass=%s WHERE user_id=%s', (name, email, hashed, user_id))
                 else:
                     cursor.execute('UPDATE users SET name=%s, email=%s WHERE user_id=%s', (name, email, user_id))
@@ -135,51 +154,168 @@ def edit_profile():
 
     return render_template('profile_edit.html', user=user)
 
+def _parse_cursor(value, parts):
+    # Keyset cursors look like "2026-01-31.18:00:00.42" (upcoming) or "42" (past)
+    if not value:
+        return None
+    fields = value.split('.')
+    if len(fields) != parts:
+        return None
+    try:
+        fields[-1] = int(fields[-1])
+        if parts == 3:
+            datetime.strptime(fields[0], '%Y-%m-%d')
+            datetime.strptime(fields[1], '%H:%M:%S')
+    except ValueError:
+        return None
+    return fields
+
+
+def _page(rows, size):
+    # One extra row was fetched to know whether another page exists
+    return rows[:size], len(rows) > size
+
+
+_PROFILE_USER = 'SELECT user_id, name, email, role, created_at FROM users WHERE user_id = %s'
+_PROFILE_SELECT = """
+    SELECT b.booking_id, b.booking_time, b.cancelled, b.showtime_id,
+           s.show_date, s.show_time, m.title, m.image_url, m.poster_key, sc.screen_name
+    FROM {bookings} b
+    JOIN {showtimes} s ON b.showtime_id = s.showtime_id
+    JOIN movies m ON s.movie_id = m.movie_id
+    JOIN screens sc ON s.screen_id = sc.screen_id
+"""
+_PROFILE_HOT = _PROFILE_SELECT.format(bookings='bookings', showtimes='showtimes')
+# Bookings of archived showtimes (see archive.py), all of them past
+_PROFILE_ARCHIVED = _PROFILE_SELECT.format(bookings='bookings_history', showtimes='showtimes_history')
+
+
+def _profile_args():
+    # (user_id, page size, upcoming cursor, past cursor) of this request
+    return (session['user_id'], current_app.config['PROFILE_PAGE_SIZE'],
+            _parse_cursor(request.args.get('upcoming_after'), 3),
+            _parse_cursor(request.args.get('past_before'), 1))
+
+
+def _upcoming_query(user_id, size, upcoming_after):
+    # Upcoming: soonest show first, keyed on (show_date, show_time, booking_id)
+    sql = _PROFILE_HOT + " WHERE b.user_id = %s AND b.cancelled = 0 AND s.show_date >= CURDATE()"
+    params = [user_id]
+    if upcoming_after:
+        sql += " AND (s.show_date, s.show_time, b.booking_id) > (%s, %s, %s)"
+        params.extend(upcoming_after)
+    sql += " ORDER BY s.show_date, s.show_time, b.booking_id LIMIT %s"
+    return sql, params + [size + 1]
+
+
+def _past_query(user_id, size, past_before):
+    # Past or cancelled: most recent booking first, keyed on booking_id.
+    # Current and archived bookings are each limited to a page on their own
+    # index, then merged.
+    branches, params = [], []
+    for select, where in ((_PROFILE_HOT, " AND (s.show_date < CURDATE() OR b.cancelled = 1)"),
+                          (_PROFILE_ARCHIVED, "")):
+        sql = select + " WHERE b.user_id = %s" + where
+        params.append(user_id)
+        if past_before:
+            sql += " AND b.booking_id < %s"
+            params.extend(past_before)
+        branches.append(f"({sql} ORDER BY b.booking_id DESC LIMIT %s)")
+        params.append(size + 1)
+    return " UNION ALL ".join(branches) + " ORDER BY booking_id DESC LIMIT %s", params + [size + 1]
+
+
+def _seats_query(booking_ids):
+    # Seats for every booking on both pages (current or archived) in one query
+    placeholders = ','.join(['%s'] * len(booking_ids))
+    return f"""
+        SELECT bs.booking_id, se.seat_row, se.seat_number
+        FROM booking_seats bs JOIN seats se ON bs.seat_id = se.seat_id
+        WHERE bs.booking_id IN ({placeholders})
+        UNION ALL
+        SELECT bs.booking_id, se.seat_row, se.seat_number
+        FROM booking_seats_history bs JOIN seats se ON bs.seat_id = se.seat_id
+        WHERE bs.booking_id IN ({placeholders})
+        ORDER BY seat_row, seat_number
+    """, booking_ids * 2
+
+
+def _render_profile(user, upcoming_page, past_page, seat_rows, past_before):
+    upcoming_rows, upcoming_more = upcoming_page
+    past_rows, past_more = past_page
+    seats_by_booking = {}
+    for seat in seat_rows:
+        seats_by_booking.setdefault(seat['booking_id'], []).append(seat)
+
+    def entry(row):
+        return {
+            'booking': row,
+            'show': row,
+            'seats': seats_by_booking.get(row['booking_id'], []),
+            'cancelled': bool(row['cancelled']),
+        }
+
+    upcoming = [entry(r) for r in upcoming_rows]
+    past = [entry(r) for r in past_rows]
+
+    next_upcoming = None
+    if upcoming_more:
+        last = upcoming_rows[-1]
+        next_upcoming = f"{last['show_date']}.{last['show_time']}.{last['booking_id']}"
+    next_past = str(past_rows[-1]['booking_id']) if past_more else None
+
+    return render_template('profile.html', upcoming=upcoming, past=past, user=user,
+                           next_upcoming=next_upcoming, next_past=next_past,
+                           paging_past=past_before is not None)
+
+
 @auth_bp.route('/profile')
 def profile():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
 
-    user_id = session['user_id']
-    db = current_app.get_db_connection()
-    bookings = []
-    user = None
+    user_id, size, upcoming_after, past_before = _profile_args()
+
+    db = current_app.get_read_connection()
     try:
         with db.cursor() as cursor:
-            cursor.execute('SELECT user_id, name, email, role, created_at FROM users WHERE user_id = %s', (user_id,))
+            cursor.execute(_PROFILE_USER, (user_id,))
             user = cursor.fetchone()
-            cursor.execute("SELECT * FROM bookings WHERE user_id = %s ORDER BY booking_time DESC", (user_id,))
-            rows = cursor.fetchall()
-            for b in rows:
-                cursor.execute("SELECT s.*, m.title, m.image_url, sc.screen_name FROM showtimes s JOIN movies m ON s.movie_id = m.movie_id JOIN screens sc ON s.screen_id = sc.screen_id WHERE s.showtime_id = %s", (b['showtime_id'],))
-                show = cursor.fetchone()
-                
-                cursor.execute("SELECT se.seat_row, se.seat_number FROM booking_seats bs JOIN seats se ON bs.seat_id = se.seat_id WHERE bs.booking_id = %s", (b['booking_id'],))
-                seat_rows = cursor.fetchall()
+            cursor.execute(*_upcoming_query(user_id, size, upcoming_after))
+            upcoming_page = _page(cursor.fetchall(), size)
+            cursor.execute(*_past_query(user_id, size, past_before))
+            past_page = _page(cursor.fetchall(), size)
 
-                is_past = False
-                cancelled_flag = bool(b.get('cancelled', 0)) if isinstance(b, dict) else False
-                if show:
-                    sd = show.get('show_date')
-                    try:
-                        if isinstance(sd, str):
-                            sd = datetime.strptime(sd, '%Y-%m-%d').date()
-                        if sd:
-                            is_past = sd < datetime.now().date()
-                    except Exception:
-                        is_past = False
-
-                bookings.append({
-                    'booking': b,
-                    'show': show,
-                    'seats': seat_rows,
-                    'is_past': is_past,
-                    'cancelled': cancelled_flag
-                })
+            seat_rows = []
+            booking_ids = [r['booking_id'] for r in upcoming_page[0] + past_page[0]]
+            if booking_ids:
+                cursor.execute(*_seats_query(booking_ids))
+                seat_rows = cursor.fetchall()
     finally:
         db.close()
 
-    upcoming = [b for b in bookings if not b['is_past'] and not b['cancelled']]
-    past = [b for b in bookings if b['is_past'] or b['cancelled']]
+    return _render_profile(user, upcoming_page, past_page, seat_rows, past_before)
+
+
+@async_view('auth.profile')
+async def profile_async():
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+
+    user_id, size, upcoming_after, past_before = _profile_args()
+
+    async with aiodb.read_cursor() as cursor:
+        await cursor.execute(_PROFILE_USER, (user_id,))
+        user = await cursor.fetchone()
+        await cursor.execute(*_upcoming_query(user_id, size, upcoming_after))
+        upcoming_page = _page(list(await cursor.fetchall()), size)
+        await cursor.execute(*_past_query(user_id, size, past_before))
+        past_page = _page(list(await cursor.fetchall()), size)
+
+        seat_rows = []
+        booking_ids = [r['booking_id'] for r in upcoming_page[0] + past_page[0]]
+        if booking_ids:
+            await cursor.execute(*_seats_query(booking_ids))
+            seat_rows = await cursor.fetchall()
 
-    return render_template('profile.html', upcoming=upcoming, past=past, user=user)
\ No newline at end of file
+    return _render_profile(user, upcoming_page, past_page, seat_rows, past_before)
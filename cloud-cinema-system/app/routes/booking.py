@@ -1,16 +1,63 @@
-from flask import Blueprint, render_template, request, redirect, url_for, current_app, session, flash
-from collections import OrderedDict
+from flask import Blueprint, render_template, request, redirect, url_for, current_app, session, flash, jsonify
+import time
+
+from .. import aiodb, allocation, holds, replicas, rollups, seat_events
+from ..asgi import async_view
+from ..waiting_room import RETRY_AFTER, QueueFull
 
 booking_bp = Blueprint('booking', __name__)
 
+_SHOWTIME = "SELECT s.*, m.title FROM showtimes s JOIN movies m ON s.movie_id = m.movie_id WHERE s.showtime_id = %s"
+
+
+def _session_hold(showtime_id):
+    hold = session.get('seat_hold')
+    if not hold or hold.get('showtime_id') != showtime_id:
+        return None
+    return hold
+
+
+def _seat_index(showtime_id, screen_id=None):
+    # A miss loads from the primary: rebuilt from a lagging replica right
+    # after an invalidation, the index would show sold seats as free
+    index = current_app.seat_index.cached(showtime_id, screen_id)
+    if index is None:
+        with replicas.primary_cursor() as cursor:
+            index = current_app.seat_index.get(showtime_id, cursor, screen_id)
+    return index
+
+
+async def _seat_index_async(showtime_id, screen_id=None):
+    index = current_app.seat_index.cached(showtime_id, screen_id)
+    if index is None:
+        async with aiodb.primary_cursor() as cursor:
+            index = await current_app.seat_index.get_async(showtime_id, cursor, screen_id)
+    return index
+
+
+def _drop_session_hold(db):
+    # Release whatever the user was still holding before taking a new hold
+    hold = session.pop('seat_hold', None)
+    if hold:
+        freed = holds.release_hold(db, hold['token'])
+        current_app.seat_index.mark_free(hold['showtime_id'], freed)
+        seat_events.publish(hold['showtime_id'], seat_events.RELEASED, freed)
+
+
 @booking_bp.route('/book/<int:showtime_id>', methods=['GET', 'POST'])
 def select_seats(showtime_id):
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
+    if not current_app.waiting_room.admitted(showtime_id):
+        return redirect(url_for('booking.waiting_room', showtime_id=showtime_id))
 
-    db = current_app.get_db_connection()
+    # Showing the seat map is a read; holding seats must run on the primary
+    db = current_app.get_db_connection() if request.method == 'POST' else current_app.get_read_connection()
 
     if request.method == 'POST':
+        if 'best' in request.form:
+            return _hold_best_seats(db, showtime_id, request.form['best'])
+
         selected = request.form.getlist('seat')
         if not selected:
             flash('Please select at least one seat.')
@@ -22,50 +69,268 @@ def select_seats(showtime_id):
             flash('Invalid seat selection.')
             return redirect(url_for('booking.select_seats', showtime_id=showtime_id))
 
+        user_id = session['user_id']
         try:
             with db.cursor() as cursor:
-                # Check for already booked seats
-                placeholders = ','.join(['%s'] * len(seat_ids))
-                sql = f"""
-                    SELECT bs.seat_id
-                    FROM booking_seats bs
-                    JOIN bookings b ON bs.booking_id = b.booking_id
-                    WHERE b.showtime_id = %s AND bs.seat_id IN ({placeholders})
-                """
-                cursor.execute(sql, tuple([showtime_id] + seat_ids))
-                conflicts = cursor.fetchall()
-                if conflicts:
+                # Fast pre-check against the in-memory index
+                index = current_app.seat_index.get(showtime_id, cursor)
+                if index is None:
+                    flash('Showtime not found.')
+                    return redirect(url_for('main.index'))
+                if index.unknown(seat_ids):
+                    flash('Invalid seat selection.')
+                    return redirect(url_for('booking.select_seats', showtime_id=showtime_id))
+                # Seats this session already holds show as taken in the index;
+                # they are released just below, so they do not conflict
+                hold = _session_hold(showtime_id)
+                own = set(hold['seat_ids']) if hold else set()
+                if index.conflicts([s for s in seat_ids if s not in own]):
                     flash('One or more selected seats are no longer available. Please choose different seats.')
                     return redirect(url_for('booking.select_seats', showtime_id=showtime_id))
 
-                # Insert booking
-                user_id = session['user_id']
-                cursor.execute(
-                    "INSERT INTO bookings (user_id, showtime_id) VALUES (%s, %s)",
-                    (user_id, showtime_id)
-                )
-                booking_id = cursor.lastrowid
-
-                # Insert booked seats
-                for sid in seat_ids:
-                    cursor.execute(
-                        "INSERT INTO booking_seats (booking_id, seat_id) VALUES (%s, %s)",
-                        (booking_id, sid)
-                    )
-
-                db.commit()
-            return render_template('booking_confirmation.html', booking_id=booking_id, seat_ids=seat_ids)
-        except Exception as e:
+            # The hold itself is the authoritative, atomic check
+            _drop_session_hold(db)
+            ttl = current_app.config['SEAT_HOLD_TTL']
+            token = holds.hold_seats(db, showtime_id, user_id, seat_ids, ttl)
+        except holds.SeatUnavailable:
+            current_app.seat_index.invalidate(showtime_id)
+            flash('One or more selected seats are no longer available. Please choose different seats.')
+            return redirect(url_for('booking.select_seats', showtime_id=showtime_id))
+        except Exception:
             db.rollback()
-            flash('An error occurred while creating the booking.')
+            flash('An error occurred while holding your seats.')
             return redirect(url_for('booking.select_seats', showtime_id=showtime_id))
         finally:
             db.close()
 
+        return _held(showtime_id, seat_ids, token, ttl)
+
     # GET request: show seat layout
     try:
         with db.cursor() as cursor:
             # Fetch showtime info
+            cursor.execute(_SHOWTIME, (showtime_id,))
+            show = cursor.fetchone()
+            if not show:
+                flash('Showtime not found.')
+                return redirect(url_for('main.index'))
+
+            screen_id = show['screen_id']
+
+            # Cached seat grid for the screen, with availability overlaid
+            index = _seat_index(showtime_id, screen_id)
+            layout = current_app.seat_layouts.get(screen_id, cursor)
+            booked_ids = index.booked_ids()
+
+    finally:
+        db.close()
+
+    return _seat_map(show, layout, booked_ids)
+
+
+@async_view('booking.select_seats')
+async def select_seats_async(showtime_id):
+    # GET only; holding seats (POST) always runs on the sync handler
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    if not current_app.waiting_room.admitted(showtime_id):
+        return redirect(url_for('booking.waiting_room', showtime_id=showtime_id))
+
+    async with aiodb.read_cursor() as cursor:
+        await cursor.execute(_SHOWTIME, (showtime_id,))
+        show = await cursor.fetchone()
+        if not show:
+            flash('Showtime not found.')
+            return redirect(url_for('main.index'))
+
+        layout = await current_app.seat_layouts.get_async(show['screen_id'], cursor)
+
+    # Outside the read cursor: a miss takes a primary connection, and with
+    # no replica up the read cursor may already hold the last one
+    index = await _seat_index_async(showtime_id, show['screen_id'])
+    return _seat_map(show, layout, index.booked_ids())
+
+
+def _held(showtime_id, seat_ids, token, ttl):
+    current_app.seat_index.mark_booked(showtime_id, seat_ids)
+    seat_events.publish(showtime_id, seat_events.HELD, seat_ids)
+    session['seat_hold'] = {
+        'token': token,
+        'showtime_id': showtime_id,
+        'seat_ids': sorted(set(seat_ids)),
+        'expires_at': int(time.time()) + ttl,
+    }
+    return redirect(url_for('booking.review_hold', showtime_id=showtime_id))
+
+
+def _hold_best_seats(db, showtime_id, count):
+    """POST with best=<n>: pick the best n free seats and hold them."""
+    back = redirect(url_for('booking.select_seats', showtime_id=showtime_id))
+    limit = current_app.config['BEST_SEATS_MAX']
+    try:
+        count = int(count)
+    except ValueError:
+        count = 0
+    if not 1 <= count <= limit:
+        flash(f'Please choose between 1 and {limit} seats.')
+        return back
+
+    user_id = session['user_id']
+    ttl = current_app.config['SEAT_HOLD_TTL']
+    try:
+        # Someone may take a picked seat before the hold lands: pick again
+        for _ in range(3):
+            with db.cursor() as cursor:
+                index = current_app.seat_index.get(showtime_id, cursor)
+                if index is None:
+                    flash('Showtime not found.')
+                    return redirect(url_for('main.index'))
+                layout = current_app.seat_layouts.get(index.screen_id, cursor)
+
+            seat_ids, together = allocation.best_seats(layout, index, count)
+            if seat_ids is None:
+                flash(f'Sorry, fewer than {count} seats are left for this showtime.')
+                return back
+
+            _drop_session_hold(db)
+            try:
+                token = holds.hold_seats(db, showtime_id, user_id, seat_ids, ttl)
+                break
+            except holds.SeatUnavailable:
+                current_app.seat_index.invalidate(showtime_id)
+        else:
+            flash('Seats are selling fast and we could not hold them for you. Please try again.')
+            return back
+    except Exception:
+        db.rollback()
+        flash('An error occurred while holding your seats.')
+        return back
+    finally:
+        db.close()
+
+    if not together:
+        flash(f'No {count} seats together were left, so your seats are split across nearby rows.')
+    return _held(showtime_id, seat_ids, token, ttl)
+
+
+def _seat_map(show, layout, booked_ids):
+    events_url = current_app.config['SEAT_EVENTS_URL']
+    if events_url:
+        events_url = f"{events_url.rstrip('/')}/{show['showtime_id']}"
+
+    return render_template('seat_selection.html', show=show, layout=layout, booked_ids=booked_ids,
+                           events_url=events_url)
+
+
+@booking_bp.route('/book/<int:showtime_id>/queue')
+def waiting_room(showtime_id):
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    room = current_app.waiting_room
+    if room.admitted(showtime_id):
+        return redirect(url_for('booking.select_seats', showtime_id=showtime_id))
+
+    db = current_app.get_read_connection()
+    try:
+        with db.cursor() as cursor:
+            cursor.execute(_SHOWTIME, (showtime_id,))
+            show = cursor.fetchone()
+    finally:
+        db.close()
+    if not show:
+        flash('Showtime not found.')
+        return redirect(url_for('main.index'))
+
+    db = current_app.get_db_connection()
+    try:
+        status = room.enter(db, showtime_id, session['user_id'])
+    except QueueFull:
+        # Shed the load here, before the arrival costs anything more
+        return render_template('waiting_room.html', show=show, full=True), 503, {'Retry-After': str(RETRY_AFTER)}
+    finally:
+        db.close()
+
+    if status['admitted']:
+        return redirect(url_for('booking.select_seats', showtime_id=showtime_id))
+    return render_template('waiting_room.html', show=show, status=status, poll=room.poll, full=False)
+
+
+@booking_bp.route('/book/<int:showtime_id>/queue/status')
+def waiting_room_status(showtime_id):
+    """Polled by the waiting page: position and ETA, or where to go next."""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not logged in.'}), 401
+    room = current_app.waiting_room
+
+    status = {'admitted': True}
+    if not room.admitted(showtime_id):
+        db = current_app.get_db_connection()
+        try:
+            status = room.enter(db, showtime_id, session['user_id'], join=False)
+        finally:
+            db.close()
+
+    if status is None:
+        # No ticket (it ran out): the waiting page hands out a new one
+        return jsonify({'admitted': False, 'url': url_for('booking.waiting_room', showtime_id=showtime_id)})
+    if status['admitted']:
+        status['url'] = url_for('booking.select_seats', showtime_id=showtime_id)
+    else:
+        status['poll'] = room.poll
+    return jsonify(status)
+
+
+@booking_bp.route('/book/<int:showtime_id>/availability')
+def seat_availability(showtime_id):
+    """Compact, cacheable seat availability for polling clients.
+
+    ?encoding=bitset (default): base64 bitmap over the screen's seats in
+    ascending seat_id order. ?encoding=delta: booked seat ids as gaps.
+    """
+    delta = request.args.get('encoding') == 'delta'
+    suffix = '-d' if delta else '-b'
+
+    index = current_app.seat_index.peek(showtime_id)
+    if index is not None and request.if_none_match.contains(index.etag + suffix):
+        # Answered from memory: no database access at all
+        return '', 304, {'ETag': f'"{index.etag}{suffix}"', 'Cache-Control': 'no-cache'}
+
+    if index is None:
+        index = _seat_index(showtime_id)
+        if index is None:
+            return jsonify({'error': 'Showtime not found.'}), 404
+
+    body = {
+        'showtime_id': showtime_id,
+        'version': index.etag,
+        'seat_count': len(index.seat_ids),
+        'booked_count': index.booked_count,
+    }
+    if delta:
+        body['booked_deltas'] = index.booked_deltas()
+    else:
+        body['bitset'] = index.bitset()
+
+    resp = jsonify(body)
+    resp.set_etag(index.etag + suffix)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp.make_conditional(request)
+
+
+@booking_bp.route('/book/<int:showtime_id>/review')
+def review_hold(showtime_id):
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+
+    hold = _session_hold(showtime_id)
+    remaining = hold['expires_at'] - int(time.time()) if hold else 0
+    if remaining <= 0:
+        flash('Your seat hold has expired. Please select your seats again.')
+        return redirect(url_for('booking.select_seats', showtime_id=showtime_id))
+
+    db = current_app.get_db_connection()
+    try:
+        with db.cursor() as cursor:
             cursor.execute(
                 "SELECT s.*, m.title FROM showtimes s JOIN movies m ON s.movie_id = m.movie_id WHERE s.showtime_id = %s",
                 (showtime_id,)
@@ -74,34 +339,66 @@ def select_seats(showtime_id):
             if not show:
                 flash('Showtime not found.')
                 return redirect(url_for('main.index'))
+            layout = current_app.seat_layouts.get(show['screen_id'], cursor)
+    finally:
+        db.close()
 
-            screen_id = show['screen_id']
+    seats = [layout.label(sid) for sid in hold['seat_ids']]
 
-            # Fetch seats ordered
-            cursor.execute(
-                "SELECT * FROM seats WHERE screen_id = %s ORDER BY seat_row, seat_number",
-                (screen_id,)
-            )
-            raw_seats = cursor.fetchall()
-
-            # Group seats by row
-            seat_map = OrderedDict()
-            for seat in raw_seats:
-                seat_map.setdefault(seat['seat_row'], []).append(seat)
-
-            # Fetch booked seats
-            cursor.execute("""
-                SELECT bs.seat_id FROM booking_seats bs
-                JOIN bookings b ON bs.booking_id = b.booking_id
-                WHERE b.showtime_id = %s AND b.cancelled = 0
-            """, (showtime_id,))
-            booked = cursor.fetchall()
-            booked_ids = {r['seat_id'] for r in booked}
+    return render_template('booking_review.html', show=show, seats=seats, remaining=remaining)
+
+
+@booking_bp.route('/book/<int:showtime_id>/confirm', methods=['POST'])
+def confirm_booking(showtime_id):
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
 
+    hold = _session_hold(showtime_id)
+    if not hold:
+        flash('Your seat hold has expired. Please select your seats again.')
+        return redirect(url_for('booking.select_seats', showtime_id=showtime_id))
+
+    db = current_app.get_db_connection()
+    try:
+        booking = holds.confirm_hold(db, showtime_id, session['user_id'], hold['token'], hold['seat_ids'])
+    except holds.HoldExpired:
+        session.pop('seat_hold', None)
+        current_app.seat_index.invalidate(showtime_id)
+        flash('Your seat hold has expired. Please select your seats again.')
+        return redirect(url_for('booking.select_seats', showtime_id=showtime_id))
+    except Exception:
+        flash('An error occurred while creating the booking.')
+        return redirect(url_for('booking.review_hold', showtime_id=showtime_id))
     finally:
         db.close()
 
-    return render_template('seat_selection.html', show=show, seat_map=seat_map, booked_ids=booked_ids)
+    session.pop('seat_hold', None)
+    seat_events.publish(showtime_id, seat_events.BOOKED, booking['seat_ids'])
+
+    # Booked: the seat map slot goes to the next user in the waiting room.
+    # If that fails the admission just runs out; the booking stands
+    db = current_app.get_db_connection()
+    try:
+        current_app.waiting_room.leave(db, showtime_id, session['user_id'])
+    except Exception:
+        db.rollback()
+        current_app.logger.exception('Leaving the waiting room of showtime %s failed', showtime_id)
+    finally:
+        db.close()
+    return render_template('booking_confirmation.html', booking=booking)
+
+
+@booking_bp.route('/book/<int:showtime_id>/release', methods=['POST'])
+def release_seats(showtime_id):
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+
+    db = current_app.get_db_connection()
+    try:
+        _drop_session_hold(db)
+    finally:
+        db.close()
+    return redirect(url_for('booking.select_seats', showtime_id=showtime_id))
 
 
 @booking_bp.route('/cancel_booking', methods=['POST'])
@@ -123,13 +420,17 @@ def cancel_booking():
     db = current_app.get_db_connection()
     try:
         with db.cursor() as cursor:
-            cursor.execute('SELECT user_id FROM bookings WHERE booking_id = %s', (bid,))
+            cursor.execute('SELECT user_id, showtime_id, cancelled FROM bookings WHERE booking_id = %s', (bid,))
             row = cursor.fetchone()
             if not row or row['user_id'] != session['user_id']:
                 flash('Booking not found or access denied.')
                 return redirect(url_for('auth.profile'))
 
+            cursor.execute('SELECT seat_id FROM booking_seats WHERE booking_id = %s', (bid,))
+            freed = [r['seat_id'] for r in cursor.fetchall()]
+
             # Delete booked seats to free them
+            holds.release_booking(cursor, bid)
             cursor.execute('DELETE FROM booking_seats WHERE booking_id = %s', (bid,))
 
             # Mark booking cancelled (soft delete). If `cancelled` column missing, fallback to deleting booking row.
@@ -138,7 +439,11 @@ def cancel_booking():
             except Exception:
                 cursor.execute('DELETE FROM bookings WHERE booking_id = %s', (bid,))
 
+            if not row['cancelled']:
+                rollups.record_cancellation(cursor, row['showtime_id'], len(freed))
             db.commit()
+            current_app.seat_index.mark_free(row['showtime_id'], freed)
+            seat_events.publish(row['showtime_id'], seat_events.RELEASED, freed)
             flash('Booking cancelled and seats freed.')
     except Exception:
         db.rollback()
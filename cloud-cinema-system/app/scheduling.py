@@ -0,0 +1,163 @@
+"""Showtime scheduling: recurrence expansion and screen-overlap checks.
+
+A showtime occupies its screen from its start until the movie's duration
+plus SHOWTIME_TURNOVER_MINUTES (cleaning, ads) later. ScreenTimeline keeps
+one screen's occupied intervals sorted by start, so checking a slot is a
+binary search instead of a scan over the screen's whole programme.
+
+Callers lock the screens rows first (lock_screens) so two admins scheduling
+the same screen at once cannot both pass the check.
+"""
+import bisect
+from datetime import datetime, time, timedelta
+
+
+class ScreenTimeline:
+    """Occupied [start, end) intervals of one screen, sorted by start."""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.labels = []
+        self._longest = timedelta(0)
+
+    def clash(self, start, end):
+        """Return the label of an interval overlapping [start, end), or None."""
+        i = bisect.bisect_left(self.starts, end)
+        # Only intervals starting less than the longest duration before
+        # `start` can still be running at `start`
+        j = i - 1
+        while j >= 0 and self.starts[j] + self._longest > start:
+            if self.ends[j] > start:
+                return self.labels[j]
+            j -= 1
+        return None
+
+    def add(self, start, end, label):
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.labels.insert(i, label)
+        self._longest = max(self._longest, end - start)
+
+
+def show_start(show_date, show_time):
+    # pymysql returns TIME columns as timedelta
+    if isinstance(show_time, timedelta):
+        return datetime.combine(show_date, time()) + show_time
+    return datetime.combine(show_date, show_time)
+
+
+def parse_date(value):
+    return datetime.strptime((value or '').strip(), '%Y-%m-%d').date()
+
+
+def parse_time(value):
+    value = (value or '').strip()
+    for fmt in ('%H:%M', '%H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            pass
+    raise ValueError(f'Invalid time: {value!r}')
+
+
+def parse_times(value):
+    """'13:00, 16:30 20:00' -> sorted unique times"""
+    return sorted({parse_time(v) for v in (value or '').replace(',', ' ').split()})
+
+
+def expand(first_date, last_date, weekdays, times):
+    """Yield every start datetime of a recurrence. weekdays uses
+    date.weekday() numbering (Monday is 0)."""
+    day = first_date
+    while day <= last_date:
+        if day.weekday() in weekdays:
+            for t in times:
+                yield datetime.combine(day, t)
+        day += timedelta(days=1)
+
+
+def lock_screens(cursor, screen_ids):
+    """Lock the screens rows (in id order) until the transaction ends.
+    Returns the ids that exist."""
+    screen_ids = sorted(set(screen_ids))
+    if not screen_ids:
+        return []
+    placeholders = ','.join(['%s'] * len(screen_ids))
+    cursor.execute(
+        f"SELECT screen_id FROM screens WHERE screen_id IN ({placeholders}) ORDER BY screen_id FOR UPDATE",
+        screen_ids
+    )
+    return [r['screen_id'] for r in cursor.fetchall()]
+
+
+def load_timelines(cursor, screen_ids, first_date, last_date, turnover, exclude_showtime_id=None):
+    """Timelines of the existing showtimes on screen_ids that can overlap
+    new shows starting in [first_date, last_date], including shows on
+    either side that run past midnight."""
+    timelines = {sid: ScreenTimeline() for sid in screen_ids}
+    if not screen_ids:
+        return timelines
+    placeholders = ','.join(['%s'] * len(screen_ids))
+    cursor.execute(f"""
+        SELECT s.showtime_id, s.screen_id, s.show_date, s.show_time, m.duration, m.title
+        FROM showtimes s JOIN movies m ON s.movie_id = m.movie_id
+        WHERE s.screen_id IN ({placeholders})
+          AND s.show_date BETWEEN %s - INTERVAL 1 DAY AND %s + INTERVAL 1 DAY
+    """, (*screen_ids, first_date, last_date))
+    for row in cursor.fetchall():
+        if row['showtime_id'] == exclude_showtime_id:
+            continue
+        start = show_start(row['show_date'], row['show_time'])
+        end = start + timedelta(minutes=row['duration'] + turnover)
+        timelines[row['screen_id']].add(start, end, f"{row['title']} at {start:%Y-%m-%d %H:%M}")
+    return timelines
+
+
+def movie_duration(cursor, movie_id):
+    cursor.execute("SELECT duration FROM movies WHERE movie_id = %s", (movie_id,))
+    row = cursor.fetchone()
+    return row['duration'] if row else None
+
+
+def plan(timelines, starts, duration, turnover):
+    """Check every (screen_id, start) against the timelines and against the
+    other new slots. Returns (accepted, conflicts) where conflicts is
+    [(screen_id, start, clashing label)]."""
+    length = timedelta(minutes=duration + turnover)
+    accepted, conflicts = [], []
+    for screen_id, start in starts:
+        timeline = timelines[screen_id]
+        clash = timeline.clash(start, start + length)
+        if clash:
+            conflicts.append((screen_id, start, clash))
+        else:
+            timeline.add(start, start + length, f'new showtime at {start:%Y-%m-%d %H:%M}')
+            accepted.append((screen_id, start))
+    return accepted, conflicts
+
+
+def find_clash(cursor, screen_id, movie_id, start, turnover, exclude_showtime_id=None):
+    """Single-showtime check for the add/edit forms. Locks the screen and
+    returns the clashing label, or None if the slot is free."""
+    lock_screens(cursor, [screen_id])
+    duration = movie_duration(cursor, movie_id)
+    if duration is None:
+        return None
+    timelines = load_timelines(cursor, [screen_id], start.date(), start.date(), turnover, exclude_showtime_id)
+    return timelines[screen_id].clash(start, start + timedelta(minutes=duration + turnover))
+
+
+def insert_showtimes(cursor, movie_id, price, slots, batch_size=500):
+    """Insert (screen_id, start) slots with multi-row INSERTs of batch_size."""
+    for i in range(0, len(slots), batch_size):
+        batch = slots[i:i + batch_size]
+        params = []
+        for screen_id, start in batch:
+            params.extend((movie_id, screen_id, start.date(), start.time(), price))
+        cursor.execute(
+            "INSERT INTO showtimes (movie_id, screen_id, show_date, show_time, price) VALUES "
+            + ','.join(['(%s, %s, %s, %s, %s)'] * len(batch)),
+            params
+        )
@@ -0,0 +1,100 @@
+"""Seat change events for the live seat map.
+
+The Flask workers publish small signed UDP datagrams ("seats held / booked /
+released on showtime N") with publish(). They never wait for anyone: the
+send is fire-and-forget and a missing listener costs nothing.
+
+The listener is the asyncio event stream in event_stream.py, which fans the
+events out to the browsers over Server-Sent Events. Run one per host and
+list every host in SEAT_EVENTS_PUBLISH_ADDRS so all of them see all events.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import socket
+import time
+
+from flask import current_app
+
+log = logging.getLogger(__name__)
+
+HELD = 'held'
+BOOKED = 'booked'
+RELEASED = 'released'
+KINDS = (HELD, BOOKED, RELEASED)
+
+_SIG_LEN = 64   # hex sha256
+
+
+def parse_addrs(value):
+    """'host:port,host:port' -> [(host, port)]"""
+    addrs = []
+    for part in (value or '').split(','):
+        part = part.strip()
+        if part:
+            host, _, port = part.rpartition(':')
+            addrs.append((host or '127.0.0.1', int(port)))
+    return addrs
+
+
+def encode(secret, showtime_id, kind, seat_ids):
+    payload = json.dumps({
+        'showtime_id': showtime_id,
+        'kind': kind,
+        'seats': sorted(set(seat_ids)),
+        'at': time.time(),
+    }, separators=(',', ':')).encode()
+    sig = hmac.new(secret, payload, hashlib.sha256).hexdigest().encode()
+    return sig + b'.' + payload
+
+
+def decode(secret, packet):
+    """Return the event dict, or None if the packet is malformed or forged."""
+    sig, payload = packet[:_SIG_LEN], packet[_SIG_LEN + 1:]
+    expected = hmac.new(secret, payload, hashlib.sha256).hexdigest().encode()
+    if not hmac.compare_digest(sig, expected):
+        return None
+    try:
+        event = json.loads(payload)
+    except ValueError:
+        return None
+    if event.get('kind') not in KINDS or not isinstance(event.get('showtime_id'), int):
+        return None
+    return event
+
+
+class SeatEventPublisher:
+    def __init__(self, addrs, secret):
+        self.addrs = addrs
+        self.secret = secret
+        self._sock = None
+        if addrs:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.setblocking(False)
+
+    def publish(self, showtime_id, kind, seat_ids):
+        if self._sock is None or not seat_ids:
+            return
+        packet = encode(self.secret, showtime_id, kind, seat_ids)
+        for addr in self.addrs:
+            try:
+                self._sock.sendto(packet, addr)
+            except OSError as e:
+                # Live updates are best effort; polling still catches up
+                log.debug('seat event to %s dropped: %s', addr, e)
+
+
+def secret_for(events_secret, secret_key):
+    return (events_secret or secret_key or '').encode()
+
+
+def init_app(app):
+    app.seat_events = SeatEventPublisher(
+        parse_addrs(app.config['SEAT_EVENTS_PUBLISH_ADDRS']),
+        secret_for(app.config['SEAT_EVENTS_SECRET'], app.config['SECRET_KEY']),
+    )
+
+
+def publish(showtime_id, kind, seat_ids):
+    current_app.seat_events.publish(showtime_id, kind, seat_ids)
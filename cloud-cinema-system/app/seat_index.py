@@ -0,0 +1,187 @@
+import base64
+import hashlib
+import threading
+import time
+
+_SCREEN = 'SELECT screen_id FROM showtimes WHERE showtime_id = %s'
+# Sold seats plus seats under a live hold
+_BOOKED = """
+    SELECT bs.seat_id FROM booking_seats bs
+    JOIN bookings b ON bs.booking_id = b.booking_id
+    WHERE b.showtime_id = %s AND b.cancelled = 0
+    UNION
+    SELECT seat_id FROM seat_holds
+    WHERE showtime_id = %s AND booking_id IS NULL AND expires_at >= NOW()
+"""
+
+
+class SeatIndex:
+    """Booked/free state of every seat of one showtime, as a bitmap.
+
+    Bit i is set when the i-th seat of the screen (ordered by seat_id) is
+    booked or held. positions maps seat_id -> bit position.
+    """
+
+    __slots__ = ('screen_id', 'positions', 'seat_ids', 'bits', 'loaded_at', '_etag')
+
+    def __init__(self, screen_id, seat_ids, booked_ids):
+        self.screen_id = screen_id
+        self.seat_ids = tuple(seat_ids)
+        self.positions = {sid: i for i, sid in enumerate(self.seat_ids)}
+        self.bits = bytearray((len(self.seat_ids) + 7) // 8)
+        self.loaded_at = time.monotonic()
+        self._etag = None
+        self._set(booked_ids, True)
+
+    def _set(self, seat_ids, booked):
+        self._etag = None
+        for sid in seat_ids:
+            pos = self.positions.get(sid)
+            if pos is None:
+                continue
+            if booked:
+                self.bits[pos >> 3] |= 1 << (pos & 7)
+            else:
+                self.bits[pos >> 3] &= ~(1 << (pos & 7)) & 0xFF
+
+    def is_booked(self, seat_id):
+        pos = self.positions.get(seat_id)
+        if pos is None:
+            return False
+        return bool(self.bits[pos >> 3] & (1 << (pos & 7)))
+
+    def booked_ids(self):
+        return {sid for sid in self.seat_ids if self.is_booked(sid)}
+
+    def unknown(self, seat_ids):
+        # Seat ids that do not belong to this showtime's screen
+        return [sid for sid in seat_ids if sid not in self.positions]
+
+    def conflicts(self, seat_ids):
+        return [sid for sid in seat_ids if self.is_booked(sid)]
+
+    @property
+    def booked_count(self):
+        return sum(bin(b).count('1') for b in self.bits)
+
+    @property
+    def etag(self):
+        # Derived from the content, so every worker agrees on it and it only
+        # changes when a seat is booked, held or released
+        etag = self._etag
+        if etag is None:
+            digest = hashlib.blake2b(bytes(self.bits), digest_size=8)
+            digest.update(str(self.screen_id).encode())
+            etag = self._etag = digest.hexdigest()
+        return etag
+
+    def bitset(self):
+        """Bits as base64; bit i (LSB first in each byte) is seat_ids[i]."""
+        return base64.b64encode(bytes(self.bits)).decode('ascii')
+
+    def booked_deltas(self):
+        """Booked seat ids, ascending, as the first id then the gaps."""
+        deltas, prev = [], 0
+        for sid in sorted(self.booked_ids()):
+            deltas.append(sid - prev)
+            prev = sid
+        return deltas
+
+
+class SeatIndexRegistry:
+    """Lazily loaded SeatIndex per showtime, kept current by the write paths.
+
+    Every hold/booking/cancel commit in this process updates the index in
+    place. Entries older than ttl seconds are reloaded so that writes made by
+    other workers/instances (and lapsed holds) show up; ttl=0 disables expiry.
+    The index is only a fast pre-check: seat_holds is what guarantees a seat
+    is never sold twice.
+    """
+
+    def __init__(self, layouts, ttl=5):
+        self.layouts = layouts
+        self.ttl = ttl
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def _load(self, showtime_id, cursor, screen_id=None):
+        if screen_id is None:
+            cursor.execute(_SCREEN, (showtime_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            screen_id = row['screen_id']
+
+        seat_ids = self.layouts.get(screen_id, cursor).seat_ids
+        cursor.execute(_BOOKED, (showtime_id, showtime_id))
+        booked_ids = [r['seat_id'] for r in cursor.fetchall()]
+
+        return SeatIndex(screen_id, seat_ids, booked_ids)
+
+    async def _load_async(self, showtime_id, cursor, screen_id=None):
+        if screen_id is None:
+            await cursor.execute(_SCREEN, (showtime_id,))
+            row = await cursor.fetchone()
+            if not row:
+                return None
+            screen_id = row['screen_id']
+
+        seat_ids = (await self.layouts.get_async(screen_id, cursor)).seat_ids
+        await cursor.execute(_BOOKED, (showtime_id, showtime_id))
+        booked_ids = [r['seat_id'] for r in await cursor.fetchall()]
+
+        return SeatIndex(screen_id, seat_ids, booked_ids)
+
+    def peek(self, showtime_id):
+        """Return the index if it is loaded and fresh, without touching the DB."""
+        with self._lock:
+            index = self._indexes.get(showtime_id)
+        if index is not None and (not self.ttl or time.monotonic() - index.loaded_at < self.ttl):
+            return index
+        return None
+
+    def cached(self, showtime_id, screen_id=None):
+        """Like peek(), also checking the index is for screen_id if given."""
+        index = self.peek(showtime_id)
+        if index is not None and (screen_id is None or index.screen_id == screen_id):
+            return index
+        return None
+
+    def _store(self, showtime_id, index):
+        if index is not None:
+            with self._lock:
+                self._indexes[showtime_id] = index
+        return index
+
+    def get(self, showtime_id, cursor, screen_id=None):
+        """Return the index for showtime_id, loading it with cursor on a miss."""
+        index = self.cached(showtime_id, screen_id)
+        if index is not None:
+            return index
+        return self._store(showtime_id, self._load(showtime_id, cursor, screen_id))
+
+    async def get_async(self, showtime_id, cursor, screen_id=None):
+        """get() with an aiomysql cursor."""
+        index = self.cached(showtime_id, screen_id)
+        if index is not None:
+            return index
+        return self._store(showtime_id, await self._load_async(showtime_id, cursor, screen_id))
+
+    def mark_booked(self, showtime_id, seat_ids):
+        with self._lock:
+            index = self._indexes.get(showtime_id)
+            if index is not None:
+                index._set(seat_ids, True)
+
+    def mark_free(self, showtime_id, seat_ids):
+        with self._lock:
+            index = self._indexes.get(showtime_id)
+            if index is not None:
+                index._set(seat_ids, False)
+
+    def invalidate(self, showtime_id=None):
+        with self._lock:
+            if showtime_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(showtime_id, None)
@@ -0,0 +1,64 @@
+import threading
+
+_SEATS = "SELECT seat_id, seat_row, seat_number FROM seats WHERE screen_id = %s"
+
+
+class SeatLayout:
+    """Immutable seat grid of one screen.
+
+    rows is a tuple of (row_label, ((seat_id, seat_number), ...)) in display
+    order; seat_ids lists every seat ordered by seat_id (the bit order used
+    by SeatIndex); labels maps seat_id -> 'A1'.
+    """
+
+    __slots__ = ('screen_id', 'rows', 'seat_ids', 'labels')
+
+    def __init__(self, screen_id, seats):
+        grouped = {}
+        for seat in sorted(seats, key=lambda s: (s['seat_row'], s['seat_number'])):
+            grouped.setdefault(seat['seat_row'], []).append((seat['seat_id'], seat['seat_number']))
+        self.screen_id = screen_id
+        self.rows = tuple((row, tuple(row_seats)) for row, row_seats in grouped.items())
+        self.seat_ids = tuple(sorted(s['seat_id'] for s in seats))
+        self.labels = {s['seat_id']: f"{s['seat_row']}{s['seat_number']}" for s in seats}
+
+    def label(self, seat_id):
+        return self.labels.get(seat_id)
+
+
+class SeatLayoutCache:
+    """SeatLayout per screen_id. Seats are only created with the screen
+    (admin_add_screen), so an entry stays valid until invalidate() is
+    called for that screen."""
+
+    def __init__(self):
+        self._layouts = {}
+        self._lock = threading.Lock()
+
+    def _store(self, screen_id, seats):
+        layout = SeatLayout(screen_id, seats)
+        with self._lock:
+            self._layouts[screen_id] = layout
+        return layout
+
+    def get(self, screen_id, cursor):
+        layout = self._layouts.get(screen_id)
+        if layout is not None:
+            return layout
+        cursor.execute(_SEATS, (screen_id,))
+        return self._store(screen_id, cursor.fetchall())
+
+    async def get_async(self, screen_id, cursor):
+        """get() with an aiomysql cursor."""
+        layout = self._layouts.get(screen_id)
+        if layout is not None:
+            return layout
+        await cursor.execute(_SEATS, (screen_id,))
+        return self._store(screen_id, await cursor.fetchall())
+
+    def invalidate(self, screen_id=None):
+        with self._lock:
+            if screen_id is None:
+                self._layouts.clear()
+            else:
+                self._layouts.pop(screen_id, None)
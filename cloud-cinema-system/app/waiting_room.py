@@ -0,0 +1,258 @@
+"""Virtual waiting room in front of the seat maps.
+
+Off unless WAITING_ROOM_BUDGET is set: then at most that many users per
+showtime (and, if set, WAITING_ROOM_GLOBAL_BUDGET across all showtimes) may
+be picking seats at once. A user without an admission for a showtime is
+sent to its waiting room (/book/<id>/queue), takes the next ticket and is
+let in, in ticket order, as admissions free up: when someone books, or when an admission
+runs out after WAITING_ROOM_ADMIT_TTL seconds. While nobody is waiting,
+that happens on the first request and the waiting page is never shown.
+
+Tickets and admissions are signed, timestamped tokens in the session, so
+the seat map checks them without touching the database. The shared state
+is one waiting_rooms row per showtime (tickets issued, admitted, entered)
+and one waiting_room_admissions row per user let in (migration 0009). Each
+process refreshes a room at most every WAITING_ROOM_REFRESH seconds,
+however many clients are polling it, and that refresh is what lets the next
+tickets in. Once WAITING_ROOM_MAX_QUEUE tickets are waiting, new arrivals
+get a 503 with Retry-After from the cached state, without a query.
+"""
+import threading
+import time
+
+from flask import session
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+SESSION_KEY = 'waiting_room'
+# A ticket is given up after this long (the user has to queue again)
+TICKET_MAX_AGE = 4 * 3600
+# Seconds a client is told to wait before retrying when the queue is full
+RETRY_AFTER = 30
+
+
+class QueueFull(Exception):
+    """WAITING_ROOM_MAX_QUEUE tickets are already waiting."""
+
+
+class WaitingRoom:
+    def __init__(self, secret, budget, global_budget=0, admit_ttl=900, max_queue=20000,
+                 refresh=1.0, poll=5):
+        if budget > 0 and admit_ttl < 1:
+            raise ValueError('WAITING_ROOM_ADMIT_TTL must be at least 1 second.')
+        self.budget = budget
+        self.global_budget = global_budget
+        self.admit_ttl = admit_ttl
+        self.max_queue = max_queue
+        self.refresh = refresh
+        self.poll = poll
+        # Tickets let in but not used within this many seconds of the last
+        # admission are taken as abandoned and stop holding a slot
+        self.claim_window = max(3 * poll, 15)
+        self.secret = secret
+        self._rooms = {}        # showtime_id -> state dict, see _advance()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    # Session tokens
+
+    @property
+    def _signer(self):
+        # Built on use, like Flask's session signer: no SECRET_KEY fails the
+        # request, not the app start
+        return URLSafeTimedSerializer(self.secret, salt='waiting-room')
+
+    def _load(self, showtime_id, max_age):
+        token = session.get(SESSION_KEY, {}).get(str(showtime_id))
+        if not token:
+            return None
+        try:
+            data = self._signer.loads(token, max_age=max_age)
+        except BadSignature:
+            return None
+        # [kind, showtime_id, user_id, ticket]
+        if data[1] != showtime_id or data[2] != session.get('user_id'):
+            return None
+        return data
+
+    def _store(self, showtime_id, data):
+        tokens = {}
+        for key, token in session.get(SESSION_KEY, {}).items():
+            # Drop the ones that ran out, so the cookie does not keep growing
+            try:
+                self._signer.loads(token, max_age=TICKET_MAX_AGE)
+            except BadSignature:
+                continue
+            tokens[key] = token
+        if data is None:
+            tokens.pop(str(showtime_id), None)
+        else:
+            tokens[str(showtime_id)] = self._signer.dumps(data)
+        session[SESSION_KEY] = tokens
+
+    def admitted(self, showtime_id):
+        """Whether this session may use the showtime's seat map (no database access)."""
+        if self.budget <= 0:
+            return True
+        data = self._load(showtime_id, self.admit_ttl)
+        return data is not None and data[0] == 'admitted'
+
+    # Shared state
+
+    def _advance(self, db, showtime_id):
+        """Let in as many waiting tickets as there are free slots; returns the room state."""
+        try:
+            with db.cursor() as cursor:
+                cursor.execute(
+                    "DELETE FROM waiting_room_admissions WHERE showtime_id = %s AND expires_at < NOW()",
+                    (showtime_id,)
+                )
+                cursor.execute("SELECT COUNT(*) AS n FROM waiting_room_admissions WHERE showtime_id = %s",
+                               (showtime_id,))
+                active = cursor.fetchone()['n']
+                free = self.budget - active
+                if self.global_budget:
+                    cursor.execute("SELECT COUNT(*) AS n FROM waiting_room_admissions WHERE expires_at >= NOW()")
+                    free = min(free, self.global_budget - cursor.fetchone()['n'])
+
+                cursor.execute("""
+                    SELECT issued, admitted, claimed, rate,
+                           TIMESTAMPDIFF(MICROSECOND, admitted_at, NOW(3)) / 1000000 AS since
+                    FROM waiting_rooms WHERE showtime_id = %s FOR UPDATE
+                """, (showtime_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    db.commit(notify=False)
+                    return {'issued': 0, 'admitted': 0, 'active': active, 'rate': 0.0}
+
+                issued, admitted, claimed, rate = row['issued'], row['admitted'], row['claimed'], row['rate']
+                since = None if row['since'] is None else float(row['since'])
+                if since is None or since >= self.claim_window:
+                    claimed = admitted
+                # Tickets let in but not used yet still hold their slot
+                grant = max(0, min(free - (admitted - claimed), issued - admitted))
+                if grant:
+                    # Admissions per second, smoothed; samples span at least
+                    # a second, and after a quiet spell at most a claim window
+                    sample = grant / min(max(since or self.claim_window, 1), self.claim_window)
+                    rate = sample if not rate else 0.7 * rate + 0.3 * sample
+                    admitted += grant
+                    cursor.execute("""
+                        UPDATE waiting_rooms SET admitted = %s, claimed = %s, rate = %s, admitted_at = NOW(3)
+                        WHERE showtime_id = %s
+                    """, (admitted, claimed, rate, showtime_id))
+                elif claimed != row['claimed']:
+                    cursor.execute("UPDATE waiting_rooms SET claimed = %s WHERE showtime_id = %s",
+                                   (claimed, showtime_id))
+            db.commit(notify=False)
+        except Exception:
+            db.rollback()
+            raise
+        return {'issued': issued, 'admitted': admitted, 'active': active + grant, 'rate': rate}
+
+    def state(self, db, showtime_id, force=False):
+        """The room's state, refreshed if older than WAITING_ROOM_REFRESH.
+        One thread per process refreshes a room; the others use the cache."""
+        with self._lock:
+            room = self._rooms.get(showtime_id)
+            due = force or room is None or time.monotonic() - room['fetched'] >= self.refresh
+            if room is not None and not force and showtime_id in self._refreshing:
+                due = False
+            if not due:
+                return room
+            self._refreshing.add(showtime_id)
+        try:
+            room = self._advance(db, showtime_id)
+            room['fetched'] = time.monotonic()
+            with self._lock:
+                self._rooms[showtime_id] = room
+                if len(self._rooms) > 1000:
+                    # Rooms nobody asked about for a while
+                    cutoff = time.monotonic() - 300
+                    for key in [k for k, r in self._rooms.items() if r['fetched'] < cutoff]:
+                        del self._rooms[key]
+        finally:
+            with self._lock:
+                self._refreshing.discard(showtime_id)
+        return room
+
+    def _join(self, db, showtime_id):
+        with db.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO waiting_rooms (showtime_id, issued) VALUES (%s, LAST_INSERT_ID(1))
+                ON DUPLICATE KEY UPDATE issued = LAST_INSERT_ID(issued + 1)
+            """, (showtime_id,))
+            cursor.execute("SELECT LAST_INSERT_ID() AS ticket")
+            ticket = cursor.fetchone()['ticket']
+        db.commit(notify=False)
+        return ticket
+
+    def _claim(self, db, showtime_id, user_id):
+        with db.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO waiting_room_admissions (showtime_id, user_id, expires_at)
+                VALUES (%s, %s, NOW() + INTERVAL %s SECOND)
+                ON DUPLICATE KEY UPDATE expires_at = VALUES(expires_at)
+            """, (showtime_id, user_id, self.admit_ttl))
+            cursor.execute("UPDATE waiting_rooms SET claimed = LEAST(claimed + 1, admitted) WHERE showtime_id = %s",
+                           (showtime_id,))
+        db.commit(notify=False)
+        self._store(showtime_id, ['admitted', showtime_id, user_id, None])
+
+    def eta(self, room, position):
+        # Every admission ends within admit_ttl, so budget / admit_ttl per
+        # second is the slowest the queue can move
+        rate = max(room['rate'], self.budget / max(self.admit_ttl, 1))
+        return int(position / rate) if rate > 0 else None
+
+    def enter(self, db, showtime_id, user_id, join=True):
+        """Queue the session for the showtime (once) and check its ticket.
+
+        Returns {'admitted': True} once let in (the admission is then in the
+        session), else the ticket's 'position' and 'eta' in seconds; None if
+        the session has no ticket and join is False. Raises QueueFull for a
+        new arrival when the queue is full.
+        """
+        data = self._load(showtime_id, TICKET_MAX_AGE)
+        force = False
+        if data is None or data[0] != 'ticket':
+            if not join:
+                return None
+            room = self.state(db, showtime_id)
+            if room['issued'] - room['admitted'] >= self.max_queue:
+                raise QueueFull()
+            ticket = self._join(db, showtime_id)
+            self._store(showtime_id, ['ticket', showtime_id, user_id, ticket])
+            # Nobody waiting and slots free: let this one in now rather than
+            # at the next refresh
+            force = room['issued'] <= room['admitted'] and room['active'] < self.budget
+        else:
+            ticket = data[3]
+
+        room = self.state(db, showtime_id, force=force)
+        if ticket <= room['admitted']:
+            self._claim(db, showtime_id, user_id)
+            return {'admitted': True}
+        position = ticket - room['admitted']
+        return {'admitted': False, 'position': position, 'eta': self.eta(room, position)}
+
+    def leave(self, db, showtime_id, user_id):
+        """Free the session's slot (after booking) for the next in line."""
+        if self.budget <= 0:
+            return
+        with db.cursor() as cursor:
+            cursor.execute("DELETE FROM waiting_room_admissions WHERE showtime_id = %s AND user_id = %s",
+                           (showtime_id, user_id))
+        db.commit(notify=False)
+        self._store(showtime_id, None)
+
+
+def init_app(app):
+    app.waiting_room = WaitingRoom(
+        app.config['SECRET_KEY'],
+        budget=app.config['WAITING_ROOM_BUDGET'],
+        global_budget=app.config['WAITING_ROOM_GLOBAL_BUDGET'],
+        admit_ttl=app.config['WAITING_ROOM_ADMIT_TTL'],
+        max_queue=app.config['WAITING_ROOM_MAX_QUEUE'],
+        refresh=app.config['WAITING_ROOM_REFRESH'],
+        poll=app.config['WAITING_ROOM_POLL'],
+    )
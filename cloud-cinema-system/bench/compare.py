@@ -0,0 +1,58 @@
+"""Compare two bench.run result files and flag regressions.
+
+    python -m bench.compare base.json new.json [--threshold 10]
+
+Exits with status 1 when any route's p95 latency or queries per request
+grew, or its throughput fell, by more than the threshold (percent).
+"""
+import argparse
+import json
+
+
+def pct_change(old, new):
+    if not old:
+        return 0.0
+    return (new - old) / old * 100.0
+
+
+def compare(base, new, threshold):
+    rows, regressions = [], []
+    for route in sorted(set(base['routes']) | set(new['routes'])):
+        b, n = base['routes'].get(route), new['routes'].get(route)
+        if not b or not n:
+            rows.append((route, 'only in ' + ('new' if n else 'base'), '', ''))
+            continue
+        p95 = pct_change(b['p95_ms'], n['p95_ms'])
+        rps = pct_change(b['throughput_rps'], n['throughput_rps'])
+        qpr = pct_change(b['queries_per_request'], n['queries_per_request'])
+        rows.append((route, f'{p95:+.1f}%', f'{rps:+.1f}%', f'{qpr:+.1f}%'))
+        if p95 > threshold or -rps > threshold or qpr > threshold:
+            regressions.append(route)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10.0)
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    rows, regressions = compare(base, new, args.threshold)
+    print(f"{'route':32} {'p95':>10} {'rps':>10} {'q/req':>10}")
+    for route, p95, rps, qpr in rows:
+        print(f'{route:32} {p95:>10} {rps:>10} {qpr:>10}')
+
+    if regressions:
+        print('Regressions: ' + ', '.join(regressions))
+        raise SystemExit(1)
+    print('No regressions above {:.0f}%.'.format(args.threshold))
+
+
+if __name__ == '__main__':
+    main()
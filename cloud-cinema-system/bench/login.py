@@ -0,0 +1,133 @@
+"""Login throughput, and what a login burst does to the seat map.
+
+Creates --accounts users with a real PASSWORD_HASH_METHOD hash (unlike
+bench/seed.py, whose users get a cheap hash), then runs --logins threads
+that log in back to back while --browsers threads load seat maps. Compare
+hashing in the process pool with hashing on the request thread:
+
+    python -m bench.login --workers 0 --out results/login-inline.json
+    python -m bench.login --workers 4 --out results/login-pool.json
+    python -m bench.compare results/login-inline.json results/login-pool.json
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+
+from app import create_app
+from .run import Recorder, git_revision, load_targets
+
+LOGIN_EMAIL = 'bench-login{}@example.com'
+LOGIN_PASSWORD = 'bench-login'
+
+
+def ensure_accounts(app, count):
+    with app.app_context():
+        pw = app.password_hasher.hash(LOGIN_PASSWORD)
+        db = app.get_db_connection()
+        with db.cursor() as cursor:
+            cursor.executemany(
+                "INSERT IGNORE INTO users (name, email, pass) VALUES (%s, %s, %s)",
+                [(f'Bench Login {i}', LOGIN_EMAIL.format(i), pw) for i in range(count)]
+            )
+            # Earlier runs may have used another method
+            cursor.execute("UPDATE users SET pass = %s WHERE email LIKE 'bench-login%%@example.com'", (pw,))
+        db.commit()
+
+
+def timed(recorder, route, call, expect=200):
+    # Only the expected status counts: a 429 or a bounce back to the login
+    # form is an error, however fast
+    start = time.perf_counter()
+    try:
+        ok = call().status_code == expect
+    except Exception:
+        ok = False
+    recorder.add(route, time.perf_counter() - start, 0, ok)
+
+
+def login_loop(app, recorder, accounts, deadline, seed):
+    rnd = random.Random(seed)
+    client = app.test_client()
+    while time.monotonic() < deadline:
+        email = LOGIN_EMAIL.format(rnd.randrange(accounts))
+        timed(recorder, 'auth.login', lambda: client.post('/login', data={'email': email, 'password': LOGIN_PASSWORD}),
+              expect=302)
+
+
+def browse_loop(app, recorder, showtimes, deadline, seed):
+    rnd = random.Random(seed)
+    client = app.test_client()
+    # select_seats only needs a user_id in the session; skip the real login
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+    while time.monotonic() < deadline:
+        timed(recorder, 'booking.select_seats GET', lambda: client.get(f'/book/{rnd.choice(showtimes)}'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=16, help='Threads logging in back to back.')
+    parser.add_argument('--browsers', type=int, default=8, help='Threads loading seat maps meanwhile.')
+    parser.add_argument('--accounts', type=int, default=100, help='Bench login accounts to create.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Hashing processes (0 = hash on the request thread). Default: PASSWORD_HASH_WORKERS.')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run.')
+    parser.add_argument('--out', default=None, help='Write the results as JSON to this file.')
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config['TESTING'] = True
+    if args.workers is not None:
+        app.password_hasher.workers = args.workers
+    # Every bench request comes from the same address
+    app.login_ip_throttle.limit = 0
+    # The browsers load seat maps directly, without queueing
+    app.waiting_room.budget = 0
+
+    ensure_accounts(app, args.accounts)
+    showtimes = load_targets(app)['showtimes']
+    recorder = Recorder()
+
+    deadline = time.monotonic() + args.duration
+    threads = [threading.Thread(target=login_loop, args=(app, recorder, args.accounts, deadline, i))
+               for i in range(args.logins)]
+    threads += [threading.Thread(target=browse_loop, args=(app, recorder, showtimes, deadline, 1000 + i))
+                for i in range(args.browsers)]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+
+    result = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git': git_revision(),
+            'logins': args.logins,
+            'browsers': args.browsers,
+            'hash_method': app.password_hasher.method,
+            'hash_workers': app.password_hasher.workers,
+            'duration_s': args.duration,
+        },
+        **recorder.summary(elapsed),
+    }
+
+    print(f"{'route':32} {'reqs':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for route, r in result['routes'].items():
+        print(f"{route:32} {r['requests']:>7} {r['errors']:>5} {r['throughput_rps']:>8} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}")
+
+    if args.out:
+        directory = os.path.dirname(args.out)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.out, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
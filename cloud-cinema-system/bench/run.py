@@ -0,0 +1,256 @@
+"""Drive the real Flask app with concurrent virtual users.
+
+Each virtual user logs in as one of the seeded bench users (see
+bench/seed.py) and loops over weighted flows until the run ends: browse
+(home + movie details), seat map (page + availability poll), book (hold
+picked or best-available seats, confirm, sometimes cancel) and profile.
+Requests go through Flask's test client, so the numbers cover the app and
+the database, not an HTTP server. Set DB_POOL_MAX_SIZE to at least --users,
+or pool waits show up as latency.
+
+A request counts as an error unless it gets the status (and, for
+redirects, the target) that step expects: a hold that bounces back to the
+seat map is an error, not a success. A flow stops at its first error.
+
+    python -m bench.run --users 50 --duration 60 --out results/run.json
+    python -m bench.compare results/base.json results/run.json
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import threading
+import time
+from collections import defaultdict
+
+import pymysql
+
+from app import create_app
+from .seed import BENCH_EMAIL, BENCH_PASSWORD
+
+FLOWS = {
+    'browse': 40,
+    'seat_map': 30,
+    'book': 15,
+    'profile': 15,
+}
+
+_SEAT = re.compile(r'name="seat"\s+value="(\d+)"\s*(disabled)?\s*>')
+_BOOKING_ID = re.compile(r'Your booking ID is <strong[^>]*>(\d+)</strong>')
+
+# Statements per request, counted per thread (the test client runs each
+# request on the calling thread)
+_counter = threading.local()
+_original_execute = pymysql.cursors.Cursor.execute
+
+
+def _counting_execute(self, query, args=None):
+    _counter.queries = getattr(_counter, 'queries', 0) + 1
+    return _original_execute(self, query, args)
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    k = max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)    # route -> [(seconds, queries, ok)]
+
+    def add(self, route, seconds, queries, ok):
+        with self._lock:
+            self.samples[route].append((seconds, queries, ok))
+
+    def summary(self, elapsed):
+        routes = {}
+        for route, samples in sorted(self.samples.items()):
+            times = sorted(s[0] * 1000 for s in samples)
+            routes[route] = {
+                'requests': len(samples),
+                'errors': sum(1 for s in samples if not s[2]),
+                'throughput_rps': round(len(samples) / elapsed, 2),
+                'p50_ms': round(percentile(times, 50), 2),
+                'p95_ms': round(percentile(times, 95), 2),
+                'p99_ms': round(percentile(times, 99), 2),
+                'mean_ms': round(sum(times) / len(times), 2),
+                'queries_per_request': round(sum(s[1] for s in samples) / len(samples), 2),
+            }
+        total = sum(r['requests'] for r in routes.values())
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'requests': total,
+            'errors': sum(r['errors'] for r in routes.values()),
+            'throughput_rps': round(total / elapsed, 2) if elapsed else 0,
+            'routes': routes,
+        }
+
+
+class VirtualUser:
+    def __init__(self, app, index, targets, recorder, think):
+        self.client = app.test_client()
+        # One address per user, as real clients have (see LOGIN_ATTEMPTS_PER_IP)
+        self.client.environ_base['REMOTE_ADDR'] = f'10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}'
+        self.email = BENCH_EMAIL.format(index)
+        self.targets = targets
+        self.recorder = recorder
+        self.think = think
+        self.rnd = random.Random(index)
+        self.etags = {}     # showtime_id -> last availability ETag
+
+    def request(self, route, method, url, expect=200, location=None, **kwargs):
+        """Send one request; returns the response, or None unless it got the
+        expected status (an int or a tuple of them) and redirect target."""
+        _counter.queries = 0
+        start = time.perf_counter()
+        try:
+            resp = getattr(self.client, method)(url, **kwargs)
+            ok = resp.status_code in (expect if isinstance(expect, tuple) else (expect,))
+            if ok and location is not None:
+                ok = resp.headers.get('Location', '').endswith(location)
+        except Exception:
+            resp, ok = None, False
+        self.recorder.add(route, time.perf_counter() - start, _counter.queries, ok)
+        return resp if ok else None
+
+    def login(self):
+        self.request('auth.login', 'post', '/login', expect=302,
+                     data={'email': self.email, 'password': BENCH_PASSWORD})
+
+    def browse(self):
+        if self.request('main.index', 'get', '/') is not None:
+            self.request('main.movie_details', 'get', f"/movie/{self.rnd.choice(self.targets['movies'])}")
+
+    def seat_map(self, showtime_id=None, poll=True):
+        showtime_id = showtime_id or self.rnd.choice(self.targets['showtimes'])
+        resp = self.request('booking.select_seats GET', 'get', f'/book/{showtime_id}')
+        if resp is not None and poll:
+            # What the open seat map does every few seconds
+            headers = {'If-None-Match': self.etags[showtime_id]} if showtime_id in self.etags else {}
+            poll_resp = self.request('booking.seat_availability', 'get', f'/book/{showtime_id}/availability',
+                                     expect=(200, 304), headers=headers)
+            if poll_resp is not None and poll_resp.headers.get('ETag'):
+                self.etags[showtime_id] = poll_resp.headers['ETag']
+        return resp
+
+    def book(self):
+        showtime_id = self.rnd.choice(self.targets['showtimes'])
+        resp = self.seat_map(showtime_id, poll=False)
+        if resp is None:
+            return
+        review = f'/book/{showtime_id}/review'
+        if self.rnd.random() < 0.5:
+            form = {'best': self.rnd.randint(1, 4)}
+        else:
+            free = [int(m.group(1)) for m in _SEAT.finditer(resp.get_data(as_text=True)) if not m.group(2)]
+            if not free:
+                return
+            start = self.rnd.randrange(len(free))
+            form = {'seat': free[start:start + self.rnd.randint(1, 4)]}
+        if self.request('booking.select_seats POST', 'post', f'/book/{showtime_id}',
+                        expect=302, location=review, data=form) is None:
+            return
+        if self.request('booking.review_hold', 'get', review) is None:
+            return
+        resp = self.request('booking.confirm_booking', 'post', f'/book/{showtime_id}/confirm')
+        match = _BOOKING_ID.search(resp.get_data(as_text=True)) if resp is not None else None
+        # Cancel about a third of the bookings so seats keep coming back
+        if match and self.rnd.random() < 0.33:
+            self.request('booking.cancel_booking', 'post', '/cancel_booking', expect=302, location='/profile',
+                         data={'booking_id': match.group(1)})
+
+    def profile(self):
+        self.request('auth.profile', 'get', '/profile')
+
+    def run(self, deadline):
+        self.login()
+        flows = list(FLOWS)
+        weights = [FLOWS[f] for f in flows]
+        while time.monotonic() < deadline:
+            getattr(self, self.rnd.choices(flows, weights)[0])()
+            if self.think:
+                time.sleep(self.think)
+
+
+def load_targets(app):
+    with app.app_context():
+        db = app.get_db_connection()
+        with db.cursor() as cursor:
+            cursor.execute("SELECT movie_id FROM movies")
+            movies = [r['movie_id'] for r in cursor.fetchall()]
+            cursor.execute("SELECT showtime_id FROM showtimes WHERE show_date >= CURDATE()")
+            showtimes = [r['showtime_id'] for r in cursor.fetchall()]
+    if not movies or not showtimes:
+        raise SystemExit('No movies/showtimes found; run python -m bench.seed first.')
+    return {'movies': movies, 'showtimes': showtimes}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users.')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run.')
+    parser.add_argument('--think', type=float, default=0, help='Seconds to pause between flows.')
+    parser.add_argument('--out', default=None, help='Write the results as JSON to this file.')
+    args = parser.parse_args()
+
+    pymysql.cursors.Cursor.execute = _counting_execute
+    app = create_app()
+    app.config['TESTING'] = True
+    # The seat map flows measure the seat map, not the queue in front of it
+    app.waiting_room.budget = 0
+    targets = load_targets(app)
+    recorder = Recorder()
+
+    deadline = time.monotonic() + args.duration
+    users = [VirtualUser(app, i, targets, recorder, args.think) for i in range(args.users)]
+    threads = [threading.Thread(target=u.run, args=(deadline,)) for u in users]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+
+    result = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git': git_revision(),
+            'users': args.users,
+            'duration_s': args.duration,
+            'think_s': args.think,
+            'flows': FLOWS,
+        },
+        **recorder.summary(elapsed),
+        'db_pool': app.db_pool.stats(),
+    }
+
+    print(f"{'route':32} {'reqs':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'q/req':>6}")
+    for route, r in result['routes'].items():
+        print(f"{route:32} {r['requests']:>7} {r['errors']:>5} {r['throughput_rps']:>8} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['queries_per_request']:>6}")
+    print(f"total: {result['requests']} requests, {result['throughput_rps']} req/s, {result['errors']} errors")
+
+    if args.out:
+        directory = os.path.dirname(args.out)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.out, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
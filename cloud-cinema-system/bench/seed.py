@@ -0,0 +1,118 @@
+"""Fill a local benchmark database with synthetic data.
+
+Point DB_HOST/DB_USER/DB_PASSWORD/DB_NAME (or .env) at a throwaway local
+MySQL/MariaDB that has app/database.sql loaded and `flask --app app db
+upgrade` applied, then run from cloud-cinema-system/:
+
+    python -m bench.seed --users 200 --movies 20 --screens 8 --days 7
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+
+BENCH_PASSWORD = 'bench'
+BENCH_EMAIL = 'bench{}@example.com'
+
+
+def row_label(n):
+    label = ''
+    n += 1
+    while n > 0:
+        n, rem = divmod(n - 1, 26)
+        label = chr(65 + rem) + label
+    return label
+
+
+def seed(db, users, movies, screens, days, rows, seats_per_row, history):
+    rnd = random.Random(42)
+    # A cheap hash so logging in does not dominate the benchmark
+    pw = generate_password_hash(BENCH_PASSWORD, method='pbkdf2:sha256:1000')
+
+    with db.cursor() as cursor:
+        cursor.executemany(
+            "INSERT IGNORE INTO users (name, email, pass) VALUES (%s, %s, %s)",
+            [(f'Bench User {i}', BENCH_EMAIL.format(i), pw) for i in range(users)]
+        )
+        cursor.execute("SELECT user_id FROM users WHERE email LIKE 'bench%@example.com'")
+        user_ids = [r['user_id'] for r in cursor.fetchall()]
+
+        movie_ids = []
+        for i in range(movies):
+            cursor.execute(
+                "INSERT INTO movies (title, duration, rating, description, image_url) VALUES (%s, %s, %s, %s, %s)",
+                (f'Bench Movie {i}', rnd.randint(90, 180), 'PG-13', 'Synthetic benchmark title.', None)
+            )
+            movie_ids.append(cursor.lastrowid)
+
+        screen_seats = {}
+        for i in range(screens):
+            cursor.execute("INSERT INTO screens (screen_name, total_seats) VALUES (%s, %s)",
+                           (f'Bench Hall {i}', rows * seats_per_row))
+            screen_id = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO seats (screen_id, seat_row, seat_number) VALUES (%s, %s, %s)",
+                [(screen_id, row_label(r), n) for r in range(rows) for n in range(1, seats_per_row + 1)]
+            )
+            cursor.execute("SELECT seat_id FROM seats WHERE screen_id = %s", (screen_id,))
+            screen_seats[screen_id] = [r['seat_id'] for r in cursor.fetchall()]
+
+        showtimes = []
+        for d in range(-history, days):
+            day = date.today() + timedelta(days=d)
+            for screen_id in screen_seats:
+                for hour in (12, 15, 18, 21):
+                    cursor.execute(
+                        "INSERT INTO showtimes (movie_id, screen_id, show_date, show_time, price) VALUES (%s, %s, %s, %s, %s)",
+                        (rnd.choice(movie_ids), screen_id, day, f'{hour}:00:00', 12.00)
+                    )
+                    showtimes.append((cursor.lastrowid, screen_id, d < 0))
+        db.commit()
+
+        # Past bookings give the profile page some history to page through
+        for showtime_id, screen_id, is_past in showtimes:
+            if not is_past:
+                continue
+            free = list(screen_seats[screen_id])
+            rnd.shuffle(free)
+            for _ in range(len(free) // 8):
+                if len(free) < 2:
+                    break
+                user_id = rnd.choice(user_ids)
+                cursor.execute("INSERT INTO bookings (user_id, showtime_id) VALUES (%s, %s)", (user_id, showtime_id))
+                booking_id = cursor.lastrowid
+                taken = [free.pop(), free.pop()]
+                cursor.executemany("INSERT INTO booking_seats (booking_id, seat_id) VALUES (%s, %s)",
+                                   [(booking_id, s) for s in taken])
+                cursor.executemany(
+                    "INSERT INTO seat_holds (showtime_id, seat_id, user_id, hold_token, booking_id) VALUES (%s, %s, %s, %s, %s)",
+                    [(showtime_id, s, user_id, str(booking_id).zfill(32), booking_id) for s in taken]
+                )
+        db.commit()
+    return len(user_ids), len(showtimes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--movies', type=int, default=20)
+    parser.add_argument('--screens', type=int, default=8)
+    parser.add_argument('--days', type=int, default=7, help='Days of upcoming showtimes.')
+    parser.add_argument('--history', type=int, default=30, help='Days of past showtimes with bookings.')
+    parser.add_argument('--rows', type=int, default=12)
+    parser.add_argument('--seats-per-row', type=int, default=16)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db = app.get_db_connection()
+        users, shows = seed(db, args.users, args.movies, args.screens, args.days,
+                            args.rows, args.seats_per_row, args.history)
+    print(f'Seeded {users} users and {shows} showtimes.')
+
+
+if __name__ == '__main__':
+    main()
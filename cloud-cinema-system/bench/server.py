@@ -0,0 +1,152 @@
+"""Hot read routes over real HTTP, to compare the sync and ASGI modes.
+
+bench.run drives the app in-process; this drives a running server, so the
+server's concurrency model is part of the measurement. Each virtual user
+logs in as a seeded bench user (see bench/seed.py) and then loops over the
+home page, movie details, seat map and profile with a keep-alive
+connection. Start one mode at a time against the same database, e.g.:
+
+    gunicorn --workers 1 --threads 16 --bind :5000 app:app
+    python -m bench.server --users 200 --mode sync --out results/server-sync.json
+
+    uvicorn asgi:app --workers 1 --port 5000
+    python -m bench.server --users 200 --mode async --out results/server-async.json
+
+    python -m bench.compare results/server-sync.json results/server-async.json
+
+Use the same worker count for both. Every user logs in from this host, so
+leave LOGIN_ATTEMPTS_PER_IP at 0 (the default without PROXY_FIX_X_FOR) or
+above --users, and leave WAITING_ROOM_BUDGET at 0 (off): the seat map step
+expects the seat map, not a redirect to the queue. Queries per request are not measured here (always 0); use
+bench.run for those.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from app import create_app
+from .run import Recorder, git_revision, load_targets
+from .seed import BENCH_EMAIL, BENCH_PASSWORD
+
+FLOWS = {
+    'browse': 40,
+    'seat_map': 35,
+    'profile': 25,
+}
+
+
+class HttpUser:
+    def __init__(self, url, index, targets, recorder, think):
+        parts = urlsplit(url)
+        self.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        self.cookie = None
+        self.email = BENCH_EMAIL.format(index)
+        self.targets = targets
+        self.recorder = recorder
+        self.think = think
+        self.rnd = random.Random(index)
+
+    def request(self, route, method, path, form=None, expect=200):
+        headers = {}
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            resp = self.conn.getresponse()
+            resp.read()
+            # A redirect to the login form or a 429 is not a success
+            ok = resp.status == expect
+            cookie = resp.getheader('Set-Cookie')
+            if cookie:
+                self.cookie = cookie.split(';', 1)[0]
+        except (OSError, http.client.HTTPException):
+            # The next request reconnects
+            self.conn.close()
+            ok = False
+        self.recorder.add(route, time.perf_counter() - start, 0, ok)
+
+    def browse(self):
+        self.request('main.index', 'GET', '/')
+        self.request('main.movie_details', 'GET', f"/movie/{self.rnd.choice(self.targets['movies'])}")
+
+    def seat_map(self):
+        self.request('booking.select_seats GET', 'GET', f"/book/{self.rnd.choice(self.targets['showtimes'])}")
+
+    def profile(self):
+        self.request('auth.profile', 'GET', '/profile')
+
+    def run(self, deadline):
+        self.request('auth.login', 'POST', '/login', {'email': self.email, 'password': BENCH_PASSWORD}, expect=302)
+        flows = list(FLOWS)
+        weights = [FLOWS[f] for f in flows]
+        while time.monotonic() < deadline:
+            getattr(self, self.rnd.choices(flows, weights)[0])()
+            if self.think:
+                time.sleep(self.think)
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='Server to load.')
+    parser.add_argument('--users', type=int, default=100, help='Concurrent virtual users (connections).')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run.')
+    parser.add_argument('--think', type=float, default=0, help='Seconds to pause between flows.')
+    parser.add_argument('--mode', default=None, help='Label stored in the results, e.g. sync or async.')
+    parser.add_argument('--out', default=None, help='Write the results as JSON to this file.')
+    args = parser.parse_args()
+
+    # Only used to pick existing movie/showtime ids
+    targets = load_targets(create_app())
+    recorder = Recorder()
+
+    deadline = time.monotonic() + args.duration
+    users = [HttpUser(args.url, i, targets, recorder, args.think) for i in range(args.users)]
+    threads = [threading.Thread(target=u.run, args=(deadline,)) for u in users]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+
+    result = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git': git_revision(),
+            'url': args.url,
+            'mode': args.mode,
+            'users': args.users,
+            'duration_s': args.duration,
+            'think_s': args.think,
+            'flows': FLOWS,
+        },
+        **recorder.summary(elapsed),
+    }
+
+    print(f"{'route':32} {'reqs':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for route, r in result['routes'].items():
+        print(f"{route:32} {r['requests']:>7} {r['errors']:>5} {r['throughput_rps']:>8} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}")
+    print(f"total: {result['requests']} requests, {result['throughput_rps']} req/s, {result['errors']} errors")
+
+    if args.out:
+        directory = os.path.dirname(args.out)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.out, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
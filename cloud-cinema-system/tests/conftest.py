@@ -0,0 +1,5 @@
+import os
+
+# Read by app.config at import time: keep create_app() from writing the
+# hashed asset copies into instance/ during the tests
+os.environ.setdefault('ASSETS_BUILD_ON_STARTUP', '0')
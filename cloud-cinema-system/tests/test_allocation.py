@@ -0,0 +1,118 @@
+from app.allocation import _nearest, _Row, _rows, _runs, _Search, best_seats
+from app.seat_index import SeatIndex
+from app.seat_layout import SeatLayout
+
+ROWS = 'ABCDE'
+
+
+def _layout(seat_id=lambda r, n: r * 10 + n):
+    """Five rows of ten seats; by default row-major seat ids 1..50."""
+    seats = [
+        {'seat_id': seat_id(r, n), 'seat_row': label, 'seat_number': n}
+        for r, label in enumerate(ROWS) for n in range(1, 11)
+    ]
+    return SeatLayout(1, seats)
+
+
+def _index(layout, free=None, booked=()):
+    if free is not None:
+        booked = [sid for sid, label in layout.labels.items() if label not in free]
+    else:
+        booked = [sid for sid, label in layout.labels.items() if label in booked]
+    return SeatIndex(layout.screen_id, layout.seat_ids, booked)
+
+
+def _labels(layout, seat_ids):
+    return sorted(layout.labels[sid] for sid in seat_ids)
+
+
+def test_runs():
+    assert _runs(0b1111, 1) == 0b1111
+    assert _runs(0b1111, 3) == 0b11
+    assert _runs(0b1110111, 3) == 0b10001
+    assert _runs(0b1110111, 4) == 0
+    assert _runs((1 << 40) - 1, 37) == 0b1111
+
+
+def test_nearest():
+    assert _nearest(0, 3) is None
+    assert _nearest(0b1000001, 3) == 0
+    assert _nearest(0b1000001, 4) == 6
+    assert _nearest(0b0010000, 0) == 4
+    assert _nearest(0b0001000, 3) == 3
+
+
+def test_row_free_contiguous_span():
+    layout = _layout()
+    index = _index(layout, booked={'C2', 'C5'})
+    row = _rows(layout)[2]
+    assert row.span is not None and row.positions is None
+    occupied = int.from_bytes(index.bits, 'little')
+    assert row.free(occupied) == 0b1111101101
+
+
+def test_row_free_scattered_positions():
+    # Column-major ids: a row's seats are ten positions apart in the bitmap
+    layout = _layout(lambda r, n: n * 10 + r)
+    index = _index(layout, booked={'C2', 'C5'})
+    row = _rows(layout)[2]
+    assert row.span is None and row.positions is not None
+    occupied = int.from_bytes(index.bits, 'little')
+    assert row.free(occupied) == 0b1111101101
+
+
+def test_row_with_gaps_in_numbering():
+    positions = {10: 0, 11: 1, 12: 2}
+    row = _Row(0, ((10, 1), (11, 2), (12, 4)), positions)
+    # Seat number 3 does not exist, so the row is not one span
+    assert row.span is None
+    assert row.free(0b010) == 0b1001
+
+
+def test_empty_room_picks_the_sweet_spot():
+    layout = _layout()
+    seats, together = best_seats(layout, _index(layout), 2)
+    # Row C is nearest 60% of the way back; 5 and 6 are the middle
+    assert together
+    assert _labels(layout, seats) == ['C5', 'C6']
+
+
+def test_centred_block_in_next_row_beats_off_centre_block():
+    layout = _layout()
+    # The middle of row C is taken, so its best pair is off to the side:
+    # row D's centred pair scores better
+    index = _index(layout, booked={'C4', 'C5', 'C6', 'C7'})
+    seats, together = best_seats(layout, index, 2)
+    assert together
+    assert _labels(layout, seats) == ['D5', 'D6']
+
+
+def test_split_onto_consecutive_rows():
+    layout = _layout()
+    # At most three seats together in any row
+    free = {f'{r}{n}' for r in ROWS for n in (1, 2, 3, 5, 6, 7, 9)}
+    seats, together = best_seats(layout, _index(layout, free=free), 4)
+    assert not together
+    labels = _labels(layout, seats)
+    assert len(labels) == 4
+    rows = sorted({label[0] for label in labels})
+    assert len(rows) == 2 and ROWS.index(rows[1]) == ROWS.index(rows[0]) + 1
+    assert labels == ['C5', 'C6', 'D5', 'D6']
+
+
+def test_scattered_fallback():
+    layout = _layout()
+    # No two free seats together, and no free seat in row B
+    free = {'A1', 'A3', 'C5'}
+    search = _Search(layout, _index(layout, free=free))
+    assert search.together(3) is None
+    assert search.split(3) is None
+    seats, together = best_seats(layout, _index(layout, free=free), 3)
+    assert not together
+    assert _labels(layout, seats) == ['A1', 'A3', 'C5']
+
+
+def test_too_few_free_seats():
+    layout = _layout()
+    assert best_seats(layout, _index(layout, free={'A1', 'A3', 'C5'}), 4) == (None, False)
+    assert best_seats(layout, _index(layout, free=set()), 1) == (None, False)
@@ -0,0 +1,131 @@
+import asyncio
+
+from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from app import create_app
+from app.aiodb import AsyncPool
+from app.asgi import AsgiApp, _environ, _middleware_chain
+from app.cache import LRUCache, SQLiteStore, TieredCache
+from app.replicas import ReplicaSet
+from app.routes import booking
+from app.seat_index import SeatIndex
+
+SCOPE = {
+    'type': 'http', 'method': 'GET', 'path': '/', 'query_string': b'',
+    'client': ('10.0.0.2', 50000), 'server': ('localhost', 5000),
+    'headers': [(b'x-forwarded-for', b'203.0.113.7')],
+}
+
+
+def test_async_path_runs_the_app_middleware():
+    app = Flask(__name__)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+    environ = AsgiApp(app)._through_middleware(_environ(SCOPE))
+    assert environ['REMOTE_ADDR'] == '203.0.113.7'
+    # The app's own chain is left alone
+    assert app.wsgi_app.app.__self__ is app
+
+
+def test_no_middleware():
+    app = Flask(__name__)
+    environ = _environ(SCOPE)
+    assert AsgiApp(app)._through_middleware(environ) is environ
+
+
+def test_middleware_that_answers_itself():
+    class Maintenance:
+        def __init__(self, app):
+            self.app = app
+
+        def __call__(self, environ, start_response):
+            start_response('503 Service Unavailable', [])
+            return [b'down']
+
+    app = Flask(__name__)
+    app.wsgi_app = Maintenance(app.wsgi_app)
+    assert _middleware_chain(app)(_environ(SCOPE), lambda *a: None) == [b'down']
+    assert AsgiApp(app)._through_middleware(_environ(SCOPE)) is None
+
+
+def test_get_or_load_async_uses_shared_store(tmp_path):
+    shared = SQLiteStore(str(tmp_path / 'cache.sqlite'))
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return ['movie']
+
+    first = TieredCache(LRUCache(), shared, shared_ttl=60)
+    assert asyncio.run(first.get_or_load_async('movies', load)) == ['movie']
+    # Another worker: answered from the shared store, no load
+    second = TieredCache(LRUCache(), shared, shared_ttl=60)
+    assert asyncio.run(second.get_or_load_async('movies', load)) == ['movie']
+    assert len(calls) == 1
+    assert second.stats()['shared_hits'] == 1
+
+
+class _AioCursor:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=()):
+        pass
+
+    async def fetchone(self):
+        return {'showtime_id': 1, 'screen_id': 3}
+
+
+class _AioConn:
+    def cursor(self):
+        return _AioCursor()
+
+    def close(self):
+        pass
+
+
+class _AioPool:
+    """Stands in for an aiomysql pool of one connection."""
+
+    def __init__(self):
+        self.conn = _AioConn()
+        self.free = True
+        self.size, self.freesize = 1, 1
+
+    async def acquire(self):
+        while not self.free:
+            await asyncio.sleep(0.01)
+        self.free = False
+        return self.conn
+
+    def release(self, conn):
+        self.free = True
+
+
+def test_seat_map_fits_a_pool_of_one(monkeypatch):
+    # No replicas: the read falls back to the primary pool, whose only
+    # connection must be free again before the seat index is loaded
+    app = create_app()
+    app.secret_key = 'test'
+    app.aio_pool = AsyncPool({}, min_size=0, max_size=1, timeout=0.5)
+    app.aio_pool._pool = _AioPool()
+    app.aio_replicas = ReplicaSet([])
+    app.seat_index.invalidate()
+
+    async def layout(screen_id, cursor):
+        return 'layout'
+
+    async def index(showtime_id, cursor, screen_id=None):
+        return SeatIndex(screen_id, [1, 2], [2])
+
+    monkeypatch.setattr(app.waiting_room, 'admitted', lambda showtime_id: True)
+    monkeypatch.setattr(app.seat_layouts, 'get_async', layout)
+    monkeypatch.setattr(app.seat_index, 'get_async', index)
+    monkeypatch.setattr(booking, '_seat_map', lambda show, layout, booked: (layout, booked))
+    with app.test_request_context('/book/1'):
+        booking.session['user_id'] = 1
+        assert asyncio.run(booking.select_seats_async(1)) == ('layout', {2})
+    assert app.aio_pool.stats()['timeouts'] == 0
@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+from app.cache import LRUCache, SQLiteStore, TieredCache
+
+
+def _tiers(tmp_path):
+    shared = SQLiteStore(str(tmp_path / 'cache.sqlite'))
+    return shared, TieredCache(LRUCache(), shared, shared_ttl=60)
+
+
+def test_delete_during_load_is_not_cached(tmp_path):
+    shared, cache = _tiers(tmp_path)
+
+    def load():
+        # The row changes and is invalidated while this load is running
+        cache.delete('movies')
+        return ['old']
+
+    assert cache.get_or_load('movies', load) == ['old']
+    assert cache.local.get('movies') is None
+    assert shared.get('movies') is None
+    assert cache.get_or_load('movies', lambda: ['new']) == ['new']
+    assert shared.get('movies') == ['new']
+
+
+def test_delete_in_other_worker_during_load(tmp_path):
+    shared, cache = _tiers(tmp_path)
+    other = TieredCache(LRUCache(), shared, shared_ttl=60)
+
+    async def load():
+        other.delete('movies')
+        return ['old']
+
+    assert asyncio.run(cache.get_or_load_async('movies', load)) == ['old']
+    assert shared.get('movies') is None
+    assert other.get_or_load('movies', lambda: ['new']) == ['new']
+
+
+def test_generation_guards_shared_set(tmp_path):
+    shared, _ = _tiers(tmp_path)
+    generation = shared.generation('movies')
+    shared.delete('movies')
+    assert not shared.set('movies', ['old'], 60, generation=generation)
+    assert shared.set('movies', ['new'], 60, generation=shared.generation('movies'))
+    assert shared.get('movies') == ['new']
+
+
+def test_shared_copy_keeps_its_expiry(tmp_path):
+    shared, cache = _tiers(tmp_path)
+    shared.set('movies', ['movie'], ttl=5)
+    assert cache.get_or_load('movies', lambda: ['loaded']) == ['movie']
+    _, expires = cache.local._data['movies']
+    assert expires - time.monotonic() <= 5
@@ -0,0 +1,108 @@
+import gc
+import json
+
+import pytest
+
+from app import exports
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        self.conn.statements.append((sql.strip().split()[0], params))
+        if self.conn.fail:
+            raise RuntimeError('query failed')
+        if sql.startswith('SELECT @@'):
+            self._rows = [(30,)]
+        elif 'FROM' in sql:
+            self._rows = list(self.conn.rows)
+
+    def fetchone(self):
+        return self._rows.pop(0)
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class _Conn:
+    def __init__(self, rows, fail=False):
+        self.rows = rows
+        self.fail = fail
+        self.statements = []
+
+    def cursor(self, cursorclass=None):
+        return _Cursor(self)
+
+
+class _Pool:
+    def __init__(self, conn):
+        self.conn = conn
+        self.released = []
+        self.discarded = []
+
+    def acquire(self):
+        return self.conn
+
+    def release(self, conn):
+        self.released.append(conn)
+
+    def discard(self, conn):
+        self.discarded.append(conn)
+
+
+ROW = {
+    'booking_id': 1, 'booking_time': None, 'cancelled': 0, 'user_id': 1, 'user_name': 'A',
+    'user_email': 'a@example.com', 'showtime_id': 1, 'movie_id': 1, 'title': 'Film',
+    'screen_id': 1, 'screen_name': 'One', 'show_date': None, 'show_time': None,
+    'price': 10, 'seat_row': 'A', 'seat_number': 1,
+}
+
+
+def test_export_restores_session_and_releases():
+    conn = _Conn([ROW])
+    pool = _Pool(conn)
+    chunks = exports.stream_bookings(pool, 'jsonl')
+    # The query is sent before the response starts
+    assert ('SELECT', []) in conn.statements
+    records = [json.loads(line) for line in ''.join(chunks).splitlines()]
+    # Archived then current bookings, one record each
+    assert [r['seats'] for r in records] == ['A1', 'A1']
+    assert conn.statements[-1] == ('SET', (30,))
+    assert pool.released == [conn] and pool.discarded == []
+
+
+def test_export_closed_early_discards_connection():
+    conn = _Conn([ROW])
+    pool = _Pool(conn)
+    chunks = exports.stream_bookings(pool, 'csv')
+    chunks.close()
+    assert pool.discarded == [conn] and pool.released == []
+
+
+def test_export_never_iterated_is_not_leaked():
+    conn = _Conn([ROW])
+    pool = _Pool(conn)
+    exports.stream_bookings(pool, 'csv')
+    gc.collect()
+    assert pool.discarded == [conn]
+
+
+def test_export_query_error_surfaces_early():
+    conn = _Conn([], fail=True)
+    pool = _Pool(conn)
+    with pytest.raises(RuntimeError):
+        exports.stream_bookings(pool, 'csv')
+    assert pool.discarded == [conn]
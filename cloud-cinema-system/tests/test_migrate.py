@@ -0,0 +1,90 @@
+from app.migrate import HOT_QUERIES, check_indexes, split_statements, table_aliases
+
+
+def test_split_statements_drops_comments_and_blanks():
+    sql = """
+-- Leading comment; with a semicolon
+CREATE TABLE a (
+    id INT PRIMARY KEY
+);
+
+    -- Indented comment
+ALTER TABLE a ADD COLUMN b INT;
+;
+"""
+    assert split_statements(sql) == [
+        'CREATE TABLE a (\n    id INT PRIMARY KEY\n)',
+        'ALTER TABLE a ADD COLUMN b INT',
+    ]
+
+
+def test_split_statements_without_trailing_semicolon():
+    assert split_statements('SELECT 1;\nSELECT 2') == ['SELECT 1', 'SELECT 2']
+    assert split_statements('-- only a comment\n') == []
+
+
+def test_table_aliases():
+    aliases = table_aliases(
+        "SELECT s.*, sc.screen_name FROM showtimes s JOIN screens AS sc ON s.screen_id = sc.screen_id "
+        "WHERE s.movie_id = %s UNION SELECT seat_id FROM seat_holds WHERE showtime_id = %s"
+    )
+    assert aliases == {
+        'showtimes': {'showtimes'}, 's': {'showtimes'},
+        'screens': {'screens'}, 'sc': {'screens'},
+        'seat_holds': {'seat_holds'},
+    }
+
+
+def test_table_aliases_reused_across_union_branches():
+    aliases = table_aliases(
+        "(SELECT b.booking_id FROM bookings b WHERE b.user_id = %s) "
+        "UNION ALL (SELECT b.booking_id FROM bookings_history b WHERE b.user_id = %s)"
+    )
+    assert aliases['b'] == {'bookings', 'bookings_history'}
+
+
+class _Cursor:
+    def __init__(self, plans):
+        self.plans = plans
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        self.rows = self.plans[sql[len('EXPLAIN '):]]
+
+    def fetchall(self):
+        return self.rows
+
+
+class _Db:
+    def __init__(self, plans):
+        self.plans = plans
+
+    def cursor(self):
+        return _Cursor(self.plans)
+
+
+def test_check_indexes_resolves_aliases():
+    small = "SELECT m.title FROM movies m JOIN showtimes s ON s.movie_id = m.movie_id"
+    big = "SELECT s.showtime_id FROM showtimes s"
+    union = "SELECT seat_id FROM seat_holds UNION SELECT seat_id FROM booking_seats bs"
+    db = _Db({
+        small: [{'table': 'm', 'type': 'ALL', 'rows': 20}, {'table': 's', 'type': 'ref', 'rows': 5}],
+        big: [{'table': 's', 'type': 'ALL', 'rows': 50000}],
+        union: [{'table': 'seat_holds', 'type': 'ref', 'rows': 1}, {'table': 'bs', 'type': 'ref', 'rows': 1},
+                {'table': '<union1,2>', 'type': 'ALL', 'rows': None}],
+    })
+    queries = [('small', small, ()), ('big', big, ()), ('union', union, ())]
+    assert check_indexes(db, queries) == [('big', 'showtimes', 50000)]
+
+
+def test_hot_queries_are_well_formed():
+    names = [name for name, _, _ in HOT_QUERIES]
+    assert len(names) == len(set(names))
+    for name, sql, params in HOT_QUERIES:
+        assert sql.count('%s') == len(params), name
@@ -0,0 +1,68 @@
+from werkzeug.security import generate_password_hash
+
+from app import passwords
+from app.passwords import LoginThrottle, _verify
+
+# Cheap parameters: these tests are about the bookkeeping, not the cost
+CURRENT = 'pbkdf2:sha256:1000'
+OUTDATED = 'pbkdf2:sha256:500'
+
+
+def test_verify_plaintext_row():
+    assert _verify('secret', 'secret', CURRENT) == (True, True)
+    assert _verify('secret', 'wrong', CURRENT) == (False, True)
+    # Not a hash just because it contains a '$'
+    assert _verify('pa$$word', 'pa$$word', CURRENT) == (True, True)
+
+
+def test_verify_outdated_method():
+    stored = generate_password_hash('secret', method=OUTDATED)
+    assert _verify(stored, 'secret', CURRENT) == (True, True)
+    assert _verify(stored, 'wrong', CURRENT) == (False, False)
+
+
+def test_verify_current_method():
+    stored = generate_password_hash('secret', method=CURRENT)
+    assert _verify(stored, 'secret', CURRENT) == (True, False)
+    assert _verify(stored, 'wrong', CURRENT) == (False, False)
+
+
+def test_verify_unreadable_hash():
+    assert _verify('scrypt:bad$salt$hash', 'secret', CURRENT) == (False, False)
+
+
+def test_throttle_blocks_at_limit_and_resets():
+    throttle = LoginThrottle(limit=2)
+    for _ in range(2):
+        assert not throttle.blocked('ip:1.2.3.4')
+        throttle.hit('ip:1.2.3.4')
+    assert throttle.blocked('ip:1.2.3.4')
+    assert not throttle.blocked('ip:5.6.7.8')
+    throttle.reset('ip:1.2.3.4')
+    assert not throttle.blocked('ip:1.2.3.4')
+
+
+def test_throttle_window_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(passwords.time, 'monotonic', lambda: now[0])
+    throttle = LoginThrottle(limit=1, window=60)
+    throttle.hit('acct:a@b.c')
+    assert throttle.blocked('acct:a@b.c')
+    now[0] += 60
+    assert not throttle.blocked('acct:a@b.c')
+
+
+def test_throttle_limit_zero_is_off():
+    throttle = LoginThrottle(limit=0)
+    for _ in range(100):
+        throttle.hit('ip:1.2.3.4')
+    assert not throttle.blocked('ip:1.2.3.4')
+
+
+def test_throttle_keeps_at_most_max_keys():
+    throttle = LoginThrottle(limit=1, max_keys=2)
+    for key in ('a', 'b', 'c'):
+        throttle.hit(key)
+    # The least recently used key was dropped
+    assert not throttle.blocked('a')
+    assert throttle.blocked('c')
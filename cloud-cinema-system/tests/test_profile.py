@@ -0,0 +1,26 @@
+from app.routes.auth import _page, _parse_cursor
+
+
+def test_parse_upcoming_cursor():
+    assert _parse_cursor('2026-01-31.18:00:00.42', 3) == ['2026-01-31', '18:00:00', 42]
+
+
+def test_parse_past_cursor():
+    assert _parse_cursor('42', 1) == [42]
+
+
+def test_parse_cursor_rejects_bad_values():
+    assert _parse_cursor(None, 1) is None
+    assert _parse_cursor('', 3) is None
+    assert _parse_cursor('x', 1) is None
+    # Wrong number of parts for the list it is meant for
+    assert _parse_cursor('42', 3) is None
+    assert _parse_cursor('2026-01-31.18:00:00.42', 1) is None
+    assert _parse_cursor('2026-02-30.18:00:00.42', 3) is None
+    assert _parse_cursor('2026-01-31.25:00:00.42', 3) is None
+    assert _parse_cursor('2026-01-31.18:00:00.x', 3) is None
+
+
+def test_page():
+    assert _page([1, 2, 3], 2) == ([1, 2], True)
+    assert _page([1, 2], 2) == ([1, 2], False)
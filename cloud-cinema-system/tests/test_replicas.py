@@ -0,0 +1,69 @@
+from app import catalog, create_app
+from app.replicas import ReplicaSet, parse_hosts
+
+
+class _Cursor:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        pass
+
+    def fetchall(self):
+        return [{'from': self.name}]
+
+
+class _Pool:
+    def __init__(self):
+        self.released = []
+
+    def release(self, conn):
+        self.released.append(conn)
+
+
+class _Conn:
+    request_scoped = False
+
+    def __init__(self, name, pool=None):
+        self.name = name
+        self._pool = pool
+
+    def cursor(self):
+        return _Cursor(self.name)
+
+    def close(self):
+        pass
+
+
+def test_parse_hosts():
+    assert parse_hosts('db-r1, db-r2:3307,') == [('db-r1', 3306), ('db-r2', 3307)]
+    assert parse_hosts(None) == []
+
+
+def test_replica_set_skips_replicas_marked_down():
+    a, b = object(), object()
+    replicas = ReplicaSet([a, b], retry_after=30)
+    replicas.mark_down(a)
+    assert replicas.candidates() == [b]
+    assert replicas.candidates() == [b]
+
+
+def test_catalog_misses_load_from_the_primary(monkeypatch):
+    app = create_app()
+    primary, replica = _Pool(), _Pool()
+    monkeypatch.setattr(app.db_pool, 'acquire', lambda: _Conn('primary'))
+    monkeypatch.setattr(app.db_pool, 'release', primary.release)
+    monkeypatch.setattr(app.replicas, 'acquire', lambda: _Conn('replica', replica))
+    app.catalog_cache.shared = None
+    with app.test_request_context('/'):
+        assert catalog.get_movies() == [{'from': 'primary'}]
+        # The fill did not move the request onto the primary
+        assert app.get_read_connection().name == 'replica'
+    assert [c.name for c in primary.released] == ['primary']
+    assert [c.name for c in replica.released] == ['replica']
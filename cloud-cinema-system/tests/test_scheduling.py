@@ -0,0 +1,102 @@
+from datetime import date, datetime, time, timedelta
+
+from app.scheduling import ScreenTimeline, expand, find_clash, plan
+
+TURNOVER = 15
+
+
+class _Cursor:
+    """Answers the queries find_clash() runs from an in-memory programme."""
+
+    def __init__(self, showtimes, durations):
+        self.showtimes = showtimes
+        self.durations = durations
+        self._result = []
+
+    def execute(self, sql, params=()):
+        if 'FROM screens' in sql:
+            self._result = [{'screen_id': sid} for sid in params]
+        elif 'FROM movies' in sql:
+            duration = self.durations.get(params[0])
+            self._result = [{'duration': duration}] if duration is not None else []
+        else:
+            *screen_ids, first, last = params
+            self._result = [
+                row for row in self.showtimes
+                if row['screen_id'] in screen_ids
+                and first - timedelta(days=1) <= row['show_date'] <= last + timedelta(days=1)
+            ]
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return self._result
+
+
+def _show(showtime_id, screen_id, start, movie_id=1):
+    return {
+        'showtime_id': showtime_id, 'screen_id': screen_id, 'movie_id': movie_id,
+        'show_date': start.date(),
+        # pymysql returns TIME columns as timedelta
+        'show_time': timedelta(hours=start.hour, minutes=start.minute),
+        'duration': 120, 'title': 'Film',
+    }
+
+
+def test_back_to_back_shows_touch_without_clashing():
+    timeline = ScreenTimeline()
+    timeline.add(datetime(2026, 5, 1, 18), datetime(2026, 5, 1, 20), 'first')
+    assert timeline.clash(datetime(2026, 5, 1, 20), datetime(2026, 5, 1, 22)) is None
+    assert timeline.clash(datetime(2026, 5, 1, 16), datetime(2026, 5, 1, 18)) is None
+    assert timeline.clash(datetime(2026, 5, 1, 19, 59), datetime(2026, 5, 1, 22)) == 'first'
+
+
+def test_long_interval_is_found_behind_short_ones():
+    timeline = ScreenTimeline()
+    timeline.add(datetime(2026, 5, 1, 10), datetime(2026, 5, 1, 18), 'marathon')
+    timeline.add(datetime(2026, 5, 1, 11), datetime(2026, 5, 1, 12), 'short')
+    assert timeline.clash(datetime(2026, 5, 1, 17), datetime(2026, 5, 1, 19)) == 'marathon'
+
+
+def test_find_clash_back_to_back():
+    # 120 minutes plus 15 turnover: the screen is free again at 20:15
+    cursor = _Cursor([_show(1, 1, datetime(2026, 5, 1, 18))], {1: 120})
+    assert find_clash(cursor, 1, 1, datetime(2026, 5, 1, 20, 15), TURNOVER) is None
+    assert find_clash(cursor, 1, 1, datetime(2026, 5, 1, 20, 14), TURNOVER) == 'Film at 2026-05-01 18:00'
+    # Another screen is unaffected
+    assert find_clash(cursor, 2, 1, datetime(2026, 5, 1, 19), TURNOVER) is None
+
+
+def test_find_clash_show_crossing_midnight():
+    cursor = _Cursor([_show(1, 1, datetime(2026, 5, 1, 23))], {1: 120})
+    # The 23:00 show runs until 01:15 on the next day
+    assert find_clash(cursor, 1, 1, datetime(2026, 5, 2, 1), TURNOVER) == 'Film at 2026-05-01 23:00'
+    assert find_clash(cursor, 1, 1, datetime(2026, 5, 2, 1, 15), TURNOVER) is None
+
+
+def test_find_clash_excludes_the_edited_showtime():
+    cursor = _Cursor([_show(1, 1, datetime(2026, 5, 1, 18))], {1: 120})
+    assert find_clash(cursor, 1, 1, datetime(2026, 5, 1, 18, 30), TURNOVER, exclude_showtime_id=1) is None
+
+
+def test_plan_clashes_within_one_batch():
+    timelines = {1: ScreenTimeline(), 2: ScreenTimeline()}
+    starts = [
+        (1, datetime(2026, 5, 1, 18)),
+        (1, datetime(2026, 5, 1, 19)),      # overlaps the 18:00 slot of this batch
+        (1, datetime(2026, 5, 1, 20, 15)),  # back to back with it
+        (2, datetime(2026, 5, 1, 19)),
+    ]
+    accepted, conflicts = plan(timelines, starts, 120, TURNOVER)
+    assert accepted == [starts[0], starts[2], starts[3]]
+    assert conflicts == [(*starts[1], 'new showtime at 2026-05-01 18:00')]
+
+
+def test_plan_batch_crossing_midnight():
+    # Daily 00:30 and 23:00 shows: each 23:00 show runs into the next
+    # day's 00:30 show of the same batch
+    starts = [(1, s) for s in expand(date(2026, 5, 1), date(2026, 5, 2), set(range(7)), [time(0, 30), time(23)])]
+    accepted, conflicts = plan({1: ScreenTimeline()}, starts, 120, TURNOVER)
+    assert accepted == [starts[0], starts[1], starts[3]]
+    assert conflicts == [(*starts[2], 'new showtime at 2026-05-01 23:00')]
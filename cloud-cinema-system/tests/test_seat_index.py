@@ -0,0 +1,46 @@
+import base64
+
+from app.seat_index import SeatIndex, SeatIndexRegistry
+
+SEATS = [10, 11, 12, 13, 14, 15, 16, 17, 18]
+
+
+def test_bitmap():
+    index = SeatIndex(1, SEATS, [11, 18, 99])
+    assert index.is_booked(11) and index.is_booked(18)
+    assert not index.is_booked(10) and not index.is_booked(99)
+    assert index.booked_ids() == {11, 18}
+    assert index.booked_count == 2
+    assert index.unknown([10, 99]) == [99]
+    assert index.conflicts([10, 11, 12]) == [11]
+
+
+def test_bitset_and_deltas():
+    index = SeatIndex(1, SEATS, [11, 18])
+    # Seat 11 is bit 1 of byte 0, seat 18 bit 0 of byte 1
+    assert base64.b64decode(index.bitset()) == bytes([0b10, 0b1])
+    assert index.booked_deltas() == [11, 7]
+
+
+def test_etag_follows_content():
+    index = SeatIndex(1, SEATS, [11])
+    etag = index.etag
+    assert SeatIndex(1, SEATS, [11]).etag == etag
+    assert SeatIndex(2, SEATS, [11]).etag != etag
+
+    index._set([12], True)
+    assert index.etag != etag
+    index._set([12], False)
+    assert index.etag == etag
+
+
+def test_registry_marks_and_invalidates():
+    registry = SeatIndexRegistry(layouts=None, ttl=0)
+    registry._store(5, SeatIndex(1, SEATS, []))
+    registry.mark_booked(5, [13])
+    assert registry.peek(5).is_booked(13)
+    registry.mark_free(5, [13])
+    assert not registry.peek(5).is_booked(13)
+    assert registry.cached(5, screen_id=2) is None
+    registry.invalidate(5)
+    assert registry.peek(5) is None
@@ -0,0 +1,163 @@
+import time
+
+import pytest
+from flask import Flask, session
+
+from app.waiting_room import SESSION_KEY, QueueFull, WaitingRoom
+
+app = Flask(__name__)
+app.secret_key = 'test'
+
+
+def room(**kwargs):
+    kwargs.setdefault('budget', 2)
+    return WaitingRoom('test', **kwargs)
+
+
+def test_token_round_trip():
+    wr = room()
+    with app.test_request_context():
+        session['user_id'] = 7
+        wr._store(5, ['admitted', 5, 7, None])
+        assert wr._load(5, 60) == ['admitted', 5, 7, None]
+        assert wr.admitted(5)
+        # Other showtimes and other users do not get in with it
+        assert wr._load(6, 60) is None
+        session['user_id'] = 8
+        assert not wr.admitted(5)
+
+
+def test_tampered_or_expired_token():
+    wr = room(admit_ttl=1)
+    with app.test_request_context():
+        session['user_id'] = 7
+        wr._store(5, ['admitted', 5, 7, None])
+        token = session[SESSION_KEY]['5']
+        session[SESSION_KEY] = {'5': token[:-2] + 'xx'}
+        assert not wr.admitted(5)
+        session[SESSION_KEY] = {'5': token}
+        assert wr._load(5, -1) is None
+
+
+def test_store_none_drops_the_token():
+    wr = room()
+    with app.test_request_context():
+        session['user_id'] = 7
+        wr._store(5, ['ticket', 5, 7, 3])
+        wr._store(5, None)
+        assert session[SESSION_KEY] == {}
+
+
+def test_off_by_default():
+    wr = room(budget=0)
+    with app.test_request_context():
+        assert wr.admitted(5)
+
+
+def test_eta():
+    wr = room(budget=300, admit_ttl=900)
+    # Nothing admitted yet: the slowest the queue can move, budget / admit_ttl
+    assert wr.eta({'rate': 0.0}, 100) == 300
+    # Measured rate when it is faster
+    assert wr.eta({'rate': 2.0}, 100) == 50
+
+
+def test_admit_ttl_must_be_positive():
+    with pytest.raises(ValueError):
+        room(admit_ttl=0)
+    # Irrelevant while the room is off
+    assert room(budget=0, admit_ttl=0).eta({'rate': 0.0}, 10) is None
+
+
+class _Db:
+    """Just enough of the waiting_rooms / waiting_room_admissions SQL."""
+
+    def __init__(self):
+        self.rooms = {}
+        self.admissions = {}
+        self.last_ticket = None
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def commit(self, notify=True):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class _Cursor:
+    def __init__(self, db):
+        self.db = db
+        self.row = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        db, sql, now = self.db, ' '.join(sql.split()), time.time()
+        if sql.startswith('DELETE FROM waiting_room_admissions WHERE showtime_id = %s AND expires_at'):
+            for key in [k for k, v in db.admissions.items() if k[0] == params[0] and v < now]:
+                del db.admissions[key]
+        elif sql.startswith('DELETE FROM waiting_room_admissions'):
+            db.admissions.pop(tuple(params), None)
+        elif sql.startswith('SELECT COUNT(*)'):
+            self.row = {'n': sum(1 for k in db.admissions if k[0] == params[0])}
+        elif sql.startswith('SELECT issued'):
+            r = db.rooms.get(params[0])
+            self.row = None if r is None else dict(r, since=None if r['at'] is None else now - r['at'])
+        elif sql.startswith('UPDATE waiting_rooms SET admitted'):
+            db.rooms[params[3]].update(admitted=params[0], claimed=params[1], rate=params[2], at=now)
+        elif sql.startswith('UPDATE waiting_rooms SET claimed = %s'):
+            db.rooms[params[1]]['claimed'] = params[0]
+        elif sql.startswith('UPDATE waiting_rooms SET claimed = LEAST'):
+            r = db.rooms[params[0]]
+            r['claimed'] = min(r['claimed'] + 1, r['admitted'])
+        elif sql.startswith('INSERT INTO waiting_rooms'):
+            r = db.rooms.setdefault(params[0], {'issued': 0, 'admitted': 0, 'claimed': 0, 'rate': 0.0, 'at': None})
+            r['issued'] += 1
+            db.last_ticket = r['issued']
+        elif sql.startswith('SELECT LAST_INSERT_ID'):
+            self.row = {'ticket': db.last_ticket}
+        elif sql.startswith('INSERT INTO waiting_room_admissions'):
+            db.admissions[(params[0], params[1])] = now + params[2]
+        else:
+            raise AssertionError(sql)
+
+    def fetchone(self):
+        return self.row
+
+
+def test_queue_admits_in_ticket_order():
+    wr = room(budget=2, max_queue=2, refresh=0)
+    db = _Db()
+    sessions = {}
+
+    def as_user(user_id, call):
+        with app.test_request_context():
+            session.update(sessions.get(user_id, {'user_id': user_id}))
+            try:
+                return call()
+            finally:
+                sessions[user_id] = dict(session)
+
+    assert as_user(1, lambda: wr.enter(db, 5, 1)) == {'admitted': True}
+    assert as_user(2, lambda: wr.enter(db, 5, 2)) == {'admitted': True}
+    assert as_user(3, lambda: wr.enter(db, 5, 3))['position'] == 1
+    assert as_user(4, lambda: wr.enter(db, 5, 4))['position'] == 2
+    with pytest.raises(QueueFull):
+        as_user(5, lambda: wr.enter(db, 5, 5))
+    assert as_user(1, lambda: wr.admitted(5))
+    assert not as_user(3, lambda: wr.admitted(5))
+
+    # A booking frees a slot for the next ticket, not for a later one
+    as_user(1, lambda: wr.leave(db, 5, 1))
+    assert not as_user(1, lambda: wr.admitted(5))
+    assert as_user(4, lambda: wr.enter(db, 5, 4, join=False))['position'] == 1
+    assert as_user(3, lambda: wr.enter(db, 5, 3, join=False)) == {'admitted': True}
+    assert as_user(3, lambda: wr.admitted(5))
+    assert as_user(9, lambda: wr.enter(db, 5, 9, join=False)) is None